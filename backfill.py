@@ -0,0 +1,67 @@
+"""
+Догрузка истории статусов и сохранение позиций опроса.
+
+Позиция опроса (from_date) каждого получателя хранится в SQLite, поэтому
+после перезапуска опрос продолжается с места остановки. Получатели без
+сохранённой позиции сначала догружают историю за ограниченный период,
+причём одновременно выполняется не больше заданного числа запросов.
+"""
+
+import sqlite3
+import threading
+
+import engine
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS cursors (
+    tenant TEXT PRIMARY KEY,
+    cursor INTEGER NOT NULL
+);
+"""
+
+
+class CursorStore:
+    """Позиции опроса получателей в файле SQLite."""
+
+    def __init__(self, path):
+        """Открывает или создаёт хранилище в файле path."""
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(
+            path, check_same_thread=False, isolation_level=None
+        )
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(SCHEMA)
+
+    def get(self, tenant):
+        """Возвращает сохранённую позицию получателя или None."""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT cursor FROM cursors WHERE tenant = ?", (tenant,)
+            ).fetchone()
+        return None if row is None else row[0]
+
+    def set(self, tenant, cursor):
+        """Сохраняет позицию получателя."""
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO cursors (tenant, cursor) VALUES (?, ?) "
+                "ON CONFLICT (tenant) DO UPDATE SET cursor = excluded.cursor",
+                (tenant, cursor),
+            )
+
+    def close(self):
+        """Закрывает файл хранилища."""
+        with self._lock:
+            self._db.close()
+
+
+def map_bounded(items, func, concurrency):
+    """
+    Выполняет func для каждого элемента в пуле потоков.
+    В работе одновременно не больше concurrency задач, поэтому память не
+    растёт с числом элементов. Результаты выдаются по мере готовности
+    парами (элемент, результат); исключение возвращается как результат.
+    """
+    with engine.ThreadPoolEngine(concurrency, max_pending=concurrency) as pool:
+        yield from pool.map(items, func)
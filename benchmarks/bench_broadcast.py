@@ -0,0 +1,55 @@
+"""
+Скорость рассылки против имитации Telegram с ограничением частоты.
+
+FakeTelegram принимает от каждого бота не больше --bot-rate сообщений в
+секунду, сверх этого отвечает 429. Для каждого ограничения частоты
+рассылки измеряются скорость и число ответов 429: при частоте выше
+предела Telegram рассылка упирается в паузы retry_after.
+
+Запуск: python benchmarks/bench_broadcast.py [--chats 2000] [--bots 2]
+"""
+
+import argparse
+import logging
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from telebot import apihelper  # noqa: E402
+
+import broadcast  # noqa: E402
+import loadtest  # noqa: E402
+import telegram_client  # noqa: E402
+import tenants  # noqa: E402
+
+
+def main():
+    """Печатает скорость рассылки для нескольких ограничений частоты."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--chats", type=int, default=2000)
+    parser.add_argument("--bots", type=int, default=2)
+    parser.add_argument("--bot-rate", type=int, default=30)
+    parser.add_argument("--workers", type=int, default=16)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.ERROR)
+    chats = [tenants.Tenant(str(index), "token", str(index), 600)
+             for index in range(args.chats)]
+    print(f"{'частота/бот':>11} {'чатов/с':>8} {'429':>5} {'доставлено':>11}")
+    for rate in (args.bot_rate * 0.8, args.bot_rate * 2):
+        with loadtest.FakeTelegram(args.bot_rate) as telegram:
+            apihelper.API_URL = telegram.api_url
+            telegram_client.configure_session(args.workers, 5, 0)
+            pool = telegram_client.BotPool(
+                [f"{index}:bench" for index in range(args.bots)]
+            )
+            stats = broadcast.Broadcast(
+                pool.send_message, rate * args.bots, args.workers
+            ).run(chats, "Плановые работы")
+            delivered = len({chat for _, chat, _ in telegram.messages})
+        print(f"{rate:>11.0f} {stats['rate']:>8.1f} "
+              f"{telegram.throttled:>5} {delivered:>11}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+"""
+Память на учёт отправленных статусов.
+
+Для заданного числа получателей и работ у каждого заполняет наборы
+обоих режимов и печатает байты на получателя по tracemalloc.
+
+Запуск: python benchmarks/bench_dedup.py [получателей] [работ]
+"""
+
+import os
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import dedup  # noqa: E402
+from homework import HOMEWORK_VERDICTS  # noqa: E402
+
+STATUSES = list(HOMEWORK_VERDICTS)
+
+
+def fill(mode, tenants, works):
+    """Заполняет наборы и возвращает занятую ими память в байтах."""
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    sets = []
+    for tenant in range(tenants):
+        seen = dedup.make(mode)
+        for work in range(works):
+            status = STATUSES[(tenant + work) % len(STATUSES)]
+            homework_id = tenant * works + work
+            message = (f'Изменился статус проверки работы '
+                       f'"{homework_id}.zip". {HOMEWORK_VERDICTS[status]}')
+            seen.remember(homework_id, status, message)
+        sets.append(seen)
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    return used
+
+
+def main(tenants, works):
+    """Печатает байты на получателя для каждого режима."""
+    print(f"{tenants} получателей по {works} работ")
+    for mode in (dedup.FINGERPRINT, dedup.TEXT):
+        used = fill(mode, tenants, works)
+        print(f"{mode:>12}: {used / tenants:>8.0f} байт на получателя")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 10_000,
+         int(sys.argv[2]) if len(sys.argv) > 2 else 20)
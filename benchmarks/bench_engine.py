@@ -0,0 +1,109 @@
+"""
+Сравнение способов опроса многих получателей.
+
+Запрос к API имитируется блокирующей паузой latency секунд, как у
+синхронного requests. Для каждого числа получателей измеряется время
+одного полного обхода. Последовательный обход запускается, только если
+он укладывается в несколько секунд. Для циклов событий asyncio и uvloop
+запрос имитируется асинхронной паузой, до --concurrency запросов сразу;
+для них выводится p99 задержки цикла.
+
+Запуск: python benchmarks/bench_engine.py [--latency 0.02] [--workers 64]
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import eventloop  # noqa: E402
+from engine import AsyncioEngine, ThreadPoolEngine  # noqa: E402
+
+SEQUENTIAL_LIMIT = 5.0  # Наибольшая ожидаемая длительность обхода подряд, с
+
+
+def fake_fetch(latency):
+    """Возвращает функцию, имитирующую запрос к API."""
+    def fetch(tenant):
+        time.sleep(latency)
+        return {"homeworks": [], "current_date": tenant}
+    return fetch
+
+
+def fake_async_fetch(latency):
+    """Возвращает сопрограмму, имитирующую асинхронный запрос к API."""
+    async def fetch(tenant):
+        await asyncio.sleep(latency)
+        return {"homeworks": [], "current_date": tenant}
+    return fetch
+
+
+def run_sequential(tenants, fetch):
+    """Опрашивает получателей по очереди."""
+    for tenant in range(tenants):
+        fetch(tenant)
+
+
+def run_threads(tenants, fetch, workers):
+    """Опрашивает получателей в пуле потоков."""
+    with ThreadPoolEngine(workers, deadline=30) as pool:
+        for _ in pool.map(range(tenants), fetch):
+            pass
+
+
+def run_loop(tenants, fetch, loop, concurrency):
+    """Опрашивает получателей в цикле событий, возвращает задержку цикла."""
+    with AsyncioEngine(
+        1, deadline=30, max_pending=concurrency, loop=loop,
+        lag_interval=0.01,
+    ) as pool:
+        for _ in pool.map(range(tenants), fetch):
+            pass
+        return pool.monitor.report()["p99"]
+
+
+def main():
+    """Печатает время обхода и пропускную способность."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--latency", type=float, default=0.02)
+    parser.add_argument("--workers", type=int, default=64)
+    parser.add_argument("--concurrency", type=int, default=1000)
+    parser.add_argument(
+        "--tenants", type=int, nargs="+", default=[100, 1000, 10000]
+    )
+    args = parser.parse_args()
+    fetch = fake_fetch(args.latency)
+    async_fetch = fake_async_fetch(args.latency)
+    engines = [
+        ("sequential", run_sequential),
+        (f"threads:{args.workers}",
+         lambda tenants, fetch: run_threads(tenants, fetch, args.workers)),
+    ]
+    for loop in eventloop.LOOPS:
+        if loop == eventloop.UVLOOP and eventloop.uvloop is None:
+            print("uvloop не установлен, замер пропущен.")
+            continue
+        engines.append((loop, lambda tenants, fetch, loop=loop: run_loop(
+            tenants, async_fetch, loop, args.concurrency
+        )))
+    print(f"{'получателей':>11} {'способ':>12} {'обход, с':>9} "
+          f"{'опросов/с':>10} {'лаг p99, мс':>12}")
+    for tenants in args.tenants:
+        for name, run in engines:
+            if (name == "sequential"
+                    and tenants * args.latency > SEQUENTIAL_LIMIT):
+                print(f"{tenants:>11} {name:>12} {'—':>9} {'—':>10}")
+                continue
+            started = time.perf_counter()
+            lag = run(tenants, fetch)
+            elapsed = time.perf_counter() - started
+            lag = "—" if lag is None else f"{lag:.2f}"
+            print(f"{tenants:>11} {name:>12} {elapsed:>9.2f} "
+                  f"{tenants / elapsed:>10.0f} {lag:>12}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+Цена обработки ошибок во время недоступности API.
+
+requests.get подменяется функцией, которая сразу выбрасывает
+ConnectionError, а лог пишется в память в формате бота. Для каждого
+режима измеряется процессорное время на один неудачный опрос: с
+трассировкой для каждой ошибки, как раньше, только для первой ошибки и
+с выборкой трассировок.
+
+Запуск: python benchmarks/bench_errors.py [--tenants 100] [--rounds 50]
+"""
+
+import argparse
+import io
+import logging
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import requests  # noqa: E402
+
+import health  # noqa: E402
+import homework  # noqa: E402
+import tenants  # noqa: E402
+
+FORMAT = "%(asctime)s [%(levelname)s] %(message)s [%(funcName)s:%(lineno)d]"
+
+
+class NullBot:
+    """Бот, который ничего не отправляет."""
+
+    def send_message(self, chat_id, text):
+        """Пропускает сообщение."""
+
+
+def outage(*args, **kwargs):
+    """Имитирует недоступность API."""
+    raise requests.ConnectionError("Connection refused")
+
+
+def measure(sample, always, tenant_count, rounds):
+    """Возвращает процессорное время на один неудачный опрос, мкс."""
+    poller = homework.Poller(
+        NullBot(),
+        [tenants.Tenant(f"t{index}", "token", f"chat{index}", 600)
+         for index in range(tenant_count)],
+        health.HealthState(),
+    )
+    poller.errors.sample = sample
+    if always:
+        poller.errors.wants_traceback = lambda error: True
+    started = time.process_time()
+    for _ in range(rounds):
+        for name in poller.tenants:
+            poller.poll(name)
+    elapsed = time.process_time() - started
+    return elapsed / (rounds * tenant_count) * 1e6
+
+
+def main():
+    """Печатает цену неудачного опроса для каждого режима."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--tenants", type=int, default=100)
+    parser.add_argument("--rounds", type=int, default=50)
+    args = parser.parse_args()
+    requests.get = outage
+    stream = io.StringIO()
+    handler = logging.StreamHandler(stream)
+    handler.setFormatter(logging.Formatter(FORMAT))
+    logging.basicConfig(level=logging.INFO, handlers=[handler])
+    modes = [
+        ("каждая", 0.0, True),
+        ("первая", 0.0, False),
+        ("выборка 1%", 0.01, False),
+    ]
+    print(f"{'трассировка':>12} {'мкс/опрос':>10} {'лог, байт/опрос':>16}")
+    for name, sample, always in modes:
+        stream.seek(0)
+        stream.truncate()
+        cost = measure(sample, always, args.tenants, args.rounds)
+        size = stream.tell() / (args.tenants * args.rounds)
+        print(f"{name:>12} {cost:>10.1f} {size:>16.0f}")
+
+
+if __name__ == "__main__":
+    main()
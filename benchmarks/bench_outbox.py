@@ -0,0 +1,43 @@
+"""
+Пропускная способность очереди уведомлений на локальном диске.
+
+Ставит в очередь пачки уведомлений и опустошает её с мгновенной
+«отправкой», измеряя число уведомлений в секунду на каждом этапе.
+
+Запуск: python benchmarks/bench_outbox.py [число уведомлений]
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from outbox import Outbox  # noqa: E402
+
+BATCH = 100
+
+
+def main(total):
+    """Печатает скорость постановки и отправки уведомлений."""
+    with tempfile.TemporaryDirectory() as directory:
+        queue = Outbox(os.path.join(directory, "outbox.db"))
+        started = time.perf_counter()
+        for start in range(0, total, BATCH):
+            queue.put([
+                (f"tenant:{number}", str(number % 1000), "Работа проверена")
+                for number in range(start, min(start + BATCH, total))
+            ])
+        enqueued = time.perf_counter()
+        sent = 0
+        while sent < total:
+            sent += queue.drain(lambda chat_id, text: None, BATCH)
+        drained = time.perf_counter()
+        queue.close()
+    print(f"постановка: {total / (enqueued - started):,.0f} уведомлений/с")
+    print(f"отправка:   {total / (drained - enqueued):,.0f} уведомлений/с")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000)
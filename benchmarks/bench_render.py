@@ -0,0 +1,70 @@
+"""
+Цена сборки текста уведомления.
+
+Сравнивается прежняя сборка f-строкой с поиском вердикта в словаре и
+Renderer со скомпилированными каталогами с кэшем и без него. Изменения
+статусов берутся из небольшого набора работ, как при рассылке одного
+изменения во многие чаты.
+
+Запуск: python benchmarks/bench_render.py [--works 50] [--calls 1000000]
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import homework  # noqa: E402
+import render  # noqa: E402
+
+
+def fstring(homework_name, status, locale):
+    """Прежняя сборка уведомления."""
+    verdict = homework.HOMEWORK_VERDICTS.get(status)
+    if verdict is None:
+        raise ValueError(f"Неизвестный статус домашней работы: {status}")
+    return f'Изменился статус проверки работы "{homework_name}". {verdict}'
+
+
+def measure(func, changes):
+    """Возвращает время на одно уведомление, нс."""
+    started = time.perf_counter()
+    for homework_name, status, locale in changes:
+        func(homework_name, status, locale)
+    return (time.perf_counter() - started) / len(changes) * 1e9
+
+
+def main():
+    """Печатает время сборки уведомления для каждого способа."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--works", type=int, default=50)
+    parser.add_argument("--calls", type=int, default=1000000)
+    args = parser.parse_args()
+    rng = random.Random(1)
+    statuses = list(homework.HOMEWORK_VERDICTS)
+    locales = ["ru", "en"]
+    changes = [
+        (f"student_{rng.randrange(args.works)}.zip", rng.choice(statuses),
+         rng.choice(locales))
+        for _ in range(args.calls)
+    ]
+    catalogs = {
+        **render.CATALOGS,
+        "ru": {"template": homework.MESSAGE_TEMPLATE,
+               "verdicts": homework.HOMEWORK_VERDICTS},
+    }
+    modes = [
+        ("f-строка", fstring),
+        ("без кэша", render.Renderer(catalogs, cache_size=0).render),
+        ("LRU", render.Renderer(catalogs).render),
+    ]
+    print(f"{'способ':>10} {'нс/уведомление':>15}")
+    for name, func in modes:
+        print(f"{name:>10} {measure(func, changes):>15.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Сравнение колеса таймеров с кучей heapq.
+
+Для каждого размера планируются таймеры со случайными сроками, десятая
+часть отменяется, затем время продвигается до срабатывания всех
+оставшихся. Отмена в куче — ленивая, через словарь актуальных сроков.
+
+Запуск: python benchmarks/bench_scheduler.py [число таймеров ...]
+"""
+
+import heapq
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scheduler import TimingWheel  # noqa: E402
+
+HORIZON = 3600  # Сроки таймеров — до часа в тиках по секунде
+
+
+def bench_wheel(deadlines, cancelled):
+    """Возвращает время добавления, отмены и продвижения колеса."""
+    wheel = TimingWheel()
+    started = time.perf_counter()
+    for key, tick in enumerate(deadlines):
+        wheel.schedule(key, tick)
+    scheduled = time.perf_counter()
+    for key in cancelled:
+        wheel.cancel(key)
+    cancelled_at = time.perf_counter()
+    fired = 0
+    for tick in range(1, HORIZON + 1):
+        fired += len(wheel.advance(tick))
+    finished = time.perf_counter()
+    return (scheduled - started, cancelled_at - scheduled,
+            finished - cancelled_at, fired)
+
+
+def bench_heap(deadlines, cancelled):
+    """Возвращает время добавления, отмены и продвижения кучи."""
+    heap = []
+    live = {}
+    started = time.perf_counter()
+    for key, tick in enumerate(deadlines):
+        live[key] = tick
+        heapq.heappush(heap, (tick, key))
+    scheduled = time.perf_counter()
+    for key in cancelled:
+        live.pop(key, None)
+    cancelled_at = time.perf_counter()
+    fired = 0
+    for tick in range(1, HORIZON + 1):
+        while heap and heap[0][0] <= tick:
+            deadline, key = heapq.heappop(heap)
+            if live.get(key) == deadline:
+                del live[key]
+                fired += 1
+    finished = time.perf_counter()
+    return (scheduled - started, cancelled_at - scheduled,
+            finished - cancelled_at, fired)
+
+
+def main(sizes):
+    """Печатает таблицу результатов для каждого размера."""
+    print(f"{'таймеров':>9} {'способ':>7} {'добавление, нс':>15} "
+          f"{'отмена, нс':>11} {'продвижение, мс':>16}")
+    for size in sizes:
+        rng = random.Random(size)
+        deadlines = [rng.randint(1, HORIZON) for _ in range(size)]
+        cancelled = rng.sample(range(size), size // 10)
+        for name, bench in (("wheel", bench_wheel), ("heapq", bench_heap)):
+            insert, cancel, advance, fired = bench(deadlines, cancelled)
+            assert fired == size - len(cancelled)
+            print(f"{size:>9} {name:>7} {insert / size * 1e9:>15.0f} "
+                  f"{cancel / len(cancelled) * 1e9:>11.0f} "
+                  f"{advance * 1e3:>16.1f}")
+
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or [100_000, 1_000_000])
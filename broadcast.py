@@ -0,0 +1,188 @@
+"""
+Рассылка одного сообщения во все чаты получателей.
+
+Чаты читаются из списка получателей построчно, без загрузки целиком, и
+отправляются в пуле потоков с общим ограничением частоты. Если Telegram
+отвечает 429, отправка во все чаты приостанавливается на retry_after.
+Итог каждого чата дописывается в файл контрольной точки пачками; при
+повторном запуске с тем же файлом чаты с окончательным итогом
+пропускаются, а чаты с временной ошибкой отправляются снова.
+"""
+
+import logging
+import os
+import threading
+import time
+
+from telebot import apihelper
+
+import engine
+import metrics
+from telegram_client import THROTTLED
+
+OK = "ok"
+RETRY = "retry"  # Временная ошибка: чат будет отправлен при повторе
+
+
+class RateLimiter:
+    """Выдаёт разрешения на отправку не чаще rate раз в секунду."""
+
+    def __init__(self, rate, clock=time.monotonic, sleep=time.sleep):
+        """Создаёт ограничитель с равными промежутками между отправками."""
+        self.interval = 1 / rate
+        self.clock = clock
+        self.sleep = sleep
+        self._next = clock()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Ждёт своей очереди на отправку."""
+        with self._lock:
+            now = self.clock()
+            slot = max(self._next, now)
+            self._next = slot + self.interval
+        if slot > now:
+            self.sleep(slot - now)
+
+    def pause(self, seconds):
+        """Откладывает все следующие отправки на seconds секунд."""
+        with self._lock:
+            self._next = max(self._next, self.clock() + seconds)
+
+
+def read_checkpoint(path):
+    """Чаты с окончательным итогом из файла контрольной точки."""
+    if not path or not os.path.exists(path):
+        return set()
+    done = set()
+    with open(path, encoding="utf-8") as file:
+        for line in file:
+            chat_id, _, outcome = line.rstrip("\n").partition("\t")
+            if outcome != RETRY:
+                done.add(chat_id)
+    return done
+
+
+def unique_chats(tenant_list, done=()):
+    """Выдаёт чаты получателей по одному разу, пропуская done."""
+    seen = set(done)
+    for tenant in tenant_list:
+        if tenant.chat_id in seen:
+            continue
+        seen.add(tenant.chat_id)
+        yield tenant.chat_id
+
+
+class Broadcast:
+    """Параллельная рассылка с ограничением частоты и контрольными точками."""
+
+    def __init__(self, send, rate, workers=8, checkpoint=None, every=100,
+                 retries=3, sleep=time.sleep):
+        """
+        Создаёт рассылку через send(chat_id, text).
+        rate — отправок в секунду на все потоки, workers — число потоков;
+        итоги пишутся в файл checkpoint каждые every чатов; при временной
+        ошибке отправка повторяется до retries раз.
+        """
+        self.send = send
+        self.limiter = RateLimiter(rate, sleep=sleep)
+        self.workers = workers
+        self.checkpoint = checkpoint
+        self.every = every
+        self.retries = retries
+        self.sleep = sleep
+        self._lock = threading.Lock()
+        self.stats = {"sent": 0, "skipped": 0, "throttled": 0, "failed": {}}
+
+    def run(self, tenant_list, text):
+        """
+        Рассылает text во все ещё не охваченные чаты получателей.
+        Возвращает статистику рассылки.
+        """
+        done = read_checkpoint(self.checkpoint)
+        chats = unique_chats(tenant_list, done)
+        started = time.monotonic()
+        pending = []
+        total = 0
+        with engine.ThreadPoolEngine(self.workers, None,
+                                     2 * self.workers) as pool:
+            for chat_id, outcome in pool.map(
+                chats, lambda chat_id: self.deliver(chat_id, text)
+            ):
+                if isinstance(outcome, Exception):
+                    outcome = RETRY
+                self.count(outcome)
+                pending.append(f"{chat_id}\t{outcome}\n")
+                total += 1
+                if len(pending) >= self.every:
+                    self.save(pending)
+                    self.progress(total, started)
+        self.save(pending)
+        self.stats["skipped"] = len(done)
+        self.stats["seconds"] = time.monotonic() - started
+        self.stats["rate"] = (self.stats["sent"] / self.stats["seconds"]
+                              if self.stats["seconds"] else None)
+        return self.stats
+
+    def deliver(self, chat_id, text):
+        """
+        Отправляет сообщение в чат и возвращает итог.
+        Итог — OK, код ошибки Telegram для ошибок чата или RETRY, если
+        ошибка не прошла за retries повторов.
+        """
+        for attempt in range(self.retries + 1):
+            self.limiter.acquire()
+            try:
+                self.send(chat_id, text)
+                return OK
+            except apihelper.ApiTelegramException as error:
+                if error.error_code == THROTTLED:
+                    self.throttled(error)
+                    continue
+                if error.error_code < 500:
+                    return str(error.error_code)
+                failure = error
+            except apihelper.ApiException as error:
+                failure = error
+            logging.warning(f"Рассылка в чат {chat_id}: {failure}")
+            if attempt < self.retries:
+                self.sleep(2 ** attempt)
+        return RETRY
+
+    def throttled(self, error):
+        """Приостанавливает рассылку на retry_after из ответа 429."""
+        retry_after = error.result_json.get("parameters", {}).get(
+            "retry_after", 1
+        )
+        metrics.inc("broadcast_throttled")
+        with self._lock:
+            self.stats["throttled"] += 1
+        self.limiter.pause(retry_after)
+
+    def count(self, outcome):
+        """Учитывает итог отправки в статистике и метриках."""
+        if outcome == OK:
+            self.stats["sent"] += 1
+            metrics.inc("broadcast_sent")
+        else:
+            failed = self.stats["failed"]
+            failed[outcome] = failed.get(outcome, 0) + 1
+            metrics.inc("broadcast_failed")
+
+    def save(self, lines):
+        """Дописывает итоги в файл контрольной точки и очищает lines."""
+        if self.checkpoint and lines:
+            with open(self.checkpoint, "a", encoding="utf-8") as file:
+                file.writelines(lines)
+                file.flush()
+                os.fsync(file.fileno())
+        lines.clear()
+
+    def progress(self, total, started):
+        """Пишет в лог ход рассылки."""
+        elapsed = time.monotonic() - started
+        logging.info(
+            f"Рассылка: обработано {total}, отправлено {self.stats['sent']}, "
+            f"ошибок {sum(self.stats['failed'].values())}, "
+            f"{total / elapsed if elapsed else 0:.1f} чатов/с."
+        )
@@ -0,0 +1,393 @@
+"""
+Общий кэш ответов API для нескольких экземпляров бота.
+
+Ответ на запрос статусов сохраняется по хэшу токена Практикума вместе с
+from_date, с которым он был получен. Ответ подходит и для запроса с более
+поздним from_date, пока тот не позже current_date ответа: в нём есть все
+работы, обновлённые с нового from_date, а лишние отсеиваются проверкой
+повторов. Если ответа нет, загружает его только один поток на экземпляр
+и только один экземпляр на ключ: остальные ждут, пока ответ появится в
+кэше. Хранилище — память процесса, файл SQLite или сервер с протоколом
+Redis (RESP).
+"""
+
+from contextlib import contextmanager
+import hashlib
+import json
+import logging
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from urllib.parse import urlsplit
+
+import metrics
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS cache (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL,
+    expires REAL NOT NULL
+);
+"""
+
+
+class CacheError(Exception):
+    """Хранилище кэша недоступно или ответило ошибкой."""
+
+
+BACKEND_ERRORS = (CacheError, sqlite3.Error)
+
+
+def token_key(token):
+    """Ключ кэша для токена; сам токен в хранилище не попадает."""
+    return "statuses:" + hashlib.sha256(token.encode()).hexdigest()[:32]
+
+
+class CacheBackend:
+    """Хранилище кэша; наследники реализуют get, set, add и delete."""
+
+    def get(self, key):
+        """Значение ключа или None, если его нет или срок истёк."""
+        raise NotImplementedError
+
+    def set(self, key, value, ttl):
+        """Сохраняет значение на ttl секунд."""
+        raise NotImplementedError
+
+    def add(self, key, value, ttl):
+        """Сохраняет значение, только если ключа нет; возвращает успех."""
+        raise NotImplementedError
+
+    def delete(self, key):
+        """Удаляет ключ."""
+        raise NotImplementedError
+
+
+class MemoryCacheBackend(CacheBackend):
+    """Кэш в памяти процесса, для одного экземпляра и тестов."""
+
+    def __init__(self, clock=time.time):
+        """Создаёт пустой кэш."""
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._items = {}
+
+    def get(self, key):
+        """Значение ключа или None, если его нет или срок истёк."""
+        with self._lock:
+            item = self._items.get(key)
+            if item is None or item[1] <= self.clock():
+                return None
+            return item[0]
+
+    def set(self, key, value, ttl):
+        """Сохраняет значение на ttl секунд."""
+        with self._lock:
+            self._items[key] = (value, self.clock() + ttl)
+
+    def add(self, key, value, ttl):
+        """Сохраняет значение, только если ключа нет; возвращает успех."""
+        with self._lock:
+            now = self.clock()
+            item = self._items.get(key)
+            if item is not None and item[1] > now:
+                return False
+            self._items[key] = (value, now + ttl)
+            return True
+
+    def delete(self, key):
+        """Удаляет ключ."""
+        with self._lock:
+            self._items.pop(key, None)
+
+
+class SQLiteCacheBackend(CacheBackend):
+    """Кэш в файле SQLite, общем для экземпляров на одном хосте."""
+
+    def __init__(self, path, clock=time.time):
+        """Открывает или создаёт кэш в файле path."""
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(
+            path, check_same_thread=False, isolation_level=None, timeout=5
+        )
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(SCHEMA)
+
+    def get(self, key):
+        """Значение ключа или None, если его нет или срок истёк."""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT value FROM cache WHERE key = ? AND expires > ?",
+                (key, self.clock()),
+            ).fetchone()
+        return None if row is None else row[0]
+
+    def set(self, key, value, ttl):
+        """Сохраняет значение на ttl секунд."""
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO cache (key, value, expires) "
+                "VALUES (?, ?, ?)",
+                (key, value, self.clock() + ttl),
+            )
+
+    def add(self, key, value, ttl):
+        """Сохраняет значение, только если ключа нет; возвращает успех."""
+        now = self.clock()
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                self._db.execute(
+                    "DELETE FROM cache WHERE key = ? AND expires <= ?",
+                    (key, now),
+                )
+                added = self._db.execute(
+                    "INSERT OR IGNORE INTO cache (key, value, expires) "
+                    "VALUES (?, ?, ?)",
+                    (key, value, now + ttl),
+                ).rowcount == 1
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+            self._db.execute("COMMIT")
+        return added
+
+    def delete(self, key):
+        """Удаляет ключ."""
+        with self._lock:
+            self._db.execute("DELETE FROM cache WHERE key = ?", (key,))
+
+
+class RespCacheBackend(CacheBackend):
+    """Кэш на сервере с протоколом Redis: GET, SET с PX и NX, DEL."""
+
+    def __init__(self, url, timeout=1.0):
+        """
+        Подключается к серверу по адресу вида redis://host:port/db.
+        Соединение открывается при первом запросе и после обрыва.
+        """
+        parts = urlsplit(url if "//" in url else "redis://" + url)
+        self.address = (parts.hostname or "127.0.0.1", parts.port or 6379)
+        self.db = parts.path.strip("/") or None
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._socket = None
+        self._file = None
+
+    def get(self, key):
+        """Значение ключа или None, если его нет или срок истёк."""
+        return self.command("GET", key)
+
+    def set(self, key, value, ttl):
+        """Сохраняет значение на ttl секунд."""
+        self.command("SET", key, value, "PX", int(ttl * 1000))
+
+    def add(self, key, value, ttl):
+        """Сохраняет значение, только если ключа нет; возвращает успех."""
+        return self.command(
+            "SET", key, value, "PX", int(ttl * 1000), "NX"
+        ) is not None
+
+    def delete(self, key):
+        """Удаляет ключ."""
+        self.command("DEL", key)
+
+    def command(self, *args):
+        """Выполняет команду и возвращает ответ сервера."""
+        with self._lock:
+            try:
+                if self._socket is None:
+                    self._connect()
+                self._send(args)
+                return self._read()
+            except OSError as error:
+                self._close()
+                raise CacheError(f"Сервер кэша недоступен: {error}") from error
+
+    def close(self):
+        """Закрывает соединение."""
+        with self._lock:
+            self._close()
+
+    def _connect(self):
+        self._socket = socket.create_connection(self.address, self.timeout)
+        self._file = self._socket.makefile("rb")
+        if self.db:
+            self._send(("SELECT", self.db))
+            self._read()
+
+    def _close(self):
+        if self._socket is not None:
+            self._file.close()
+            self._socket.close()
+        self._socket = self._file = None
+
+    def _send(self, args):
+        chunks = [f"*{len(args)}\r\n".encode()]
+        for arg in args:
+            data = str(arg).encode()
+            chunks.append(b"$%d\r\n%s\r\n" % (len(data), data))
+        self._socket.sendall(b"".join(chunks))
+
+    def _read(self):
+        line = self._file.readline()
+        if not line.endswith(b"\r\n"):
+            raise OSError("соединение закрыто")
+        kind, rest = line[:1], line[1:-2]
+        if kind == b"+":
+            return rest.decode()
+        if kind == b"-":
+            raise CacheError(rest.decode())
+        if kind == b":":
+            return int(rest)
+        if kind == b"$":
+            size = int(rest)
+            if size < 0:
+                return None
+            data = self._file.read(size + 2)
+            return data[:-2].decode()
+        if kind == b"*":
+            size = int(rest)
+            return None if size < 0 else [self._read() for _ in range(size)]
+        raise CacheError(f"Неожиданный ответ сервера кэша: {line!r}")
+
+
+BACKENDS = {
+    "memory": lambda location: MemoryCacheBackend(),
+    "sqlite": SQLiteCacheBackend,
+    "redis": RespCacheBackend,
+}
+
+
+class ResponseCache:
+    """Кэш ответов API с защитой от одновременной загрузки."""
+
+    def __init__(self, backend, ttl, lock_ttl=10.0, poll=0.05,
+                 sleep=time.sleep, clock=time.monotonic, max_wait=None):
+        """
+        Создаёт кэш поверх хранилища backend.
+        Ответ хранится ttl секунд. Экземпляр, загружающий ответ, держит
+        блокировку ключа не дольше lock_ttl секунд; остальные проверяют
+        кэш каждые poll секунд, а через max_wait секунд (по умолчанию
+        lock_ttl) загружают ответ сами.
+        """
+        self.backend = backend
+        self.ttl = ttl
+        self.lock_ttl = lock_ttl
+        self.max_wait = lock_ttl if max_wait is None else max_wait
+        self.poll = poll
+        self.sleep = sleep
+        self.clock = clock
+        self.owner = uuid.uuid4().hex
+        self._guard = threading.Lock()
+        self._loading = {}
+        metrics.register_gauge("response_cache_hit_rate", self.hit_rate)
+
+    def fetch(self, token, from_date, load):
+        """
+        Возвращает ответ для токена с позиции from_date.
+        load() загружает ответ из API, если подходящего нет в кэше.
+        Ошибки хранилища не мешают опросу: ответ загружается напрямую, а
+        после загрузки не приводят к повторному запросу к API.
+        """
+        key = token_key(token)
+        try:
+            answer = self._get(key, from_date)
+            if answer is not None:
+                metrics.inc("response_cache_hits")
+                return answer
+            return self._load(key, from_date, load)
+        except BACKEND_ERRORS as error:
+            self._failed(error)
+            metrics.inc("response_cache_misses")
+            return load()
+
+    def hit_rate(self):
+        """Доля запросов, на которые ответил кэш."""
+        hits = metrics.value("response_cache_hits")
+        total = hits + metrics.value("response_cache_misses")
+        return hits / total if total else None
+
+    def _failed(self, error):
+        metrics.inc("response_cache_errors")
+        logging.warning(f"Кэш ответов недоступен: {error}")
+
+    @contextmanager
+    def _key_lock(self, key):
+        # Блокировка на ключ живёт, пока её ждёт или держит хоть один поток.
+        with self._guard:
+            entry = self._loading.setdefault(key, [threading.Lock(), 0])
+            entry[1] += 1
+        try:
+            with entry[0]:
+                yield
+        finally:
+            with self._guard:
+                entry[1] -= 1
+                if not entry[1]:
+                    del self._loading[key]
+
+    def _load(self, key, from_date, load):
+        # Ответ другого экземпляра ждём без блокировки ключа: её держит
+        # только поток, который сам загружает ответ.
+        lock = key + ":lock"
+        with self._key_lock(key):
+            answer = self._get(key, from_date)
+            if answer is not None:
+                metrics.inc("response_cache_hits")
+                return answer
+            if self.backend.add(lock, self.owner, self.lock_ttl):
+                return self._store(key, lock, from_date, load)
+        answer = self._wait(key, from_date)
+        if answer is not None:
+            metrics.inc("response_cache_hits")
+            return answer
+        return self._store(key, lock, from_date, load)
+
+    def _store(self, key, lock, from_date, load):
+        metrics.inc("response_cache_misses")
+        # Ответ уже получен, поэтому ошибки хранилища после load() только
+        # учитываются: иначе fetch запросил бы API повторно.
+        try:
+            answer = load()
+            if (isinstance(answer, dict)
+                    and isinstance(answer.get("homeworks"), list)):
+                try:
+                    self.backend.set(key, json.dumps(
+                        {"from_date": from_date, "answer": answer}
+                    ), self.ttl)
+                except BACKEND_ERRORS as error:
+                    self._failed(error)
+            return answer
+        finally:
+            try:
+                if self.backend.get(lock) == self.owner:
+                    self.backend.delete(lock)
+            except BACKEND_ERRORS as error:
+                self._failed(error)
+
+    def _wait(self, key, from_date):
+        metrics.inc("response_cache_waits")
+        deadline = self.clock() + self.max_wait
+        while self.clock() < deadline:
+            self.sleep(self.poll)
+            answer = self._get(key, from_date)
+            if answer is not None:
+                return answer
+        return None
+
+    def _get(self, key, from_date):
+        value = self.backend.get(key)
+        if value is None:
+            return None
+        entry = json.loads(value)
+        answer = entry["answer"]
+        current = answer.get("current_date", from_date)
+        # Позиция, равная current_date, уже догнала ответ: он не содержит
+        # ничего нового, и такой опрос должен идти в API.
+        if entry["from_date"] <= from_date < current:
+            return answer
+        return None
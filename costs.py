@@ -0,0 +1,165 @@
+"""
+Учёт затрат получателей и квоты.
+
+Для каждого получателя считаются запросы к API, повторные запросы,
+байты, ошибки и отправленные сообщения. Счётчики ведутся в окне
+window секунд; когда окно истекает, они переносятся в итоги и
+обнуляются. Получатель, превысивший квоту в текущем окне, опрашивается
+реже до конца окна (throttle) или не опрашивается совсем (pause).
+"""
+
+import logging
+import threading
+import time
+
+import metrics
+
+CALLS = "calls"
+RETRIES = "retries"
+BYTES = "bytes"
+ERRORS = "errors"
+SENDS = "sends"
+FIELDS = (CALLS, RETRIES, BYTES, ERRORS, SENDS)
+INDEX = {field: index for index, field in enumerate(FIELDS)}
+
+THROTTLE = "throttle"
+PAUSE = "pause"
+
+
+def parse_quotas(text):
+    """
+    Разбирает квоты вида "calls=360,errors=60" в словарь.
+    Неизвестные поля приводят к ValueError.
+    """
+    quotas = {}
+    for item in (text or "").split(","):
+        if not item.strip():
+            continue
+        field, _, limit = item.partition("=")
+        field = field.strip()
+        if field not in INDEX:
+            raise ValueError(f"Неизвестное поле квоты: {field}")
+        quotas[field] = float(limit)
+    return quotas
+
+
+class CostLedger:
+    """Счётчики затрат получателей в текущем окне и за всё время."""
+
+    def __init__(self, quotas=None, window=3600.0, action=THROTTLE,
+                 clock=time.monotonic):
+        """
+        Создаёт пустые счётчики.
+        quotas — предельные значения полей за окно window секунд; action —
+        что делать с получателем сверх квоты: THROTTLE или PAUSE.
+        """
+        self._lock = threading.Lock()
+        self.clock = clock
+        self.configure(quotas, window, action)
+        self.current = {}
+        self.totals = {}
+        self.limited = {}
+
+    def configure(self, quotas, window, action):
+        """Задаёт квоты, длину окна и действие сверх квоты."""
+        if action not in (THROTTLE, PAUSE):
+            raise ValueError(f"Неизвестное действие сверх квоты: {action}")
+        with self._lock:
+            self.quotas = dict(quotas or {})
+            self.window = window
+            self.action = action
+            self._window_end = self.clock() + window
+
+    def add(self, tenant, field, amount=1):
+        """Учитывает amount единиц поля field для получателя tenant."""
+        index = INDEX[field]
+        with self._lock:
+            self._roll()
+            row = self.current.get(tenant)
+            if row is None:
+                row = self.current[tenant] = [0] * len(FIELDS)
+            row[index] += amount
+            limit = self.quotas.get(field)
+            if (limit is None or row[index] <= limit
+                    or tenant in self.limited):
+                return
+            self.limited[tenant] = limit
+        metrics.inc("quota_exceeded")
+        logging.warning(
+            f"Получатель {tenant} превысил квоту {field}={limit:g} "
+            f"за {self.window:g} с."
+        )
+
+    def delay(self, tenant):
+        """
+        Секунды, на которые надо отложить опрос получателя; 0 — в квоте.
+        При THROTTLE опросы идут не чаще, чем позволяет превышенная квота
+        в среднем по окну, при PAUSE — возобновляются со следующим окном.
+        """
+        with self._lock:
+            self._roll()
+            limit = self.limited.get(tenant)
+            if limit is None:
+                return 0.0
+            remaining = self._window_end - self.clock()
+            if self.action == PAUSE or limit <= 0:
+                return remaining
+            return min(self.window / limit, remaining)
+
+    def report(self, top=10, by=CALLS):
+        """
+        Возвращает самых затратных получателей по полю by.
+        Получатели ранжируются в текущем окне и за всё время; результат —
+        словарь для JSON.
+        """
+        index = INDEX[by]
+        with self._lock:
+            self._roll()
+            current = {name: list(row) for name, row in self.current.items()}
+            totals = {name: list(row) for name, row in self.totals.items()}
+            limited = set(self.limited)
+            remaining = self._window_end - self.clock()
+
+        def ranked(table):
+            rows = sorted(table.items(), key=lambda item: item[1][index],
+                          reverse=True)[:top]
+            return [{"tenant": name, **dict(zip(FIELDS, row)),
+                     "limited": name in limited} for name, row in rows]
+
+        for name, row in current.items():
+            total = totals.setdefault(name, [0] * len(FIELDS))
+            for position, value in enumerate(row):
+                total[position] += value
+        return {
+            "by": by,
+            "window": self.window,
+            "window_remaining": remaining,
+            "quotas": self.quotas,
+            "action": self.action,
+            "current": ranked(current),
+            "totals": ranked(totals),
+        }
+
+    def reset(self):
+        """Обнуляет счётчики и снимает ограничения."""
+        with self._lock:
+            self.current.clear()
+            self.totals.clear()
+            self.limited.clear()
+            self._window_end = self.clock() + self.window
+
+    def _roll(self):
+        now = self.clock()
+        if now < self._window_end:
+            return
+        for name, row in self.current.items():
+            total = self.totals.setdefault(name, [0] * len(FIELDS))
+            for index, value in enumerate(row):
+                total[index] += value
+        self.current.clear()
+        self.limited.clear()
+        skipped = (now - self._window_end) // self.window + 1
+        self._window_end += skipped * self.window
+
+
+ledger = CostLedger()
@@ -0,0 +1,103 @@
+"""
+Учёт уже отправленных статусов домашних работ.
+
+По умолчанию для каждой работы хранится отпечаток: 64-битный хэш её
+идентификатора и код статуса. Отпечатки лежат в отсортированных
+массивах, поэтому на работу уходит 9 байт вместо строки с текстом
+уведомления. Прежнее сравнение по тексту доступно в режиме TEXT.
+"""
+
+from array import array
+from bisect import bisect_left
+import hashlib
+import sys
+
+FINGERPRINT = "fingerprint"
+TEXT = "text"
+
+STATUS_CODES = {"reviewing": 1, "approved": 2, "rejected": 3}
+UNKNOWN_STATUS = 255
+
+
+def fingerprint(homework_id):
+    """Возвращает 64-битный отпечаток идентификатора работы."""
+    digest = hashlib.blake2b(str(homework_id).encode(), digest_size=8)
+    return int.from_bytes(digest.digest(), "little")
+
+
+class FingerprintSet:
+    """Коды последних статусов работ, упорядоченные по отпечатку."""
+
+    __slots__ = ("keys", "codes")
+
+    def __init__(self):
+        """Создаёт пустой набор."""
+        self.keys = array("Q")
+        self.codes = array("B")
+
+    def __len__(self):
+        """Число известных работ."""
+        return len(self.keys)
+
+    def is_new(self, homework_id, status, message):
+        """Отличается ли статус работы от запомненного."""
+        key = fingerprint(homework_id)
+        index = bisect_left(self.keys, key)
+        return not (
+            index < len(self.keys) and self.keys[index] == key
+            and self.codes[index] == STATUS_CODES.get(status, UNKNOWN_STATUS)
+        )
+
+    def remember(self, homework_id, status, message):
+        """Запоминает статус работы."""
+        key = fingerprint(homework_id)
+        code = STATUS_CODES.get(status, UNKNOWN_STATUS)
+        index = bisect_left(self.keys, key)
+        if index < len(self.keys) and self.keys[index] == key:
+            self.codes[index] = code
+        else:
+            self.keys.insert(index, key)
+            self.codes.insert(index, code)
+
+    def nbytes(self):
+        """Объём памяти, занимаемый набором, в байтах."""
+        return (sys.getsizeof(self) + sys.getsizeof(self.keys)
+                + sys.getsizeof(self.codes))
+
+
+class TextSet:
+    """Тексты последних уведомлений по работам."""
+
+    __slots__ = ("messages",)
+
+    def __init__(self):
+        """Создаёт пустой набор."""
+        self.messages = {}
+
+    def __len__(self):
+        """Число известных работ."""
+        return len(self.messages)
+
+    def is_new(self, homework_id, status, message):
+        """Отличается ли текст уведомления от запомненного."""
+        return self.messages.get(homework_id) != message
+
+    def remember(self, homework_id, status, message):
+        """Запоминает текст уведомления."""
+        self.messages[homework_id] = message
+
+    def nbytes(self):
+        """Объём памяти, занимаемый набором, в байтах."""
+        return (sys.getsizeof(self) + sys.getsizeof(self.messages) + sum(
+            sys.getsizeof(key) + sys.getsizeof(value)
+            for key, value in self.messages.items()
+        ))
+
+
+def make(mode):
+    """Создаёт пустой набор для режима FINGERPRINT или TEXT."""
+    if mode == FINGERPRINT:
+        return FingerprintSet()
+    if mode == TEXT:
+        return TextSet()
+    raise ValueError(f"Неизвестный режим учёта статусов: {mode}")
@@ -0,0 +1,86 @@
+"""
+Сводка изменений статусов.
+
+Изменения для одного чата копятся в течение окна и уходят одним
+сообщением. Если за окно одна работа сменила несколько статусов,
+в сводку попадает только последний. Сводка удаляется только после
+отправки; если отправить её не удалось, она ждёт повтора RETRY_AFTER
+секунд и дополняется новыми изменениями.
+"""
+
+import hashlib
+
+import metrics
+
+SEPARATOR = "\n\n"
+RETRY_AFTER = 30  # Пауза перед повторной отправкой сводки, секунды
+
+
+class Digest:
+    """Копит изменения статусов по чатам."""
+
+    def __init__(self, window):
+        """Задаёт окно в секундах; 0 — объединять в пределах опроса."""
+        self.window = window
+        self._pending = {}
+
+    def __len__(self):
+        """Число чатов с неотправленными изменениями."""
+        return len(self._pending)
+
+    def __contains__(self, chat_id):
+        """Есть ли у чата неотправленные изменения."""
+        return chat_id in self._pending
+
+    def add(self, chat_id, homework, key, message, now):
+        """Добавляет изменение статуса работы homework для чата."""
+        entry = self._pending.get(chat_id)
+        if entry is None:
+            entry = self._pending[chat_id] = [now + self.window, {}, 0]
+        entry[1][homework] = (key, message)
+        entry[2] += 1
+        metrics.inc("digest_changes")
+
+    def next_deadline(self):
+        """Ближайший момент отправки сводки или None."""
+        return min(
+            (entry[0] for entry in self._pending.values()),
+            default=None,
+        )
+
+    def due(self, now):
+        """Чаты, окно сводки которых закончилось."""
+        return [
+            chat_id for chat_id, entry in self._pending.items()
+            if entry[0] <= now
+        ]
+
+    def render(self, chat_id):
+        """Возвращает сводку чата: (chat_id, ключ, текст)."""
+        changes = self._pending[chat_id][1]
+        keys = [key for key, _ in changes.values()]
+        if len(keys) == 1:
+            key = keys[0]
+        else:
+            key = "digest:" + hashlib.sha1(
+                "\0".join(keys).encode()
+            ).hexdigest()
+        return chat_id, key, SEPARATOR.join(
+            message for _, message in changes.values()
+        )
+
+    def sent(self, chat_id):
+        """Удаляет отправленную сводку чата."""
+        count = self._pending.pop(chat_id)[2]
+        metrics.inc("digest_messages")
+        metrics.inc("digest_calls_saved", count - 1)
+
+    def postpone(self, chat_id, now):
+        """Откладывает неотправленную сводку чата на RETRY_AFTER секунд."""
+        self._pending[chat_id][0] = now + RETRY_AFTER
+        metrics.inc("digest_retries")
+
+    def discard(self, chat_id):
+        """Удаляет сводку чата без отправки."""
+        del self._pending[chat_id]
+        metrics.inc("digest_discarded")
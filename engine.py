@@ -0,0 +1,151 @@
+"""
+Параллельное выполнение запросов к API в пуле потоков.
+
+telebot и requests синхронные, поэтому запросы для многих получателей
+выполняются в ограниченном пуле потоков, а результаты возвращаются в
+вызывающий поток, где и обрабатываются изменения статусов. AsyncioEngine
+выполняет те же задачи в цикле событий: сопрограммы — в самом цикле,
+синхронные функции — в пуле потоков цикла.
+"""
+
+import asyncio
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+import threading
+import time
+
+import eventloop
+import metrics
+
+
+class DeadlineExceeded(TimeoutError):
+    """Задача не завершилась за отведённое время."""
+
+
+class ThreadPoolEngine:
+    """Ограниченный пул потоков с дедлайнами и обратным давлением."""
+
+    def __init__(self, workers, deadline=None, max_pending=None):
+        """
+        Создаёт пул.
+        workers — число потоков, deadline — предельное время задачи в
+        секундах, max_pending — сколько задач может быть в работе; при
+        превышении постановка новых задач ждёт завершения прежних.
+        """
+        self.workers = workers
+        self.deadline = deadline
+        self._pool = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="poll"
+        )
+        self._slots = threading.BoundedSemaphore(max_pending or workers * 2)
+
+    def __enter__(self):
+        """Возвращает сам пул."""
+        return self
+
+    def __exit__(self, *exc_info):
+        """Останавливает пул."""
+        self.close()
+
+    def map(self, items, func):
+        """
+        Выполняет func для каждого элемента.
+        Результаты выдаются по мере готовности парами (элемент, результат);
+        исключение, в том числе DeadlineExceeded, возвращается как результат.
+        """
+        items = iter(items)
+        running = {}
+        exhausted = False
+        while True:
+            while not exhausted and self._slots.acquire(blocking=not running):
+                item = next(items, StopIteration)
+                if item is StopIteration:
+                    self._slots.release()
+                    exhausted = True
+                    break
+                future = self._submit(func, item)
+                future.add_done_callback(lambda _: self._slots.release())
+                running[future] = (item, time.monotonic())
+            if not running:
+                return
+            yield from self._collect(running)
+
+    def _submit(self, func, item):
+        return self._pool.submit(func, item)
+
+    def _collect(self, running):
+        timeout = None
+        if self.deadline is not None:
+            oldest = min(started for _, started in running.values())
+            timeout = max(oldest + self.deadline - time.monotonic(), 0)
+        done, _ = wait(running, timeout=timeout, return_when=FIRST_COMPLETED)
+        for future in done:
+            item, _ = running.pop(future)
+            error = future.exception()
+            yield item, future.result() if error is None else error
+        if self.deadline is None:
+            return
+        now = time.monotonic()
+        for future, (item, started) in list(running.items()):
+            if now - started >= self.deadline:
+                del running[future]
+                future.cancel()
+                metrics.inc("engine_deadline_exceeded")
+                yield item, DeadlineExceeded(
+                    f"Задача не завершилась за {self.deadline} с."
+                )
+
+    def close(self):
+        """Останавливает пул, не дожидаясь зависших задач."""
+        self._pool.shutdown(wait=False)
+
+
+class AsyncioEngine(ThreadPoolEngine):
+    """Пул с задачами в цикле событий, работающем в отдельном потоке."""
+
+    def __init__(self, workers, deadline=None, max_pending=None,
+                 loop=eventloop.ASYNCIO, lag_interval=0.1, slow_callback=0.1):
+        """
+        Создаёт пул и запускает цикл событий реализации loop.
+        workers — число потоков для синхронных функций, max_pending —
+        сколько задач может быть в работе, включая сопрограммы. Задержка
+        цикла замеряется каждые lag_interval секунд; блокировка цикла
+        дольше slow_callback секунд попадает в лог.
+        """
+        super().__init__(workers, deadline, max_pending)
+        self.loop = eventloop.new_event_loop(loop)
+        self.loop.set_default_executor(self._pool)
+        self._thread = threading.Thread(
+            target=self.loop.run_forever, name="loop", daemon=True
+        )
+        self._thread.start()
+        self.monitor = eventloop.LoopMonitor(
+            self.loop, self._thread, lag_interval, slow_callback
+        ).start()
+
+    def _submit(self, func, item):
+        return asyncio.run_coroutine_threadsafe(
+            self._call(func, item), self.loop
+        )
+
+    async def _call(self, func, item):
+        if asyncio.iscoroutinefunction(func):
+            return await func(item)
+        return await self.loop.run_in_executor(None, func, item)
+
+    def close(self):
+        """
+        Останавливает замеры, цикл событий и пул потоков.
+        Незавершённые задачи цикла отменяются.
+        """
+        self.monitor.stop()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join()
+        pending = asyncio.all_tasks(self.loop)
+        for task in pending:
+            task.cancel()
+        if pending:
+            self.loop.run_until_complete(
+                asyncio.gather(*pending, return_exceptions=True)
+            )
+        self.loop.close()
+        super().close()
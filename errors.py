@@ -0,0 +1,91 @@
+"""
+Дешёвая обработка ошибок опроса.
+
+Ошибки классифицируются по типу исключения, без разбора текста.
+Полная трассировка пишется в лог только при первом появлении ошибки
+данного типа в данном месте кода или для выбранной доли повторов;
+остальные повторы логируются одной строкой и учитываются в метриках.
+"""
+
+import logging
+import random
+
+from telebot import apihelper
+
+import metrics
+from exceptions import EndpointError, ResponseFormatError
+
+ENDPOINT = "endpoint"
+FORMAT = "format"
+TELEGRAM = "telegram"
+OTHER = "other"
+
+CATEGORIES = {
+    EndpointError: ENDPOINT,
+    ResponseFormatError: FORMAT,
+    TypeError: FORMAT,
+    KeyError: FORMAT,
+    apihelper.ApiException: TELEGRAM,
+}
+
+_resolved = {}
+
+
+def category(error):
+    """Категория ошибки по ближайшему известному типу в её иерархии."""
+    error_type = type(error)
+    found = _resolved.get(error_type)
+    if found is None:
+        found = next(
+            (CATEGORIES[base] for base in error_type.__mro__
+             if base in CATEGORIES),
+            OTHER,
+        )
+        _resolved[error_type] = found
+    return found
+
+
+def signature(error):
+    """Признак повтора ошибки: тип и аргументы, без форматирования текста."""
+    return type(error), error.args
+
+
+def origin(error):
+    """Место в коде, где возникла ошибка: файл и номер строки."""
+    traceback = error.__traceback__
+    if traceback is None:
+        return None
+    while traceback.tb_next is not None:
+        traceback = traceback.tb_next
+    return traceback.tb_frame.f_code.co_filename, traceback.tb_lineno
+
+
+class ErrorReporter:
+    """Логирует ошибки, выбирая, для каких писать трассировку."""
+
+    def __init__(self, sample=0.0, rng=random.random):
+        """
+        Создаёт журнал ошибок.
+        sample — доля повторов, для которых пишется полная трассировка.
+        """
+        self.sample = sample
+        self.rng = rng
+        self._seen = set()
+
+    def wants_traceback(self, error):
+        """Нужна ли трассировка: первое появление или попадание в выборку."""
+        key = (type(error), origin(error))
+        if key not in self._seen:
+            self._seen.add(key)
+            return True
+        return self.sample > 0 and self.rng() < self.sample
+
+    def log(self, error):
+        """Логирует ошибку опроса и учитывает её в метриках."""
+        metrics.inc("errors_" + category(error))
+        if self.wants_traceback(error):
+            logging.error("Ошибка в работе программы: %s", error,
+                          exc_info=error)
+        else:
+            metrics.inc("errors_traceback_skipped")
+            logging.error("Ошибка в работе программы: %s", error)
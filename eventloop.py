@@ -0,0 +1,126 @@
+"""
+Выбор реализации цикла событий и наблюдение за его задержкой.
+
+Цикл создаётся из стандартного asyncio или из uvloop, если он установлен.
+LoopMonitor раз в interval секунд засыпает в цикле и замеряет, насколько
+позже срока он проснулся. Отдельный поток следит за тем, чтобы замеры
+шли: если цикл не отвечает дольше slow секунд, значит, его блокирует
+синхронный вызов, например requests или telebot, и в лог пишется стек
+потока цикла в момент блокировки.
+"""
+
+import asyncio
+from collections import deque
+import logging
+import math
+import sys
+import threading
+import time
+import traceback
+
+import metrics
+
+ASYNCIO = "asyncio"
+UVLOOP = "uvloop"
+LOOPS = (ASYNCIO, UVLOOP)
+
+try:
+    import uvloop
+except ImportError:
+    uvloop = None
+
+
+def new_event_loop(kind=ASYNCIO):
+    """
+    Создаёт цикл событий выбранной реализации.
+    Если uvloop не установлен, создаётся цикл asyncio.
+    """
+    if kind not in LOOPS:
+        raise ValueError(f"Неизвестная реализация цикла событий: {kind}")
+    if kind == UVLOOP:
+        if uvloop is not None:
+            return uvloop.new_event_loop()
+        logging.warning("uvloop не установлен, используется цикл asyncio.")
+    return asyncio.new_event_loop()
+
+
+class LoopMonitor:
+    """Замеряет задержку цикла событий и ищет блокирующие вызовы."""
+
+    def __init__(self, loop, thread, interval=0.1, slow=0.1, window=1000):
+        """
+        Создаёт наблюдение за циклом loop, работающим в потоке thread.
+        interval — период замеров в секундах; slow — сколько секунд цикл
+        может не отвечать, прежде чем вызов считается блокирующим; window —
+        сколько последних замеров хранить.
+        """
+        self.loop = loop
+        self.thread = thread
+        self.interval = interval
+        self.slow = slow
+        self.lags = deque(maxlen=window)
+        self.stalls = 0
+        self._beat = time.monotonic()
+        self._stopped = threading.Event()
+        self._sampler = None
+        self._watchdog = None
+
+    def start(self):
+        """Запускает замеры в цикле и сторожевой поток."""
+        self._beat = time.monotonic()
+        self._sampler = asyncio.run_coroutine_threadsafe(
+            self._sample(), self.loop
+        )
+        self._watchdog = threading.Thread(
+            target=self._watch, name="loop-watchdog", daemon=True
+        )
+        self._watchdog.start()
+        return self
+
+    def stop(self):
+        """Останавливает замеры."""
+        self._stopped.set()
+        if self._sampler is not None:
+            self._sampler.cancel()
+
+    def report(self):
+        """Задержка цикла в миллисекундах: p50, p99 и наибольшая."""
+        ordered = sorted(self.lags)
+        if not ordered:
+            return {"p50": None, "p99": None, "max": None,
+                    "stalls": self.stalls}
+
+        def rank(share):
+            return ordered[max(math.ceil(share * len(ordered)), 1) - 1]
+
+        return {
+            "p50": rank(0.5) * 1000,
+            "p99": rank(0.99) * 1000,
+            "max": ordered[-1] * 1000,
+            "stalls": self.stalls,
+        }
+
+    async def _sample(self):
+        while True:
+            started = time.monotonic()
+            await asyncio.sleep(self.interval)
+            self._beat = time.monotonic()
+            lag = max(self._beat - started - self.interval, 0.0)
+            self.lags.append(lag)
+            metrics.set_gauge("loop_lag_ms", lag * 1000)
+
+    def _watch(self):
+        flagged = None
+        while not self._stopped.wait(self.slow / 2):
+            beat = self._beat
+            stalled = time.monotonic() - beat - self.interval
+            if stalled < self.slow or flagged == beat:
+                continue
+            flagged = beat
+            self.stalls += 1
+            metrics.inc("loop_slow_callbacks")
+            frame = sys._current_frames().get(self.thread.ident)
+            stack = "".join(traceback.format_stack(frame)) if frame else ""
+            logging.warning(
+                f"Цикл событий заблокирован дольше {self.slow} с:\n{stack}"
+            )
@@ -0,0 +1,231 @@
+"""
+HTTP-эндпоинты проверки состояния бота.
+
+Сервер работает в отдельном потоке и отвечает на /healthz, /readyz,
+/tenants и /metrics. Основной цикл только записывает отметки времени в
+HealthState, а обработчики запросов их читают, поэтому опрос API и ответы
+сервера не блокируют друг друга.
+"""
+
+from collections import OrderedDict
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from itertools import chain, islice
+import json
+import math
+import threading
+import time
+from urllib.parse import parse_qs, urlsplit
+
+import metrics
+
+
+def query_int(query, name, default=None):
+    """
+    Неотрицательное целое из параметра name строки запроса.
+    Если параметр задан неверно, выбрасывает ValueError.
+    """
+    values = query.get(name)
+    if not values:
+        return default
+    number = int(values[0])
+    if number < 0:
+        raise ValueError(f"Параметр {name} не может быть отрицательным.")
+    return number
+
+
+class HealthState:
+    """
+    Отметки времени, по которым оценивается состояние цикла.
+
+    Получатели хранятся в порядке последнего успешного ответа: сначала
+    получатели, отстающие дольше stale_after секунд, затем остальные.
+    Получатель переходит в отстающие при проверке состояния, а обратно —
+    при успешном ответе, поэтому сводка не перебирает всех получателей.
+    """
+
+    __slots__ = ("started", "heartbeat", "loop_lag", "last_success",
+                 "stale_after", "_fresh", "_stale", "_lock")
+
+    def __init__(self, stale_after=math.inf):
+        """
+        Создаёт состояние только что запущенного процесса.
+        stale_after — через сколько секунд без успешного ответа
+        получатель считается отстающим.
+        """
+        self.started = time.monotonic()
+        self.heartbeat = self.started
+        self.loop_lag = 0.0
+        self.last_success = None
+        self.stale_after = stale_after
+        self._fresh = OrderedDict()
+        self._stale = OrderedDict()
+        self._lock = threading.Lock()
+
+    def beat(self, lag=0.0):
+        """Отмечает очередную итерацию цикла и её опоздание."""
+        self.heartbeat = time.monotonic()
+        self.loop_lag = max(lag, 0.0)
+
+    def alive(self):
+        """
+        Отмечает, что цикл работает, не меняя его опоздание.
+        Вызывается после каждого опроса, чтобы долгий обход получателей
+        не выглядел зависанием.
+        """
+        self.heartbeat = time.monotonic()
+
+    def mark_success(self, tenant, now=None):
+        """Отмечает успешный ответ API для получателя tenant."""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            self.last_success = now
+            self._stale.pop(tenant, None)
+            self._fresh.pop(tenant, None)
+            self._fresh[tenant] = now
+
+    def report(self):
+        """
+        Возвращает состояние в виде словаря для JSON.
+        По получателям отдаётся только сводка: их число, наибольшая
+        давность успешного ответа и число отстающих.
+        """
+        now = time.monotonic()
+        with self._lock:
+            self._expire(now)
+            oldest = self._oldest()
+            tenants = len(self._fresh) + len(self._stale)
+            stale = len(self._stale)
+        return {
+            "uptime": now - self.started,
+            "since_heartbeat": now - self.heartbeat,
+            "since_last_success": (
+                None if self.last_success is None
+                else now - self.last_success
+            ),
+            "loop_lag": self.loop_lag,
+            "send_backlog": metrics.value("send_backlog"),
+            "tenants": tenants,
+            "max_staleness": None if oldest is None else now - oldest,
+            "stale_tenants": stale,
+        }
+
+    def staleness(self, top=None):
+        """
+        Возвращает давность успешного ответа по получателям, начиная с
+        самых давних. Если задан top, только top получателей.
+        """
+        now = time.monotonic()
+        with self._lock:
+            seen = list(islice(
+                chain(self._stale.items(), self._fresh.items()), top
+            ))
+        return {tenant: now - moment for tenant, moment in seen}
+
+    def _expire(self, now):
+        cutoff = now - self.stale_after
+        while self._fresh:
+            tenant, moment = next(iter(self._fresh.items()))
+            if moment >= cutoff:
+                break
+            del self._fresh[tenant]
+            self._stale[tenant] = moment
+
+    def _oldest(self):
+        for table in (self._stale, self._fresh):
+            for moment in table.values():
+                return moment
+        return None
+
+
+class HealthServer:
+    """Встроенный HTTP-сервер с эндпоинтами состояния."""
+
+    def __init__(self, state, live_after, ready_after):
+        """
+        Настраивает пороги.
+        live_after — допустимая пауза между итерациями цикла,
+        ready_after — допустимый возраст последнего успешного ответа API.
+        """
+        self.state = state
+        self.live_after = live_after
+        self.ready_after = ready_after
+        self.routes = {
+            "/healthz": self.healthz,
+            "/readyz": self.readyz,
+            "/tenants": self.tenants,
+            "/metrics": self.metrics,
+        }
+        self._server = None
+
+    def register(self, path, handler):
+        """
+        Добавляет эндпоинт.
+        handler принимает параметры запроса и возвращает код ответа и словарь.
+        """
+        self.routes[path] = handler
+
+    def healthz(self, query=None):
+        """Процесс жив, если цикл не завис дольше live_after."""
+        report = self.state.report()
+        alive = report["since_heartbeat"] <= self.live_after
+        return (HTTPStatus.OK if alive
+                else HTTPStatus.SERVICE_UNAVAILABLE), report
+
+    def readyz(self, query=None):
+        """Процесс готов, если API недавно отвечало успешно."""
+        status, report = self.healthz()
+        age = report["since_last_success"]
+        if age is None or age > self.ready_after:
+            status = HTTPStatus.SERVICE_UNAVAILABLE
+        return status, report
+
+    def tenants(self, query=None):
+        """Давность успешного ответа по получателям, ?top=N."""
+        return HTTPStatus.OK, self.state.staleness(
+            query_int(query or {}, "top")
+        )
+
+    def metrics(self, query=None):
+        """Отдаёт все счётчики."""
+        return HTTPStatus.OK, metrics.snapshot()
+
+    def start(self, host, port):
+        """Запускает сервер в фоновом потоке."""
+        routes = self.routes
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                url = urlsplit(self.path)
+                handler = routes.get(url.path)
+                if handler is None:
+                    status, body = HTTPStatus.NOT_FOUND, {}
+                else:
+                    try:
+                        status, body = handler(parse_qs(url.query))
+                    except ValueError as error:
+                        status = HTTPStatus.BAD_REQUEST
+                        body = {"error": str(error)}
+                payload = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        self._server.daemon_threads = True
+        thread = threading.Thread(
+            target=self._server.serve_forever, name="health", daemon=True
+        )
+        thread.start()
+        return self._server.server_address
+
+    def stop(self):
+        """Останавливает сервер."""
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
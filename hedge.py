@@ -0,0 +1,123 @@
+"""
+Подстраховочные запросы к API.
+
+Если ответ не пришёл за время, в которое укладывается заданная доля
+недавних запросов, отправляется второй такой же запрос и берётся ответ,
+пришедший первым. Число подстраховочных запросов ограничено бюджетом —
+долей от числа обычных. Запрос requests нельзя прервать, поэтому
+проигравший запрос дорабатывает в фоне, а его ответ отбрасывается.
+"""
+
+from collections import deque
+from concurrent.futures import (
+    FIRST_COMPLETED, ThreadPoolExecutor, TimeoutError, wait,
+)
+import math
+import threading
+import time
+
+import metrics
+
+REFRESH = 50  # Через сколько новых замеров пересчитывать порог
+
+
+class Hedger:
+    """Выполняет вызовы с подстраховкой по наблюдаемой задержке."""
+
+    def __init__(self, quantile=0.95, budget=0.05, workers=4, window=1000,
+                 min_samples=20, burst=10):
+        """
+        Создаёт подстраховку.
+        quantile — доля недавних вызовов, которые должны уложиться в порог;
+        budget — сколько подстраховочных вызовов допускается на один
+        обычный; window — сколько последних замеров учитывать; до
+        min_samples замеров подстраховка не работает; burst — сколько
+        подстраховочных вызовов можно накопить подряд.
+        """
+        self.quantile = quantile
+        self.budget = budget
+        self.min_samples = min_samples
+        self.burst = burst
+        self._samples = deque(maxlen=window)
+        self._since = 0
+        self._threshold = None
+        self._tokens = 0.0
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="hedge"
+        )
+
+    def threshold(self):
+        """Задержка, после которой отправляется второй вызов, или None."""
+        with self._lock:
+            if len(self._samples) < self.min_samples:
+                return None
+            if self._threshold is None or self._since >= REFRESH:
+                ordered = sorted(self._samples)
+                rank = max(math.ceil(self.quantile * len(ordered)), 1)
+                self._threshold = ordered[rank - 1]
+                self._since = 0
+            return self._threshold
+
+    def record(self, latency):
+        """Учитывает задержку успешного вызова."""
+        with self._lock:
+            self._samples.append(latency)
+            self._since += 1
+
+    def call(self, func, *args, on_hedge=None):
+        """
+        Вызывает func(*args) и возвращает первый успешный результат.
+        Если оба вызова завершились ошибкой, выбрасывает последнюю.
+        on_hedge вызывается без аргументов перед подстраховочным вызовом.
+        """
+        with self._lock:
+            self._tokens = min(self._tokens + self.budget, self.burst)
+        delay = self.threshold()
+        if delay is None:
+            return self._timed(func, args)
+        primary = self._pool.submit(self._timed, func, args)
+        try:
+            return primary.result(timeout=delay)
+        except TimeoutError:
+            pass
+        if not self._spend():
+            metrics.inc("hedges_over_budget")
+            return primary.result()
+        metrics.inc("hedges_sent")
+        if on_hedge is not None:
+            on_hedge()
+        hedge = self._pool.submit(self._timed, func, args)
+        return self._first_success({primary, hedge}, hedge)
+
+    def close(self):
+        """Останавливает потоки, не дожидаясь проигравших вызовов."""
+        self._pool.shutdown(wait=False)
+
+    def _spend(self):
+        with self._lock:
+            if self._tokens < 1:
+                return False
+            self._tokens -= 1
+            return True
+
+    def _timed(self, func, args):
+        started = time.monotonic()
+        result = func(*args)
+        self.record(time.monotonic() - started)
+        return result
+
+    def _first_success(self, pending, hedge):
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is not None:
+                    error = future.exception()
+                    continue
+                for other in pending:
+                    other.cancel()
+                if future is hedge:
+                    metrics.inc("hedges_won")
+                return future.result()
+        raise error
@@ -0,0 +1,263 @@
+"""
+Журнал смен статусов домашних работ.
+
+Каждая смена статуса, о которой сообщил бот, дописывается в SQLite.
+Запись идёт в фоновом потоке пачками, поэтому опрос не ждёт диска;
+если очередь записи переполнена, события отбрасываются и учитываются в
+метриках. Пачка, которую не удалось записать, пишется в лог и
+отбрасывается, а запись продолжается со следующей. При записи вердикта
+рядом сохраняется длительность проверки, чтобы медианы считались по
+индексу, а не соединением всего журнала.
+"""
+
+import calendar
+import logging
+import queue
+import sqlite3
+import threading
+import time
+
+import metrics
+from dedup import STATUS_CODES, UNKNOWN_STATUS
+
+REVIEWING = STATUS_CODES["reviewing"]
+APPROVED = STATUS_CODES["approved"]
+REJECTED = STATUS_CODES["rejected"]
+STATUS_NAMES = {code: name for name, code in STATUS_CODES.items()}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tenants (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS events (
+    tenant INTEGER NOT NULL,
+    homework TEXT NOT NULL,
+    lesson TEXT,
+    status INTEGER NOT NULL,
+    at INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS events_tenant ON events (tenant, at);
+CREATE INDEX IF NOT EXISTS events_homework ON events (homework, tenant, at);
+CREATE INDEX IF NOT EXISTS events_at ON events (at);
+CREATE INDEX IF NOT EXISTS events_status ON events (status, tenant);
+CREATE TABLE IF NOT EXISTS reviews (
+    tenant INTEGER NOT NULL,
+    homework TEXT NOT NULL,
+    lesson TEXT,
+    status INTEGER NOT NULL,
+    started INTEGER NOT NULL,
+    duration INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS reviews_lesson
+    ON reviews (status, lesson, duration);
+CREATE INDEX IF NOT EXISTS reviews_tenant
+    ON reviews (status, tenant, duration);
+"""
+
+COHORTS = ("lesson", "tenant")  # Столбцы reviews, по которым есть индекс
+
+TOP_STATUS = """
+SELECT tenants.name, counts.total FROM (
+    SELECT tenant, COUNT(*) AS total FROM events
+    WHERE status = ? GROUP BY tenant
+) AS counts JOIN tenants ON tenants.id = counts.tenant
+ORDER BY counts.total DESC, tenants.name LIMIT ?
+"""
+
+
+def event_time(homework, default):
+    """Время смены статуса из date_updated или default, в секундах."""
+    updated = homework.get("date_updated")
+    if not updated:
+        return int(default)
+    try:
+        return calendar.timegm(time.strptime(updated, "%Y-%m-%dT%H:%M:%SZ"))
+    except ValueError:
+        return int(default)
+
+
+class StatusHistory:
+    """Журнал смен статусов в файле SQLite с фоновой записью."""
+
+    def __init__(self, path, batch_size=500, max_pending=10000,
+                 flush_interval=0.5):
+        """
+        Открывает или создаёт журнал в файле path.
+        Запись идёт пачками до batch_size событий не реже раза в
+        flush_interval секунд; в очереди держится до max_pending событий.
+        """
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(
+            path, check_same_thread=False, isolation_level=None
+        )
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(SCHEMA)
+        self._tenants = dict(
+            (name, tenant_id) for tenant_id, name in
+            self._db.execute("SELECT id, name FROM tenants")
+        )
+        self._queue = queue.Queue(max_pending)
+        self._writer = None
+
+    def append(self, tenant, homework, now=None):
+        """
+        Ставит смену статуса работы в очередь записи, не дожидаясь её.
+        Возвращает False, если очередь переполнена и событие отброшено.
+        """
+        try:
+            self._queue.put_nowait(
+                (tenant, homework, time.time() if now is None else now)
+            )
+        except queue.Full:
+            metrics.inc("history_dropped")
+            return False
+        return True
+
+    def start(self):
+        """Запускает фоновую запись."""
+        self._writer = threading.Thread(
+            target=self._run, name="history", daemon=True
+        )
+        self._writer.start()
+        return self
+
+    def flush(self):
+        """Записывает всё, что уже стоит в очереди, в текущем потоке."""
+        while self._write(self._take(block=False)):
+            pass
+
+    def close(self):
+        """Дописывает очередь, останавливает запись и закрывает файл."""
+        if self._writer is not None:
+            self._queue.put(None)
+            self._writer.join()
+            self._writer = None
+        self.flush()
+        with self._lock:
+            self._db.close()
+
+    def median_review(self, by="lesson", status=APPROVED):
+        """
+        Медиана длительности проверки до вердикта status по когортам.
+        Когорта — урок или получатель. Возвращает список (когорта,
+        медиана в секундах, число проверок). Медиана каждой когорты
+        читается по индексу смещением к середине, без сортировки.
+        """
+        column = by if by in COHORTS else None
+        if column is None:
+            raise ValueError(f"Неизвестная когорта: {by}")
+        result = []
+        with self._lock:
+            counts = self._db.execute(
+                f"SELECT {column}, COUNT(*) FROM reviews WHERE status = ? "
+                f"GROUP BY {column} ORDER BY {column}",
+                (status,),
+            ).fetchall()
+            for cohort, total in counts:
+                middle = [row[0] for row in self._db.execute(
+                    f"SELECT duration FROM reviews "
+                    f"WHERE status = ? AND {column} IS ? "
+                    f"ORDER BY duration LIMIT ? OFFSET ?",
+                    (status, cohort, 2 - total % 2, (total - 1) // 2),
+                )]
+                result.append((cohort, sum(middle) / len(middle), total))
+            if column == "tenant":
+                names = {tenant_id: name for name, tenant_id
+                         in self._tenants.items()}
+                result = sorted((names.get(cohort, cohort), median, total)
+                                for cohort, median, total in result)
+        return result
+
+    def top_tenants(self, status=REJECTED, limit=10):
+        """Получатели с наибольшим числом событий status."""
+        with self._lock:
+            return self._db.execute(TOP_STATUS, (status, limit)).fetchall()
+
+    def _run(self):
+        while True:
+            batch = self._take(block=True)
+            stop = batch and batch[-1] is None
+            events = [item for item in batch if item is not None]
+            try:
+                self._write(events)
+            except Exception as error:
+                metrics.inc("history_failed", len(events))
+                logging.error(f"Журнал статусов: не записано "
+                              f"{len(events)} событий: {error}")
+            if stop:
+                return
+
+    def _take(self, block):
+        batch = []
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            timeout = deadline - time.monotonic()
+            try:
+                if block and timeout > 0:
+                    item = self._queue.get(timeout=timeout)
+                else:
+                    item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            batch.append(item)
+            if item is None:
+                break
+        return batch
+
+    def _write(self, batch):
+        if not batch:
+            return False
+        with self._lock:
+            # Получатели, добавленные в отменённой пачке, из кэша убираются.
+            tenants = dict(self._tenants)
+            self._db.execute("BEGIN")
+            try:
+                for tenant, homework, now in batch:
+                    self._insert(tenant, homework, now)
+            except Exception:
+                self._db.execute("ROLLBACK")
+                self._tenants = tenants
+                raise
+            self._db.execute("COMMIT")
+        metrics.inc("history_events", len(batch))
+        return True
+
+    def _tenant_id(self, name):
+        tenant_id = self._tenants.get(name)
+        if tenant_id is None:
+            tenant_id = self._db.execute(
+                "INSERT INTO tenants (name) VALUES (?)", (name,)
+            ).lastrowid
+            self._tenants[name] = tenant_id
+        return tenant_id
+
+    def _insert(self, tenant, homework, now):
+        tenant_id = self._tenant_id(tenant)
+        work = str(homework.get("id", homework.get("homework_name")))
+        lesson = homework.get("lesson_name")
+        status = STATUS_CODES.get(homework.get("status"), UNKNOWN_STATUS)
+        at = event_time(homework, now)
+        self._db.execute(
+            "INSERT INTO events (tenant, homework, lesson, status, at) "
+            "VALUES (?, ?, ?, ?, ?)",
+            (tenant_id, work, lesson, status, at),
+        )
+        if status not in (APPROVED, REJECTED):
+            return
+        started = self._db.execute(
+            "SELECT at FROM events WHERE homework = ? AND tenant = ? "
+            "AND status = ? AND at <= ? ORDER BY at DESC LIMIT 1",
+            (work, tenant_id, REVIEWING, at),
+        ).fetchone()
+        if started is not None:
+            self._db.execute(
+                "INSERT INTO reviews "
+                "(tenant, homework, lesson, status, started, duration) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (tenant_id, work, lesson, status, started[0],
+                 at - started[0]),
+            )
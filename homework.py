@@ -1,7 +1,14 @@
 """Модуль для отслеживания статуса домашних работ через Telegram бота."""
 
+import argparse
+from collections import deque
+import hashlib
 from http import HTTPStatus
+import json
 import logging
+import math
+import signal
+import sqlite3
 import sys
 import time
 
@@ -9,6 +16,31 @@ import requests
 from dotenv import dotenv_values
 from telebot import TeleBot, apihelper
 
+import backfill
+import broadcast
+import cache
+import costs
+import dedup
+import digest
+import engine
+import errors
+import eventloop
+import health
+import hedge
+import history
+import lease
+import loadtest
+import metrics
+import outbox
+import profiling
+import render
+import scheduler
+import telegram_client
+import tenants
+import traffic_log
+import transfer
+from exceptions import EndpointError, ResponseFormatError
+
 config = dotenv_values(".env")
 
 PRACTICUM_TOKEN = config.get("PRACTICUM_TOKEN")
@@ -19,12 +51,149 @@ RETRY_PERIOD = 600  # Период повторных запросов к API в
 ENDPOINT = "https://practicum.yandex.ru/api/user_api/homework_statuses/"
 HEADERS = {"Authorization": f"OAuth {PRACTICUM_TOKEN}"}
 TIMEOUT = 10  # Таймаут для запросов к API
+TRAFFIC_LOG = config.get("TRAFFIC_LOG")  # Путь к журналу трафика
+# Число профилируемых итераций цикла; если задано, профилирование
+# начинается сразу, иначе его включает сигнал SIGUSR1.
+PROFILE_ITERATIONS = int(config.get("PROFILE_ITERATIONS") or 0)
+PROFILE_DIR = config.get("PROFILE_DIR", ".")
+# Порт эндпоинтов /healthz, /readyz и /metrics; без него сервер не запускается.
+HEALTH_PORT = int(config.get("HEALTH_PORT") or 0)
+HEALTH_HOST = config.get("HEALTH_HOST", "0.0.0.0")
+# Файл JSON Lines со списком получателей; без него бот опрашивает API
+# только для PRACTICUM_TOKEN и пишет в TELEGRAM_CHAT_ID.
+TENANTS_FILE = config.get("TENANTS_FILE")
+# Наибольшая случайная добавка к интервалу опроса в секундах.
+POLL_JITTER = float(config.get("POLL_JITTER") or 0)
+# Что делать, если опрос не успел к следующему сроку: "skip" переносит его
+# на ближайший будущий срок, "catch-up" выполняет пропущенные опросы подряд.
+SCHEDULE_POLICY = config.get("SCHEDULE_POLICY", scheduler.SKIP)
+# Файл SQLite с очередью уведомлений; без него сообщения отправляются сразу.
+OUTBOX_PATH = config.get("OUTBOX_PATH")
+OUTBOX_BATCH = int(config.get("OUTBOX_BATCH") or 100)
+# Сколько раз пытаться отправить уведомление, прежде чем отбросить его.
+OUTBOX_MAX_ATTEMPTS = int(config.get("OUTBOX_MAX_ATTEMPTS") or 20)
+# Окно сводки в секундах: изменения статусов за окно уходят в чат одним
+# сообщением, 0 — объединять только изменения одного опроса.
+DIGEST_WINDOW = config.get("DIGEST_WINDOW")
+# Файл SQLite с позициями опроса: после перезапуска опрос продолжается
+# с сохранённого current_date.
+CURSOR_DB = config.get("CURSOR_DB")
+# Глубина догрузки истории в днях для получателей без сохранённой позиции;
+# 0 — начинать с текущего момента.
+BACKFILL_DAYS = float(config.get("BACKFILL_DAYS") or 0)
+BACKFILL_CONCURRENCY = int(config.get("BACKFILL_CONCURRENCY") or 4)
+# Число потоков для параллельного опроса получателей; 1 — по очереди.
+POLL_WORKERS = int(config.get("POLL_WORKERS") or 1)
+# Предельное время одного опроса в пуле потоков, секунды.
+POLL_DEADLINE = float(config.get("POLL_DEADLINE") or 3 * TIMEOUT)
+# Сколько опросов может одновременно ждать выполнения в пуле.
+POLL_MAX_PENDING = int(config.get("POLL_MAX_PENDING") or 2 * POLL_WORKERS)
+# Где выполнять параллельные опросы: "threads" — пул потоков, "asyncio" —
+# цикл событий реализации EVENT_LOOP ("asyncio" или "uvloop") с пулом
+# потоков для синхронных запросов. Блокировка цикла дольше
+# LOOP_SLOW_CALLBACK секунд попадает в лог со стеком.
+POLL_ENGINE = config.get("POLL_ENGINE", "threads")
+EVENT_LOOP = config.get("EVENT_LOOP", eventloop.ASYNCIO)
+LOOP_SLOW_CALLBACK = float(config.get("LOOP_SLOW_CALLBACK") or 0.1)
+# Пул keep-alive соединений с Telegram: размер, таймаут и число повторов
+# при обрыве соединения.
+TELEGRAM_POOL_SIZE = int(config.get("TELEGRAM_POOL_SIZE") or 10)
+TELEGRAM_TIMEOUT = float(config.get("TELEGRAM_TIMEOUT") or TIMEOUT)
+TELEGRAM_RETRIES = int(config.get("TELEGRAM_RETRIES") or 3)
+# Дополнительные токены ботов через запятую: чаты распределяются между
+# ботом TELEGRAM_TOKEN и этими ботами.
+TELEGRAM_TOKENS = [
+    token.strip() for token in (config.get("TELEGRAM_TOKENS") or "").split(",")
+    if token.strip()
+]
+# Подстраховочные запросы к API: доля дополнительных запросов от числа
+# обычных; 0 — без подстраховки. Второй запрос отправляется, если ответ
+# не пришёл за время, в которое уложилась доля HEDGE_QUANTILE запросов.
+HEDGE_BUDGET = float(config.get("HEDGE_BUDGET") or 0)
+HEDGE_QUANTILE = float(config.get("HEDGE_QUANTILE") or 0.95)
+# Как запоминать отправленные статусы: "fingerprint" — компактные отпечатки,
+# "text" — полный текст уведомлений.
+DEDUP_MODE = config.get("DEDUP_MODE", dedup.FINGERPRINT)
+# Хранилище аренды шардов получателей для запуска нескольких экземпляров:
+# файл SQLite, общий для экземпляров; без него экземпляр опрашивает всех.
+LEASE_DB = config.get("LEASE_DB")
+LEASE_BACKEND = config.get("LEASE_BACKEND", "sqlite")
+LEASE_SHARDS = int(config.get("LEASE_SHARDS") or 16)
+# Срок аренды в секундах; продление идёт втрое чаще.
+LEASE_TTL = float(config.get("LEASE_TTL") or 30)
+INSTANCE_ID = config.get("INSTANCE_ID") or lease.default_owner()
+# Сколько секунд за одно пробуждение можно тратить на опросы; опросы, не
+# уложившиеся в бюджет, откладываются или пропускаются. 0 — без ограничения.
+POLL_BUDGET = float(config.get("POLL_BUDGET") or 0)
+# Сколько секунд после смены статуса получатель считается активным.
+ACTIVE_WINDOW = float(config.get("ACTIVE_WINDOW") or 24 * 60 * 60)
+# Доля повторяющихся ошибок, для которых в лог пишется полная трассировка;
+# при первом появлении ошибки трассировка пишется всегда.
+ERROR_TRACE_SAMPLE = float(config.get("ERROR_TRACE_SAMPLE") or 0)
+# Разносить опросы получателей по периоду: у каждого постоянный сдвиг
+# по хэшу имени, и опросы не начинаются одновременно.
+POLL_SPREAD = config.get("POLL_SPREAD", "").lower() in ("1", "true", "yes")
+# Окно прогрева в секундах: первые опросы после запуска равномерно
+# распределяются по нему, а не выполняются все сразу.
+POLL_WARMUP = float(config.get("POLL_WARMUP") or 0)
+# Файл SQLite с журналом смен статусов для аналитики; без него смены
+# статусов не сохраняются.
+HISTORY_DB = config.get("HISTORY_DB")
+# Квоты получателя за окно QUOTA_WINDOW секунд, например
+# "calls=360,errors=60,sends=100"; поля: calls, retries, bytes, errors,
+# sends. Сверх квоты получатель до конца окна опрашивается реже
+# (QUOTA_ACTION=throttle) или не опрашивается (pause).
+QUOTAS = costs.parse_quotas(config.get("QUOTAS"))
+QUOTA_WINDOW = float(config.get("QUOTA_WINDOW") or 3600)
+QUOTA_ACTION = config.get("QUOTA_ACTION", costs.THROTTLE)
+# Общий для экземпляров кэш ответов API: путь к файлу SQLite или адрес
+# redis://host:port/db, в зависимости от RESPONSE_CACHE_BACKEND (sqlite,
+# redis или memory). Ответ хранится RESPONSE_CACHE_TTL секунд.
+RESPONSE_CACHE = config.get("RESPONSE_CACHE")
+RESPONSE_CACHE_BACKEND = config.get("RESPONSE_CACHE_BACKEND", "sqlite")
+RESPONSE_CACHE_TTL = float(
+    config.get("RESPONSE_CACHE_TTL") or RETRY_PERIOD / 2
+)
+# Рассылка во все чаты: сообщений в секунду на одного бота и число
+# потоков отправки.
+BROADCAST_RATE = float(config.get("BROADCAST_RATE") or 25)
+BROADCAST_WORKERS = int(config.get("BROADCAST_WORKERS") or 8)
+# Файл JSON с дополнительными каталогами вердиктов по локалям; локаль
+# получателя задаётся полем locale в TENANTS_FILE.
+VERDICT_CATALOG = config.get("VERDICT_CATALOG")
+# Сколько готовых текстов уведомлений держать в кэше; 0 — без кэша.
+RENDER_CACHE_SIZE = int(config.get("RENDER_CACHE_SIZE") or 4096)
 
 HOMEWORK_VERDICTS = {
     "approved": "Работа проверена: ревьюеру всё понравилось. Ура!",
     "reviewing": "Работа взята на проверку ревьюером.",
     "rejected": "Работа проверена: у ревьюера есть замечания.",
 }
+MESSAGE_TEMPLATE = (
+    'Изменился статус проверки работы "{homework_name}". {verdict}'
+)
+
+renderer = render.Renderer(
+    {
+        **render.CATALOGS,
+        **render.load_catalogs(VERDICT_CATALOG),
+        render.DEFAULT_LOCALE: {
+            "template": MESSAGE_TEMPLATE, "verdicts": HOMEWORK_VERDICTS,
+        },
+    },
+    cache_size=RENDER_CACHE_SIZE,
+)
+
+LEASE_TIMER = ("lease",)  # Ключ продления аренды в расписании опросов
+
+recorder = None
+
+
+def record_traffic(kind, request, response, started):
+    """Сохраняет запрос и ответ в журнал трафика, если запись включена."""
+    if recorder is None:
+        return
+    recorder.record(kind, request, response, started, time.time() - started)
 
 
 def check_tokens():
@@ -40,28 +209,81 @@ def check_tokens():
 
 def send_message(bot, message):
     """Отправляет сообщение в Telegram чат."""
+    send_to_chat(bot, TELEGRAM_CHAT_ID, message)
+
+
+def send_to_chat(bot, chat_id, message):
+    """Отправляет сообщение в указанный чат Telegram."""
+    request = {"chat_id": chat_id, "text": message}
+    started = time.time()
     try:
-        bot.send_message(TELEGRAM_CHAT_ID, message)
+        bot.send_message(chat_id, message)
         logging.debug(f"Бот отправил сообщение: {message}")
     except apihelper.ApiException as error:
+        record_traffic("telegram", request, {"error": str(error)}, started)
         logging.error(f"Ошибка при отправке сообщения: {error}")
         raise
+    record_traffic("telegram", request, {"ok": True}, started)
+
+
+def deliver(bot, chat_id, message):
+    """Отправляет сообщение получателю; владельцу бота — через send_message."""
+    if chat_id == TELEGRAM_CHAT_ID:
+        send_message(bot, message)
+    else:
+        send_to_chat(bot, chat_id, message)
 
 
 def get_api_answer(timestamp):
     """Делает запрос к API."""
+    return request_statuses(HEADERS, timestamp)
+
+
+def tenant_headers(tenant):
+    """Возвращает заголовки запроса к API для получателя."""
+    return {"Authorization": f"OAuth {tenant.practicum_token}"}
+
+
+def request_statuses(headers, timestamp, tenant="default"):
+    """
+    Запрашивает статусы домашних работ с указанными заголовками.
+    Переданные байты учитываются для получателя tenant.
+    """
     params = {"from_date": timestamp}
     logging.info(f"Отправка запроса на {ENDPOINT} с параметрами {params}")
 
+    costs.ledger.add(tenant, costs.CALLS)
+    started = time.time()
     try:
-        response = requests.get(ENDPOINT, headers=HEADERS, params=params)
+        response = requests.get(
+            ENDPOINT,
+            headers={**headers, "Accept-Encoding": transfer.ACCEPT_ENCODING},
+            params=params, timeout=TIMEOUT,
+        )
     except requests.RequestException as error:
-        raise RuntimeError(f"Ошибка при запросе к API: {error}")
+        record_traffic("api", params, {"error": str(error)}, started)
+        raise EndpointError(f"Ошибка при запросе к API: {error}") from error
+    costs.ledger.add(
+        tenant, costs.BYTES,
+        transfer.stats.add(tenant, "homework_statuses", response),
+    )
 
     if response.status_code != HTTPStatus.OK:
-        raise ValueError(f"Ошибка запроса к API: {response.text}")
+        record_traffic(
+            "api", params,
+            {"status": response.status_code, "text": response.text}, started
+        )
+        raise EndpointError(f"Ошибка запроса к API: {response.text}")
 
-    return response.json()
+    try:
+        answer = response.json()
+    except ValueError as error:
+        raise ResponseFormatError(f"Ответ API не JSON: {error}") from error
+    record_traffic(
+        "api", params, {"status": response.status_code, "body": answer},
+        started
+    )
+    return answer
 
 
 def check_response(response):
@@ -78,54 +300,824 @@ def check_response(response):
     return response["homeworks"]
 
 
+def homework_id(homework):
+    """Возвращает идентификатор домашней работы."""
+    return homework.get("id", homework.get("homework_name"))
+
+
+def notification_key(tenant, homework):
+    """Возвращает ключ идемпотентности уведомления о статусе работы."""
+    return ":".join((
+        tenant.name,
+        str(homework_id(homework)),
+        str(homework.get("status")),
+        str(homework.get("date_updated", "")),
+    ))
+
+
 def parse_status(homework):
     """Извлекает статус домашней работы."""
+    return status_message(homework)
+
+
+def status_message(homework, locale=render.DEFAULT_LOCALE):
+    """Возвращает текст уведомления о статусе работы на языке locale."""
     if "homework_name" not in homework or "status" not in homework:
         raise KeyError("Отсутствует необходимая информация о домашней работе.")
-    homework_name = homework["homework_name"]
-    homework_status = homework["status"]
-    verdict = HOMEWORK_VERDICTS.get(homework_status)
-    if verdict is None:
-        raise ValueError(
-            f"Неизвестный статус домашней работы: {homework_status}"
+    return renderer.render(
+        homework["homework_name"], homework["status"], locale
+    )
+
+
+def start_services():
+    """Запускает включённые в настройках вспомогательные службы."""
+    global recorder
+    telegram_client.configure_session(
+        TELEGRAM_POOL_SIZE, TELEGRAM_TIMEOUT, TELEGRAM_RETRIES
+    )
+    if TRAFFIC_LOG:
+        recorder = traffic_log.TrafficRecorder(TRAFFIC_LOG)
+    profiler = profiling.LoopProfiler(PROFILE_ITERATIONS or 10, PROFILE_DIR)
+    profiler.requested = PROFILE_ITERATIONS > 0
+    profiler.install_signal()
+    ready_after = 3 * RETRY_PERIOD
+    state = health.HealthState(stale_after=ready_after)
+    costs.ledger.configure(QUOTAS, QUOTA_WINDOW, QUOTA_ACTION)
+    if HEALTH_PORT:
+        server = health.HealthServer(
+            state, live_after=RETRY_PERIOD + 3 * TIMEOUT,
+            ready_after=ready_after
         )
-    return f'Изменился статус проверки работы "{homework_name}". {verdict}'
+        server.register("/transfer", transfer_report)
+        server.register("/costs", costs_report)
+        server.start(HEALTH_HOST, HEALTH_PORT)
+    return profiler, state
 
 
-def main():
-    """Основная логика работы бота."""
-    check_tokens()
-    bot = TeleBot(TELEGRAM_TOKEN)
-    timestamp = int(time.time())
-    last_message = ""
+def transfer_report(query):
+    """Эндпоинт /transfer: байты по эндпоинтам и получателям, ?top=N."""
+    return HTTPStatus.OK, transfer.stats.report(
+        health.query_int(query, "top")
+    )
+
+
+def costs_report(query):
+    """
+    Эндпоинт /costs: самые затратные получатели, ?top=N&by=поле.
+    Поля: calls, retries, bytes, errors, sends.
+    """
+    top = health.query_int(query, "top", 10)
+    by = query.get("by", [costs.CALLS])[0]
+    if by not in costs.FIELDS:
+        return HTTPStatus.BAD_REQUEST, {"error": f"Неизвестное поле: {by}"}
+    return HTTPStatus.OK, costs.ledger.report(top, by)
+
+
+def make_sender(bot):
+    """Возвращает пул ботов, если заданы дополнительные токены, иначе бота."""
+    if not TELEGRAM_TOKENS:
+        return bot
+    return telegram_client.BotPool([TELEGRAM_TOKEN, *TELEGRAM_TOKENS])
+
+
+def make_engine():
+    """Создаёт пул для параллельного опроса или None для опроса по очереди."""
+    if POLL_ENGINE == "asyncio":
+        return engine.AsyncioEngine(
+            POLL_WORKERS, POLL_DEADLINE, POLL_MAX_PENDING, EVENT_LOOP,
+            slow_callback=LOOP_SLOW_CALLBACK,
+        )
+    if POLL_WORKERS > 1:
+        return engine.ThreadPoolEngine(
+            POLL_WORKERS, POLL_DEADLINE, POLL_MAX_PENDING
+        )
+    return None
+
+
+def open_outbox():
+    """
+    Открывает очередь уведомлений, если она настроена.
+    Отправку запускает start_drainer после создания Poller.
+    """
+    if not OUTBOX_PATH:
+        return None
+    queue = outbox.Outbox(OUTBOX_PATH, OUTBOX_MAX_ATTEMPTS)
+    metrics.register_gauge("send_backlog", queue.backlog)
+    return queue
+
+
+def start_leases():
+    """
+    Открывает хранилище аренды шардов, если оно настроено.
+    Аренда требует общего CURSOR_DB: по нему новый владелец шарда
+    продолжает опрос с места, где остановился прежний.
+    """
+    if not LEASE_DB:
+        return None
+    if not CURSOR_DB:
+        raise SystemExit("Для LEASE_DB нужен общий CURSOR_DB.")
+    backend = lease.BACKENDS[LEASE_BACKEND](LEASE_DB)
+    return lease.ShardLeases(backend, INSTANCE_ID, LEASE_SHARDS, LEASE_TTL)
+
+
+def start_response_cache():
+    """Открывает общий кэш ответов API, если он настроен."""
+    if not RESPONSE_CACHE:
+        return None
+    backend = cache.BACKENDS[RESPONSE_CACHE_BACKEND](RESPONSE_CACHE)
+    return cache.ResponseCache(backend, RESPONSE_CACHE_TTL, max_wait=TIMEOUT)
+
+
+def start_history():
+    """Открывает журнал смен статусов и запускает его запись."""
+    if not HISTORY_DB:
+        return None
+    return history.StatusHistory(HISTORY_DB).start()
+
+
+class Poller:
+    """Опрашивает API по расписанию для всех получателей."""
+
+    def __init__(self, bot, tenant_list, state, queue=None, window=None,
+                 cursors=None, pool=None, leases=None, history=None,
+                 cache=None):
+        """
+        Планирует первый опрос каждого получателя на текущий момент.
+        Если задана очередь queue, уведомления ставятся в неё; если задано
+        окно window, изменения статусов собираются в сводки. Позиции
+        опроса читаются из хранилища cursors и сохраняются в него. Если
+        задан пул pool, запросы к API выполняются в нём параллельно. Если
+        заданы аренды leases, опрашиваются только получатели из своих
+        шардов, а шардом служит чат получателя. Новые статусы работ
+        дописываются в журнал history. Если задан кэш cache, ответы API
+        берутся из него, когда их уже получил другой экземпляр.
+        """
+        self.bot = bot
+        self.state = state
+        self.outbox = queue
+        self.pool = pool
+        self.leases = leases
+        self.history = history
+        self.cache = cache
+        self.errors = errors.ErrorReporter(ERROR_TRACE_SAMPLE)
+        self.hedger = hedge.Hedger(
+            HEDGE_QUANTILE, HEDGE_BUDGET,
+            workers=2 * (1 if pool is None else pool.workers) + 2,
+        ) if HEDGE_BUDGET else None
+        self.digest = None if window is None else digest.Digest(window)
+        self.cursors = cursors
+        # Позиции, которые сохраняются после отправки сводки чата.
+        self.unsaved = {}
+        self.tenants = {tenant.name: tenant for tenant in tenant_list}
+        # Отправки в общий чат учитываются для первого получателя чата.
+        self.chat_tenants = {}
+        for name, tenant in self.tenants.items():
+            self.chat_tenants.setdefault(tenant.chat_id, name)
+        now = int(time.time())
+        self.states = {}
+        self.fresh = []
+        for name in self.tenants:
+            cursor = None if cursors is None else cursors.get(name)
+            if cursor is None:
+                self.fresh.append(name)
+            self.states[name] = tenants.TenantState(
+                cursor or now, dedup.make(DEDUP_MODE)
+            )
+        self.scheduler = scheduler.PollScheduler(
+            jitter=POLL_JITTER, policy=SCHEDULE_POLICY
+        )
+        self.warming = set(self.tenants) if POLL_WARMUP else set()
+        for name, tenant in self.tenants.items():
+            self.scheduler.add(name, tenant.interval, self.first_delay(name))
+        if leases is not None:
+            leases.renew()
+            self.scheduler.add(LEASE_TIMER, leases.ttl / 3, leases.ttl / 3)
+        self.wakeup = time.monotonic()
+
+    def run_due(self):
+        """
+        Опрашивает получателей, чья очередь подошла.
+        Возвращает паузу в секундах до следующего опроса.
+        """
+        self.state.beat(time.monotonic() - self.wakeup)
+        due = self.scheduler.due()
+        if LEASE_TIMER in due:
+            due.remove(LEASE_TIMER)
+            try:
+                self.renew_leases()
+            except sqlite3.Error as error:
+                logging.error(f"Аренда шардов не продлена: {error}")
+            self.scheduler.schedule_next(LEASE_TIMER)
+        limited = self.limit(due)
+        queue = self.prioritize(
+            name for name in due if name not in limited and self.owns(name)
+        )
+        if self.pool is None or len(queue) < 2:
+            for name in self.within_budget(queue):
+                self.poll(name)
+        else:
+            polled = self.within_budget(queue)
+            for name, response in self.pool.map(polled, self.fetch):
+                self.handle(name, response)
+        self.reschedule(due, self.shed(queue) | limited)
+        self.flush_digest()
+        delay = self.next_delay()
+        self.wakeup = time.monotonic() + delay
+        return delay
+
+    def renew_leases(self):
+        """
+        Продлевает аренду шардов.
+        Получатели из новых шардов продолжают опрос с позиции из общего
+        хранилища cursors, а без него — с момента получения шарда, и учёт
+        отправленных статусов для них начинается заново. Иначе новый
+        владелец повторил бы уведомления, которые уже отправил прежний.
+        """
+        before = set(self.leases.tokens)
+        gained = self.leases.renew() - before
+        if not gained:
+            return
+        now = int(time.time())
+        shards = self.leases.shards
+        for name, tenant in self.tenants.items():
+            if lease.shard_of(tenant.chat_id, shards) not in gained:
+                continue
+            cursor = None if self.cursors is None else self.cursors.get(name)
+            tenant_state = self.states[name]
+            tenant_state.cursor = cursor or now
+            tenant_state.seen = dedup.make(DEDUP_MODE)
+        logging.info(f"Получены шарды {sorted(gained)}.")
+
+    def first_delay(self, name):
+        """
+        Секунды до первого опроса получателя.
+        При прогреве первые опросы распределяются по окну POLL_WARMUP,
+        при POLL_SPREAD опрос ждёт сдвига получателя в периоде.
+        """
+        if POLL_WARMUP:
+            return scheduler.phase(name, POLL_WARMUP)
+        if POLL_SPREAD:
+            return self.phase_delay(name)
+        return 0
+
+    def phase_delay(self, name):
+        """Секунды до ближайшего момента со сдвигом получателя в периоде."""
+        return scheduler.phase_delay(
+            name, self.tenants[name].interval, time.time()
+        )
+
+    def reschedule(self, due, deferred):
+        """
+        Планирует следующие опросы; отложенные уже запланированы.
+        После опроса при прогреве получатель возвращается к своему сдвигу
+        в периоде, но не раньше чем через полпериода.
+        """
+        for name in due:
+            if name in deferred:
+                continue
+            if name in self.warming and POLL_SPREAD:
+                interval = self.tenants[name].interval
+                delay = self.phase_delay(name)
+                if delay < interval / 2:
+                    delay += interval
+                self.scheduler.add(name, interval, delay)
+            else:
+                self.scheduler.schedule_next(name)
+            self.warming.discard(name)
+
+    def prioritize(self, names):
+        """
+        Упорядочивает получателей по приоритету опроса.
+        Сначала идут получатели с работами на проверке, затем недавно
+        активные, затем остальные.
+        """
+        now = time.monotonic()
+        return deque(sorted(
+            names,
+            key=lambda name: self.states[name].priority(now, ACTIVE_WINDOW),
+        ))
+
+    def limit(self, due):
+        """
+        Откладывает опросы получателей, превысивших квоту.
+        Возвращает отложенных получателей.
+        """
+        limited = set()
+        for name in due:
+            delay = costs.ledger.delay(name)
+            if delay > 0:
+                self.scheduler.defer(name, delay)
+                limited.add(name)
+                metrics.inc("polls_over_quota")
+        return limited
+
+    def within_budget(self, queue):
+        """
+        Выдаёт получателей из очереди, пока не исчерпан бюджет POLL_BUDGET.
+        Не выданные получатели остаются в очереди.
+        """
+        deadline = time.monotonic() + POLL_BUDGET if POLL_BUDGET else math.inf
+        while queue and time.monotonic() < deadline:
+            yield queue.popleft()
+
+    def shed(self, queue):
+        """
+        Сбрасывает опросы, не уложившиеся в бюджет.
+        Опросы неактивных получателей пропускаются до следующего срока,
+        остальные откладываются до следующего пробуждения. Возвращает
+        отложенных получателей.
+        """
+        now = time.monotonic()
+        deferred = set()
+        for name in queue:
+            if self.states[name].priority(now, ACTIVE_WINDOW) == tenants.IDLE:
+                metrics.inc("polls_dropped")
+            else:
+                self.scheduler.defer(name, self.scheduler.tick)
+                deferred.add(name)
+                metrics.inc("polls_deferred")
+        if queue:
+            logging.warning(
+                f"Опрос не уложился в бюджет: отложено {len(deferred)}, "
+                f"пропущено {len(queue) - len(deferred)}."
+            )
+        return deferred
+
+    def next_delay(self):
+        """
+        Секунды до ближайшего опроса или отправки сводки, не больше
+        RETRY_PERIOD: пороги /healthz рассчитаны на такую паузу, а
+        интервал получателя или пауза по квоте могут быть длиннее.
+        """
+        delay = self.scheduler.delay()
+        if delay is None or delay > RETRY_PERIOD:
+            delay = RETRY_PERIOD
+        if self.digest:
+            remaining = self.digest.next_deadline() - time.monotonic()
+            delay = min(delay, math.ceil(max(remaining, 0)))
+        return delay
+
+    def owns(self, name):
+        """Опрашивает ли этот экземпляр получателя."""
+        return (self.leases is None
+                or self.leases.owns(self.tenants[name].chat_id))
 
-    while True:
+    def poll(self, name):
+        """Опрашивает API для получателя и сообщает ему об изменениях."""
         try:
-            response = get_api_answer(timestamp)
+            response = self.fetch(name)
+        except Exception as error:
+            response = error
+        self.handle(name, response)
+
+    def fetch(self, name):
+        """Запрашивает статусы работ получателя с его текущей позиции."""
+        tenant = self.tenants[name]
+        headers = tenant_headers(tenant)
+        cursor = self.states[name].cursor
+        if self.cache is None:
+            return self.request(name, headers, cursor)
+        return self.cache.fetch(
+            tenant.practicum_token, cursor,
+            lambda: self.request(name, headers, cursor),
+        )
+
+    def request(self, name, headers, cursor):
+        """Запрашивает статусы у API, с подстраховкой, если она включена."""
+        if self.hedger is None:
+            return request_statuses(headers, cursor, name)
+        return self.hedger.call(
+            request_statuses, headers, cursor, name,
+            on_hedge=lambda: costs.ledger.add(name, costs.RETRIES),
+        )
+
+    def handle(self, name, response):
+        """
+        Обрабатывает ответ API для получателя.
+        response может быть исключением, возникшим при запросе.
+        """
+        self.state.alive()
+        tenant, tenant_state = self.tenants[name], self.states[name]
+        try:
+            self.fence(tenant.chat_id)
+            if isinstance(response, Exception):
+                raise response
+            self.state.mark_success(tenant.name)
             homeworks = check_response(response)
             if homeworks:
-                homework = homeworks[0]
-                message = parse_status(homework)
-                if last_message != message:
-                    send_message(bot, message)
-                    last_message = message
-                else:
-                    logging.debug("Получено повторяющееся сообщение.")
+                self.report_changes(tenant, tenant_state, homeworks)
             else:
                 logging.debug("Домашних работ нет.")
-            timestamp = response.get("current_date", timestamp)
+            self.advance_cursor(tenant, tenant_state, response)
+            tenant_state.last_error = None
+        except (lease.LeaseLost, sqlite3.Error) as error:
+            logging.warning(f"Ответ для {name} отброшен: {error}")
         except Exception as error:
-            error_message = f"Ошибка в работе программы: {error}"
-            logging.error(error_message, exc_info=True)
-            if last_message != error_message:
-                try:
-                    send_message(bot, error_message)
-                    last_message = error_message
-                except apihelper.ApiException:
-                    logging.error("Ошибка при отправке сообщения"
-                                  "об ошибке в Telegram")
-        finally:
-            time.sleep(RETRY_PERIOD)
+            costs.ledger.add(name, costs.ERRORS)
+            self.errors.log(error)
+            try:
+                self.report_error(tenant, tenant_state, error)
+            except (apihelper.ApiException, lease.LeaseLost, sqlite3.Error):
+                logging.error("Ошибка при отправке сообщения"
+                              "об ошибке в Telegram")
+
+    def advance_cursor(self, tenant, tenant_state, response):
+        """
+        Переносит позицию опроса на current_date из ответа API.
+        Пока изменения чата ждут в сводке, позиция не сохраняется в
+        cursors: иначе после перезапуска эти изменения были бы потеряны.
+        """
+        cursor = response.get("current_date", tenant_state.cursor)
+        if cursor != tenant_state.cursor and self.cursors is not None:
+            if self.digest is not None and tenant.chat_id in self.digest:
+                self.unsaved.setdefault(tenant.chat_id, {})[
+                    tenant.name] = cursor
+            else:
+                self.cursors.set(tenant.name, cursor)
+        tenant_state.cursor = cursor
+
+    def backfill(self, lookback, concurrency):
+        """
+        Догружает историю за lookback секунд для получателей без позиции.
+        Запросы идут параллельно, не больше concurrency одновременно, а
+        ответы обрабатываются в текущем потоке по мере готовности. После
+        догрузки получатель продолжает опрос с current_date ответа. Без
+        хранилища позиций догрузка пропускается: иначе каждый перезапуск
+        заново присылал бы всю историю.
+        """
+        if self.cursors is None:
+            logging.warning("Догрузка истории пропущена: не задан CURSOR_DB.")
+            self.fresh = []
+            return
+        start = int(time.time() - lookback)
+
+        def fetch(name):
+            return request_statuses(
+                tenant_headers(self.tenants[name]), start, name
+            )
+
+        fresh = [name for name in self.fresh if self.owns(name)]
+        self.fresh = []
+        logging.info(f"Догрузка истории для {len(fresh)} получателей.")
+        for name, response in backfill.map_bounded(fresh, fetch, concurrency):
+            self.state.alive()
+            tenant, tenant_state = self.tenants[name], self.states[name]
+            try:
+                if isinstance(response, Exception):
+                    raise response
+                self.report_changes(
+                    tenant, tenant_state, check_response(response)
+                )
+                self.advance_cursor(tenant, tenant_state, response)
+            except Exception as error:
+                logging.error(
+                    f"Не удалось догрузить историю для {name}: {error}"
+                )
+        self.flush_digest()
+
+    def report_changes(self, tenant, tenant_state, homeworks):
+        """Сообщает получателю о работах, статус которых изменился."""
+        changed = False
+        for homework in homeworks:
+            message = status_message(homework, tenant.locale)
+            work = homework_id(homework)
+            status = homework["status"]
+            if not tenant_state.seen.is_new(work, status, message):
+                continue
+            tenant_state.track(work, status, time.monotonic())
+            if self.history is not None:
+                self.history.append(tenant.name, homework)
+            key = notification_key(tenant, homework)
+            if self.digest is None:
+                self.send(tenant.chat_id, key, message)
+            else:
+                self.digest.add(
+                    tenant.chat_id, work, key, message, time.monotonic()
+                )
+            tenant_state.seen.remember(work, status, message)
+            changed = True
+        if not changed:
+            logging.debug("Получено повторяющееся сообщение.")
+
+    def report_error(self, tenant, tenant_state, error):
+        """
+        Сообщает об ошибке, если она отличается от предыдущей.
+        Повтор определяется по типу и аргументам исключения, поэтому текст
+        сообщения собирается только для новой ошибки.
+        """
+        error_signature = errors.signature(error)
+        if tenant_state.last_error == error_signature:
+            return
+        self.send(tenant.chat_id, f"{tenant.name}:error:{time.time()}",
+                  f"Ошибка в работе программы: {error}")
+        tenant_state.last_error = error_signature
+
+    def send(self, chat_id, key, message):
+        """
+        Отправляет сообщение в чат.
+        При включённой очереди сообщение сохраняется в ней с ключом key.
+        Если шард чата арендован другим экземпляром, бросает
+        lease.LeaseLost, чтобы позиция опроса не сдвинулась.
+        """
+        self.fence(chat_id)
+        if self.outbox is None:
+            self.deliver(chat_id, message)
+        else:
+            self.outbox.put([(key, chat_id, message)])
+
+    def fence(self, chat_id):
+        """Бросает lease.LeaseLost, если шард чата уже не наш."""
+        if self.leases is not None and not self.leases.fenced(chat_id):
+            raise lease.LeaseLost(f"Аренда чата {chat_id} потеряна.")
+
+    def deliver(self, chat_id, message):
+        """
+        Отправляет сообщение в Telegram и учитывает отправку в квоте
+        получателя чата; неудачная отправка не учитывается.
+        """
+        deliver(self.bot, chat_id, message)
+        costs.ledger.add(self.chat_tenants.get(chat_id, chat_id), costs.SENDS)
+
+    def flush_digest(self):
+        """
+        Отправляет сводки, окно которых закончилось.
+        Неотправленная сводка остаётся в очереди до повтора, а позиции
+        её получателей сохраняются только после отправки. Сводку чата из
+        чужого шарда доставит новый владелец с сохранённой позиции, поэтому
+        она отбрасывается вместе с несохранёнными позициями.
+        """
+        if self.digest is None:
+            return
+        now = time.monotonic()
+        for chat_id in self.digest.due(now):
+            try:
+                self.send(*self.digest.render(chat_id))
+            except lease.LeaseLost as error:
+                self.digest.discard(chat_id)
+                self.unsaved.pop(chat_id, None)
+                logging.warning(f"Сводка отброшена: {error}")
+                continue
+            except (apihelper.ApiException, requests.RequestException,
+                    sqlite3.Error):
+                self.digest.postpone(chat_id, now)
+                logging.error(f"Сводка для чата {chat_id} не отправлена, "
+                              f"повтор через {digest.RETRY_AFTER} с.")
+                continue
+            self.digest.sent(chat_id)
+            for name, cursor in self.unsaved.pop(chat_id, {}).items():
+                self.cursors.set(name, cursor)
+
+
+def main():
+    """Основная логика работы бота."""
+    check_tokens()
+    profiler, state = start_services()
+    bot = TeleBot(TELEGRAM_TOKEN)
+    telegram_client.register_bot(TELEGRAM_TOKEN, bot)
+    sender = make_sender(bot)
+    default = tenants.Tenant(
+        name=TELEGRAM_CHAT_ID,
+        practicum_token=PRACTICUM_TOKEN,
+        chat_id=TELEGRAM_CHAT_ID,
+        interval=RETRY_PERIOD,
+    )
+    queue = open_outbox()
+    poller = Poller(
+        sender, tenants.load_tenants(TENANTS_FILE, default), state,
+        queue,
+        None if DIGEST_WINDOW is None else float(DIGEST_WINDOW),
+        backfill.CursorStore(CURSOR_DB) if CURSOR_DB else None,
+        make_engine(),
+        start_leases(),
+        start_history(),
+        start_response_cache(),
+    )
+    if queue is not None:
+        queue.start_drainer(poller.deliver, OUTBOX_BATCH)
+    # SIGTERM завершает процесс через SystemExit, чтобы сработал finally.
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    try:
+        if BACKFILL_DAYS:
+            poller.backfill(
+                BACKFILL_DAYS * 24 * 60 * 60, BACKFILL_CONCURRENCY
+            )
+        while True:
+            profiler.start_iteration()
+            delay = poller.run_due()
+            profiler.finish_iteration()
+            time.sleep(delay)
+    finally:
+        if queue is not None:
+            queue.close(TELEGRAM_TIMEOUT)
+        if poller.history is not None:
+            poller.history.close()
+        if poller.leases is not None:
+            poller.leases.release()
+
+
+def replay_traffic(path, speed, to_telegram):
+    """Прогоняет ответы из журнала трафика через обработку статусов."""
+    if to_telegram:
+        check_tokens()
+        bot = TeleBot(token=TELEGRAM_TOKEN)
+
+        def deliver(message):
+            send_message(bot, message)
+    else:
+        def deliver(message):
+            logging.info(f"Воспроизведено сообщение: {message}")
+
+    def handle(response):
+        for homework in check_response(response):
+            deliver(parse_status(homework))
+
+    stats = traffic_log.replay(traffic_log.read_records(path), handle, speed)
+    logging.info(f"Воспроизведение завершено: {stats}")
+
+
+def run_broadcast(args):
+    """Рассылает сообщение во все чаты получателей."""
+    check_tokens()
+    text = args.text
+    if args.file:
+        with open(args.file, encoding="utf-8") as file:
+            text = file.read()
+    if not text:
+        raise SystemExit("Не задан текст рассылки.")
+    telegram_client.configure_session(
+        TELEGRAM_POOL_SIZE, TELEGRAM_TIMEOUT, TELEGRAM_RETRIES
+    )
+    bot = TeleBot(TELEGRAM_TOKEN)
+    telegram_client.register_bot(TELEGRAM_TOKEN, bot)
+    sender = make_sender(bot)
+    bots = len(sender.tokens) if sender is not bot else 1
+    checkpoint = args.checkpoint or "broadcast-{}.log".format(
+        hashlib.sha256(text.encode()).hexdigest()[:12]
+    )
+    tenant_list = (
+        tenants.iter_tenants(TENANTS_FILE, RETRY_PERIOD) if TENANTS_FILE
+        else [tenants.Tenant(TELEGRAM_CHAT_ID, PRACTICUM_TOKEN,
+                             TELEGRAM_CHAT_ID, RETRY_PERIOD)]
+    )
+    logging.info(f"Рассылка, контрольная точка: {checkpoint}")
+    stats = broadcast.Broadcast(
+        lambda chat_id, message: deliver(sender, chat_id, message),
+        args.rate * bots, args.workers, checkpoint,
+    ).run(tenant_list, text)
+    logging.info(f"Рассылка завершена: {stats}")
+
+
+def run_bench(args):
+    """Прогоняет опрос против встроенных имитаций Практикума и Telegram."""
+    global POLL_SPREAD, POLL_WARMUP, HEDGE_BUDGET
+    POLL_SPREAD = POLL_SPREAD or args.spread
+    POLL_WARMUP = args.warmup if args.warmup is not None else POLL_WARMUP
+    HEDGE_BUDGET = args.hedge if args.hedge is not None else HEDGE_BUDGET
+    # Журнал каждого запроса исказил бы замер процессорного времени.
+    logging.getLogger().setLevel(logging.WARNING)
+
+    def make_poller(endpoint, api_url, tokens, interval):
+        global ENDPOINT
+        ENDPOINT = endpoint
+        apihelper.API_URL = api_url
+        telegram_client.configure_session(
+            TELEGRAM_POOL_SIZE, TELEGRAM_TIMEOUT, TELEGRAM_RETRIES
+        )
+        bots = [f"{index}:bench" for index in range(args.bots)]
+        return Poller(
+            telegram_client.BotPool(bots),
+            [tenants.Tenant(token, token, token, interval)
+             for token in tokens],
+            health.HealthState(),
+            pool=engine.ThreadPoolEngine(
+                args.workers, POLL_DEADLINE, 2 * args.workers
+            ) if args.workers > 1 else None,
+        )
+
+    report = loadtest.run(
+        make_poller, HOMEWORK_VERDICTS, args.tenants, args.change_rate,
+        args.latency, args.error_rate, args.duration, args.interval,
+        args.seed, args.bot_rate, args.slow_rate, args.slow_latency,
+        not args.no_compression,
+    )
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as file:
+            baseline = json.load(file)
+    print(loadtest.format_report(report, baseline))
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as file:
+            json.dump(report, file, ensure_ascii=False, indent=2)
+
+
+def show_history(args):
+    """Печатает аналитику по журналу смен статусов."""
+    if not HISTORY_DB:
+        raise SystemExit("Не задан HISTORY_DB.")
+    store = history.StatusHistory(HISTORY_DB)
+    started = time.perf_counter()
+    if args.query == "median":
+        rows = [
+            (cohort, f"{median / 3600:.1f} ч", count)
+            for cohort, median, count in store.median_review(
+                args.by, dedup.STATUS_CODES[args.status]
+            )
+        ]
+    else:
+        rows = store.top_tenants(
+            dedup.STATUS_CODES[args.status], args.top
+        )
+    elapsed = time.perf_counter() - started
+    store.close()
+    for row in rows:
+        print("\t".join(str(value) for value in row))
+    print(f"Запрос выполнен за {elapsed * 1000:.1f} мс.")
+
+
+def parse_args():
+    """Разбирает аргументы командной строки."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    commands = parser.add_subparsers(dest="command")
+    replay = commands.add_parser(
+        "replay", help="воспроизвести журнал трафика"
+    )
+    replay.add_argument("path", help="путь к журналу трафика")
+    replay.add_argument(
+        "--speed", type=float, default=1.0,
+        help="ускорение относительно записи, 0 — без пауз"
+    )
+    replay.add_argument(
+        "--telegram", action="store_true",
+        help="отправлять сообщения в Telegram, а не в лог"
+    )
+    bench = commands.add_parser(
+        "bench", help="нагрузочный прогон против имитаций API"
+    )
+    bench.add_argument("--tenants", type=int, default=100,
+                       help="число получателей")
+    bench.add_argument("--change-rate", type=float, default=10.0,
+                       help="смен статусов в секунду на всех получателей")
+    bench.add_argument("--latency", type=float, default=0.0,
+                       help="задержка ответа API, секунды")
+    bench.add_argument("--error-rate", type=float, default=0.0,
+                       help="доля ответов API с ошибкой")
+    bench.add_argument("--slow-rate", type=float, default=0.0,
+                       help="доля медленных ответов API")
+    bench.add_argument("--slow-latency", type=float, default=1.0,
+                       help="задержка медленного ответа API, секунды")
+    bench.add_argument("--no-compression", action="store_true",
+                       help="отвечать от API без сжатия")
+    bench.add_argument("--hedge", type=float,
+                       help="доля подстраховочных запросов, HEDGE_BUDGET")
+    bench.add_argument("--duration", type=float, default=30.0,
+                       help="длительность прогона, секунды")
+    bench.add_argument("--interval", type=float, default=1.0,
+                       help="интервал опроса получателя, секунды")
+    bench.add_argument("--workers", type=int, default=POLL_WORKERS,
+                       help="потоков для опроса")
+    bench.add_argument("--spread", action="store_true",
+                       help="разнести опросы по периоду, как POLL_SPREAD")
+    bench.add_argument("--warmup", type=float,
+                       help="окно прогрева, секунды, как POLL_WARMUP")
+    bench.add_argument("--bots", type=int, default=1,
+                       help="число ботов в пуле")
+    bench.add_argument("--bot-rate", type=int,
+                       help="сообщений в секунду, принимаемых от бота")
+    bench.add_argument("--seed", type=int, help="зерно генератора")
+    bench.add_argument("--json", help="сохранить отчёт в JSON")
+    bench.add_argument("--baseline", help="сравнить с отчётом в JSON")
+    announce = commands.add_parser(
+        "broadcast", help="разослать сообщение во все чаты получателей"
+    )
+    announce.add_argument("text", nargs="?", help="текст сообщения")
+    announce.add_argument("--file", help="взять текст из файла")
+    announce.add_argument(
+        "--checkpoint",
+        help="файл контрольной точки; по умолчанию по хэшу текста"
+    )
+    announce.add_argument("--rate", type=float, default=BROADCAST_RATE,
+                          help="сообщений в секунду на одного бота")
+    announce.add_argument("--workers", type=int, default=BROADCAST_WORKERS,
+                          help="потоков отправки")
+    analytics = commands.add_parser(
+        "history", help="аналитика по журналу смен статусов HISTORY_DB"
+    )
+    queries = analytics.add_subparsers(dest="query", required=True)
+    median = queries.add_parser(
+        "median", help="медиана времени от взятия на проверку до вердикта"
+    )
+    median.add_argument("--by", choices=history.COHORTS,
+                        default="lesson", help="когорта для группировки")
+    median.add_argument("--status", choices=["approved", "rejected"],
+                        default="approved", help="вердикт")
+    top = queries.add_parser(
+        "top", help="получатели с наибольшим числом статусов"
+    )
+    top.add_argument("--status", choices=sorted(dedup.STATUS_CODES),
+                     default="rejected", help="статус")
+    top.add_argument("--top", type=int, default=10,
+                     help="сколько получателей показать")
+    return parser.parse_args()
 
 
 if __name__ == "__main__":
@@ -133,12 +1125,23 @@ if __name__ == "__main__":
         "%(asctime)s [%(levelname)s] %(message)s "
         "[%(funcName)s:%(lineno)d]"
     )
+    args = parse_args()
+    handlers = [logging.StreamHandler(stream=sys.stdout)]
+    if args.command != "bench":
+        # Нагрузочный прогон не оставляет журнал в рабочем каталоге.
+        handlers.append(logging.FileHandler('my_logging.log'))
     logging.basicConfig(
-        level=logging.DEBUG,
+        level=logging.WARNING if args.command == "bench" else logging.DEBUG,
         format=format_str,
-        handlers=[
-            logging.StreamHandler(stream=sys.stdout),
-            logging.FileHandler('my_logging.log')
-        ]
+        handlers=handlers,
     )
-    main()
+    if args.command == "replay":
+        replay_traffic(args.path, args.speed, args.telegram)
+    elif args.command == "bench":
+        run_bench(args)
+    elif args.command == "broadcast":
+        run_broadcast(args)
+    elif args.command == "history":
+        show_history(args)
+    else:
+        main()
@@ -0,0 +1,219 @@
+"""
+Аренда шардов получателей между экземплярами бота.
+
+Получатели делятся на шарды по хэшу чата. Экземпляр опрашивает только
+получателей из шардов, которые он арендовал, и продлевает аренду чаще,
+чем она истекает. Если экземпляр перестал продлевать аренду, шард
+забирает другой. Каждая смена владельца увеличивает fencing-токен: перед
+отправкой уведомления владелец сверяет свой токен с текущим, поэтому
+экземпляр, проснувшийся после паузы, не отправит устаревшее уведомление.
+"""
+
+import os
+import socket
+import sqlite3
+import threading
+import time
+import zlib
+
+import metrics
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS leases (
+    shard INTEGER PRIMARY KEY,
+    owner TEXT NOT NULL,
+    token INTEGER NOT NULL,
+    expires REAL NOT NULL
+);
+"""
+
+
+class LeaseLost(Exception):
+    """Шард арендован другим экземпляром."""
+
+
+def default_owner():
+    """Имя экземпляра по умолчанию: хост и номер процесса."""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def shard_of(key, shards):
+    """Номер шарда для ключа, например чата получателя."""
+    return zlib.crc32(str(key).encode()) % shards
+
+
+class LeaseBackend:
+    """Хранилище аренды; наследники реализуют acquire, release и token."""
+
+    def acquire(self, shard, owner, ttl, now):
+        """Берёт или продлевает аренду; возвращает токен или None."""
+        raise NotImplementedError
+
+    def release(self, shard, owner):
+        """Освобождает аренду, если она принадлежит owner."""
+        raise NotImplementedError
+
+    def token(self, shard):
+        """Текущий fencing-токен шарда или None."""
+        raise NotImplementedError
+
+
+class MemoryLeaseBackend(LeaseBackend):
+    """Аренда в памяти процесса, для одного экземпляра и тестов."""
+
+    def __init__(self):
+        """Создаёт пустое хранилище."""
+        self._lock = threading.Lock()
+        self._leases = {}
+
+    def acquire(self, shard, owner, ttl, now):
+        """Берёт или продлевает аренду; возвращает токен или None."""
+        with self._lock:
+            current = self._leases.get(shard)
+            if current is None:
+                token = 1
+            elif current[0] == owner:
+                token = current[1]
+            elif current[2] <= now:
+                token = current[1] + 1
+            else:
+                return None
+            self._leases[shard] = (owner, token, now + ttl)
+            return token
+
+    def release(self, shard, owner):
+        """Освобождает аренду, если она принадлежит owner."""
+        with self._lock:
+            current = self._leases.get(shard)
+            if current is not None and current[0] == owner:
+                self._leases[shard] = (owner, current[1], 0)
+
+    def token(self, shard):
+        """Текущий fencing-токен шарда или None."""
+        current = self._leases.get(shard)
+        return None if current is None else current[1]
+
+
+class SQLiteLeaseBackend(LeaseBackend):
+    """Аренда в файле SQLite, общем для экземпляров на одном хосте."""
+
+    def __init__(self, path):
+        """Открывает или создаёт хранилище в файле path."""
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(
+            path, check_same_thread=False, isolation_level=None, timeout=5
+        )
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(SCHEMA)
+
+    def acquire(self, shard, owner, ttl, now):
+        """Берёт или продлевает аренду; возвращает токен или None."""
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                token = self._acquire(shard, owner, ttl, now)
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+            self._db.execute("COMMIT")
+            return token
+
+    def _acquire(self, shard, owner, ttl, now):
+        row = self._db.execute(
+            "SELECT owner, token, expires FROM leases WHERE shard = ?",
+            (shard,),
+        ).fetchone()
+        if row is None:
+            token = 1
+        elif row[0] == owner:
+            token = row[1]
+        elif row[2] <= now:
+            token = row[1] + 1
+        else:
+            return None
+        self._db.execute(
+            "INSERT OR REPLACE INTO leases (shard, owner, token, expires) "
+            "VALUES (?, ?, ?, ?)",
+            (shard, owner, token, now + ttl),
+        )
+        return token
+
+    def release(self, shard, owner):
+        """Освобождает аренду, если она принадлежит owner."""
+        with self._lock:
+            self._db.execute(
+                "UPDATE leases SET expires = 0 "
+                "WHERE shard = ? AND owner = ?",
+                (shard, owner),
+            )
+
+    def token(self, shard):
+        """Текущий fencing-токен шарда или None."""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT token FROM leases WHERE shard = ?", (shard,)
+            ).fetchone()
+        return None if row is None else row[0]
+
+
+BACKENDS = {
+    "memory": lambda path: MemoryLeaseBackend(),
+    "sqlite": SQLiteLeaseBackend,
+}
+
+
+class ShardLeases:
+    """Шарды, арендованные этим экземпляром."""
+
+    def __init__(self, backend, owner, shards, ttl, clock=time.time):
+        """
+        Настраивает аренду.
+        shards — число шардов, ttl — срок аренды в секундах.
+        """
+        self.backend = backend
+        self.owner = owner
+        self.shards = shards
+        self.ttl = ttl
+        self.clock = clock
+        self.tokens = {}
+        self.expires = 0.0
+
+    def renew(self):
+        """Берёт свободные и продлевает свои шарды; возвращает свои."""
+        now = self.clock()
+        tokens = {}
+        for shard in range(self.shards):
+            token = self.backend.acquire(shard, self.owner, self.ttl, now)
+            if token is not None:
+                tokens[shard] = token
+        gained = tokens.keys() - self.tokens.keys()
+        lost = self.tokens.keys() - tokens.keys()
+        if gained or lost:
+            metrics.inc("lease_changes", len(gained) + len(lost))
+        self.tokens = tokens
+        self.expires = now + self.ttl
+        metrics.set_gauge("lease_shards", len(tokens))
+        return set(tokens)
+
+    def owns(self, key):
+        """Арендован ли шард ключа и не истекла ли аренда."""
+        return (self.clock() < self.expires
+                and shard_of(key, self.shards) in self.tokens)
+
+    def fenced(self, key):
+        """
+        Проверяет fencing-токен перед отправкой уведомления.
+        Возвращает True, только если шард ключа по-прежнему наш.
+        """
+        shard = shard_of(key, self.shards)
+        token = self.tokens.get(shard)
+        if token is not None and self.backend.token(shard) == token:
+            return True
+        metrics.inc("lease_fenced")
+        return False
+
+    def release(self):
+        """Освобождает все свои шарды."""
+        for shard in self.tokens:
+            self.backend.release(shard, self.owner)
+        self.tokens = {}
@@ -0,0 +1,510 @@
+"""
+Нагрузочный прогон опроса против встроенных имитаций API.
+
+FakePracticum отдаёт статусы работ, которые меняются с заданной частотой,
+с задержкой ответа и случайными ошибками. FakeTelegram принимает
+сообщения и по тексту определяет, об изменении какого статуса сообщается.
+FakeRedis заменяет сервер Redis для общего кэша ответов.
+Задержка уведомления — время от смены статуса до получения сообщения.
+При прогоне имитации работают в отдельном процессе, поэтому процессорное
+время и пиковая память в отчёте относятся только к боту. Отчёт можно
+сохранить в JSON и сравнить с сохранённым ранее.
+"""
+
+import gzip
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import math
+import multiprocessing
+import random
+import re
+import resource
+from socketserver import StreamRequestHandler
+import threading
+import time
+from urllib.parse import parse_qs, urlsplit
+
+PRACTICUM_PATH = "/api/user_api/homework_statuses/"
+MESSAGE = re.compile(r'работы "([^"]+)"\. (.+)$')
+CHANGE_STEP = 0.05  # Шаг генератора смен статусов, секунды
+
+
+class FakeServer:
+    """HTTP-сервер в фоновом потоке."""
+
+    handler = None
+
+    def __init__(self):
+        """Создаёт сервер на свободном порту локального адреса."""
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), self.handler)
+        self.server.daemon_threads = True
+        self.server.owner = self
+        self.lock = threading.Lock()
+
+    @property
+    def address(self):
+        """Адрес сервера вида http://host:port."""
+        host, port = self.server.server_address
+        return f"http://{host}:{port}"
+
+    def __enter__(self):
+        """Запускает сервер."""
+        threading.Thread(
+            target=self.server.serve_forever, daemon=True
+        ).start()
+        return self
+
+    def __exit__(self, *exc_info):
+        """Останавливает сервер."""
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class Handler(BaseHTTPRequestHandler):
+    """Обработчик с keep-alive и ответами в JSON."""
+
+    protocol_version = "HTTP/1.1"
+
+    def reply(self, status, body, compress=False):
+        """
+        Отправляет ответ в JSON; при compress — сжатый gzip.
+        Возвращает размер тела ответа в байтах.
+        """
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        if compress:
+            payload = gzip.compress(payload)
+            self.send_header("Content-Encoding", "gzip")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+        return len(payload)
+
+    def log_message(self, format, *args):
+        """Не пишет запросы в stderr."""
+
+
+class PracticumHandler(Handler):
+    """Отвечает на запросы статусов работ."""
+
+    def do_GET(self):
+        """Возвращает работы, обновлённые не раньше from_date."""
+        owner = self.server.owner
+        url = urlsplit(self.path)
+        token = self.headers.get("Authorization", "").partition(" ")[2]
+        from_date = int(parse_qs(url.query).get("from_date", ["0"])[0])
+        status, body = owner.answer(token, from_date)
+        compress = (owner.compress
+                    and "gzip" in self.headers.get("Accept-Encoding", ""))
+        size = self.reply(status, body, compress)
+        with owner.lock:
+            owner.bytes_sent += size
+
+
+class FakePracticum(FakeServer):
+    """Имитация API Практикума с меняющимися статусами работ."""
+
+    handler = PracticumHandler
+
+    def __init__(self, tokens, change_rate, latency=0.0, error_rate=0.0,
+                 rng=None, slow_rate=0.0, slow_latency=0.0, compress=True):
+        """
+        Создаёт имитацию.
+        tokens — токены получателей, change_rate — смен статусов в секунду
+        на всех получателей, latency — задержка ответа в секундах,
+        error_rate — доля ответов с кодом 500, slow_rate — доля ответов с
+        задержкой slow_latency вместо latency; compress — сжимать ответы,
+        если клиент поддерживает gzip.
+        """
+        super().__init__()
+        self.tokens = list(tokens)
+        self.change_rate = change_rate
+        self.latency = latency
+        self.error_rate = error_rate
+        self.slow_rate = slow_rate
+        self.slow_latency = slow_latency
+        self.compress = compress
+        self.bytes_sent = 0
+        self.rng = rng or random.Random()
+        self.works = {token: [] for token in self.tokens}
+        self.changes = {}
+        self.calls = 0
+        self.call_times = []
+        self.errors = 0
+        self._stop = threading.Event()
+
+    @property
+    def url(self):
+        """Адрес эндпоинта статусов."""
+        return self.address + PRACTICUM_PATH
+
+    def __enter__(self):
+        """Запускает сервер и генератор смен статусов."""
+        super().__enter__()
+        threading.Thread(target=self._generate, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc_info):
+        """Останавливает генератор и сервер."""
+        self.stop_changes()
+        super().__exit__(*exc_info)
+
+    def stop_changes(self):
+        """Прекращает менять статусы."""
+        self._stop.set()
+
+    def answer(self, token, from_date):
+        """Возвращает код и тело ответа для получателя."""
+        with self.lock:
+            slow = self.rng.random() < self.slow_rate
+        latency = self.slow_latency if slow else self.latency
+        if latency:
+            time.sleep(latency)
+        with self.lock:
+            self.calls += 1
+            self.call_times.append(time.time())
+            if self.rng.random() < self.error_rate:
+                self.errors += 1
+                return 500, {"message": "Injected error"}
+            works = [
+                {key: value for key, value in work.items()
+                 if key != "updated"}
+                for work in self.works.get(token, ())
+                if work["updated"] >= from_date
+            ]
+        return 200, {"homeworks": works, "current_date": int(time.time())}
+
+    def change(self):
+        """Меняет статус работы случайного получателя."""
+        token = self.rng.choice(self.tokens)
+        now = time.time()
+        with self.lock:
+            works = self.works[token]
+            if works and works[-1]["status"] == "reviewing":
+                work = works[-1]
+                work["status"] = self.rng.choice(("approved", "rejected"))
+            else:
+                work = {
+                    "id": f"{token}-{len(works)}",
+                    "homework_name": f"{token}-{len(works)}.zip",
+                    "status": "reviewing",
+                }
+                works.append(work)
+            work["updated"] = now
+            work["date_updated"] = time.strftime(
+                "%Y-%m-%dT%H:%M:%SZ", time.gmtime(now)
+            )
+            self.changes[(work["homework_name"], work["status"])] = now
+
+    def _generate(self):
+        credit = 0.0
+        while not self._stop.wait(CHANGE_STEP):
+            credit += self.change_rate * CHANGE_STEP
+            while credit >= 1:
+                credit -= 1
+                self.change()
+
+
+class TelegramHandler(Handler):
+    """Принимает вызовы Bot API."""
+
+    def do_POST(self):
+        """Записывает сообщение и отвечает как sendMessage."""
+        length = int(self.headers.get("Content-Length", 0))
+        body = self.rfile.read(length).decode()
+        url = urlsplit(self.path)
+        params = parse_qs(url.query)
+        params.update(parse_qs(body))
+        token = url.path.split("/")[1][len("bot"):]
+        if not self.server.owner.receive(
+            token, params.get("chat_id", [""])[0],
+            params.get("text", [""])[0],
+        ):
+            self.reply(429, {
+                "ok": False, "error_code": 429,
+                "description": "Too Many Requests: retry after 1",
+                "parameters": {"retry_after": 1},
+            })
+            return
+        self.reply(200, {"ok": True, "result": {
+            "message_id": 1, "date": int(time.time()),
+            "chat": {"id": 1, "type": "private"},
+        }})
+
+    do_GET = do_POST
+
+
+class FakeTelegram(FakeServer):
+    """Имитация Bot API, запоминающая полученные сообщения."""
+
+    handler = TelegramHandler
+
+    def __init__(self, bot_rate=None):
+        """
+        Создаёт имитацию без сообщений.
+        bot_rate — сколько сообщений в секунду принимается от одного бота;
+        сверх этого Telegram отвечает кодом 429.
+        """
+        super().__init__()
+        self.bot_rate = bot_rate
+        self.messages = []
+        self.throttled = 0
+        self._windows = {}
+
+    @property
+    def api_url(self):
+        """Шаблон адреса для apihelper.API_URL."""
+        return self.address + "/bot{0}/{1}"
+
+    def receive(self, token, chat_id, text):
+        """
+        Запоминает сообщение и время его получения.
+        Возвращает False, если бот превысил ограничение частоты.
+        """
+        now = time.time()
+        with self.lock:
+            if self.bot_rate is not None:
+                second, count = self._windows.get(token, (None, 0))
+                if second != int(now):
+                    second, count = int(now), 0
+                if count >= self.bot_rate:
+                    self.throttled += 1
+                    return False
+                self._windows[token] = (second, count + 1)
+            self.messages.append((now, chat_id, text))
+            return True
+
+
+class RespHandler(StreamRequestHandler):
+    """Разбирает команды протокола Redis и отвечает на них."""
+
+    def handle(self):
+        """Обрабатывает команды, пока клиент не закроет соединение."""
+        owner = self.server.owner
+        while True:
+            line = self.rfile.readline()
+            if not line.startswith(b"*"):
+                return
+            args = []
+            for _ in range(int(line[1:])):
+                size = int(self.rfile.readline()[1:])
+                args.append(self.rfile.read(size + 2)[:-2].decode())
+            self.wfile.write(owner.execute(args))
+
+    def log_message(self, format, *args):
+        """Не пишет запросы в stderr."""
+
+
+class FakeRedis(FakeServer):
+    """Локальная замена сервера Redis: PING, SELECT, GET, SET и DEL."""
+
+    handler = RespHandler
+
+    def __init__(self):
+        """Создаёт пустое хранилище."""
+        super().__init__()
+        self.items = {}
+        self.commands = 0
+
+    @property
+    def url(self):
+        """Адрес сервера вида redis://host:port."""
+        host, port = self.server.server_address
+        return f"redis://{host}:{port}"
+
+    def execute(self, args):
+        """Выполняет команду и возвращает ответ в протоколе RESP."""
+        command, args = args[0].upper(), args[1:]
+        now = time.monotonic()
+        with self.lock:
+            self.commands += 1
+            if command in ("PING", "SELECT"):
+                return b"+OK\r\n"
+            if command == "GET":
+                value, expires = self.items.get(args[0], (None, None))
+                if value is None or (expires is not None and expires <= now):
+                    return b"$-1\r\n"
+                data = value.encode()
+                return b"$%d\r\n%s\r\n" % (len(data), data)
+            if command == "DEL":
+                return b":%d\r\n" % (self.items.pop(args[0], None) is not None)
+            if command == "SET":
+                options = [arg.upper() for arg in args[2:]]
+                expires = None
+                if "PX" in options:
+                    milliseconds = int(args[options.index("PX") + 3])
+                    expires = now + milliseconds / 1000
+                current = self.items.get(args[0])
+                if ("NX" in options and current is not None
+                        and (current[1] is None or current[1] > now)):
+                    return b"$-1\r\n"
+                self.items[args[0]] = (args[1], expires)
+                return b"+OK\r\n"
+        return b"-ERR unknown command\r\n"
+
+
+def percentile(values, share):
+    """Процентиль по ближайшему рангу для отсортированного списка."""
+    if not values:
+        return None
+    rank = max(math.ceil(share * len(values)), 1)
+    return values[rank - 1]
+
+
+def peak_to_average(times, started, finished, bucket=1.0):
+    """
+    Отношение наибольшей частоты запросов к средней.
+    Частота считается по интервалам длиной bucket секунд.
+    """
+    buckets = [0] * max(math.ceil((finished - started) / bucket), 1)
+    for moment in times:
+        if started <= moment < finished:
+            index = min(int((moment - started) / bucket), len(buckets) - 1)
+            buckets[index] += 1
+    average = sum(buckets) / len(buckets)
+    return max(buckets) / average if average else None
+
+
+def match_notifications(messages, changes, verdicts):
+    """
+    Сопоставляет сообщения со сменами статусов.
+    Возвращает задержки уведомлений и число прочих сообщений.
+    """
+    statuses = {verdict: status for status, verdict in verdicts.items()}
+    latencies = []
+    other = 0
+    for received, _, text in messages:
+        for part in text.split("\n\n"):
+            found = MESSAGE.search(part)
+            status = found and statuses.get(found.group(2))
+            changed = status and changes.get((found.group(1), status))
+            if changed is None:
+                other += 1
+            else:
+                latencies.append(received - changed)
+    return sorted(latencies), other
+
+
+def usage():
+    """Процессорное время процесса в секундах и пиковый RSS в мегабайтах."""
+    rusage = resource.getrusage(resource.RUSAGE_SELF)
+    return rusage.ru_utime + rusage.ru_stime, rusage.ru_maxrss / 1024
+
+
+def serve_fakes(connection, tokens, change_rate, latency, error_rate, seed,
+                slow_rate, slow_latency, compress, bot_rate):
+    """
+    Запускает имитации Практикума и Telegram в дочернем процессе.
+    Отправляет в connection адреса имитаций, а по любому сообщению из
+    connection прекращает менять статусы и отправляет собранные данные.
+    """
+    practicum = FakePracticum(
+        tokens, change_rate, latency, error_rate, random.Random(seed),
+        slow_rate, slow_latency, compress,
+    )
+    with practicum, FakeTelegram(bot_rate) as telegram:
+        connection.send((practicum.url, telegram.api_url))
+        connection.recv()
+        practicum.stop_changes()
+        with practicum.lock, telegram.lock:
+            connection.send({
+                "call_times": practicum.call_times,
+                "changes": practicum.changes,
+                "calls": practicum.calls,
+                "errors": practicum.errors,
+                "bytes_sent": practicum.bytes_sent,
+                "messages": telegram.messages,
+                "throttled": telegram.throttled,
+            })
+
+
+def run(make_poller, verdicts, tenants=100, change_rate=10.0, latency=0.0,
+        error_rate=0.0, duration=30.0, interval=1.0, seed=None,
+        bot_rate=None, slow_rate=0.0, slow_latency=0.0, compress=True):
+    """
+    Прогоняет опрос и возвращает отчёт.
+    make_poller(endpoint, api_url, tokens, interval) создаёт Poller,
+    который опрашивает endpoint и отправляет сообщения через api_url.
+    bot_rate — ограничение частоты сообщений одного бота в Telegram;
+    доля slow_rate ответов API приходит с задержкой slow_latency;
+    compress — сжимать ответы API. Имитации запускаются в отдельном
+    процессе и не попадают в замер процессорного времени и памяти.
+    """
+    tokens = [f"tenant{index}" for index in range(tenants)]
+    context = multiprocessing.get_context("spawn")
+    connection, child = context.Pipe()
+    fakes = context.Process(
+        target=serve_fakes, name="loadtest-fakes", daemon=True,
+        args=(child, tokens, change_rate, latency, error_rate, seed,
+              slow_rate, slow_latency, compress, bot_rate),
+    )
+    fakes.start()
+    try:
+        endpoint, api_url = connection.recv()
+        poller = make_poller(endpoint, api_url, tokens, interval)
+        cpu_started, _ = usage()
+        wall_started = time.time()
+        started = time.monotonic()
+        finish = started + duration
+        while time.monotonic() < finish:
+            delay = poller.run_due()
+            time.sleep(max(min(delay, finish - time.monotonic()), 0))
+        elapsed = time.monotonic() - started
+        cpu, peak_rss = usage()
+        connection.send("stop")
+        served = connection.recv()
+    finally:
+        fakes.join(timeout=5)
+        if fakes.is_alive():
+            fakes.terminate()
+    peak_ratio = peak_to_average(
+        served["call_times"], wall_started, wall_started + elapsed
+    )
+    latencies, other = match_notifications(
+        served["messages"], served["changes"], verdicts
+    )
+    calls, errors = served["calls"], served["errors"]
+    delivered = len(latencies)
+    return {
+        "tenants": tenants,
+        "duration": elapsed,
+        "status_changes": len(served["changes"]),
+        "notifications": delivered,
+        "other_messages": other,
+        "telegram_throttled": served["throttled"],
+        "throughput": delivered / elapsed,
+        "latency_p50": percentile(latencies, 0.50),
+        "latency_p95": percentile(latencies, 0.95),
+        "latency_p99": percentile(latencies, 0.99),
+        "upstream_calls": calls,
+        "upstream_errors": errors,
+        "upstream_bytes_per_call": (
+            served["bytes_sent"] / calls if calls else None
+        ),
+        "calls_per_notification": calls / delivered if delivered else None,
+        "request_rate_peak_to_average": peak_ratio,
+        "cpu_seconds": cpu - cpu_started,
+        "peak_rss_mb": peak_rss,
+    }
+
+
+def format_report(report, baseline=None):
+    """Отчёт в виде текста; с baseline — с изменением в процентах."""
+    lines = []
+    for key, value in report.items():
+        line = f"{key:>22}: {_format(value):>12}"
+        previous = (baseline or {}).get(key)
+        if isinstance(value, (int, float)) and previous:
+            change = (value - previous) / previous * 100
+            line += f"  (было {_format(previous)}, {change:+.1f}%)"
+        lines.append(line)
+    return "\n".join(lines)
+
+
+def _format(value):
+    if value is None:
+        return "—"
+    if isinstance(value, float):
+        return f"{value:.4g}"
+    return str(value)
@@ -0,0 +1,52 @@
+"""
+Счётчики и показатели работы бота.
+
+Значения хранятся в памяти процесса и отдаются целиком через snapshot(),
+например в эндпоинте /metrics.
+"""
+
+import threading
+
+_lock = threading.Lock()
+_counters = {}
+_gauges = {}
+
+
+def inc(name, value=1):
+    """Увеличивает счётчик name на value."""
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + value
+
+
+def set_gauge(name, value):
+    """Задаёт текущее значение показателя name."""
+    _gauges[name] = value
+
+
+def register_gauge(name, func):
+    """Регистрирует функцию, вычисляющую показатель при каждом чтении."""
+    _gauges[name] = func
+
+
+def value(name, default=0):
+    """Возвращает значение счётчика или показателя."""
+    if name in _counters:
+        return _counters[name]
+    gauge = _gauges.get(name, default)
+    return gauge() if callable(gauge) else gauge
+
+
+def snapshot():
+    """Возвращает копию всех счётчиков и показателей."""
+    with _lock:
+        result = dict(_counters)
+    for name, gauge in list(_gauges.items()):
+        result[name] = gauge() if callable(gauge) else gauge
+    return result
+
+
+def reset():
+    """Сбрасывает все значения."""
+    with _lock:
+        _counters.clear()
+    _gauges.clear()
@@ -0,0 +1,237 @@
+"""
+Надёжная очередь исходящих уведомлений.
+
+Уведомление сначала фиксируется в SQLite и только потом отправляется
+фоновым потоком пачками. У каждого уведомления есть ключ идемпотентности:
+повторная постановка того же уведомления (например, после перезапуска)
+игнорируется, а неотправленные записи доставляются после рестарта.
+
+Порядок сохраняется только внутри чата: если отправка в чат не удалась,
+его следующие уведомления ждут повтора, а остальные чаты продолжают
+получать свои. Уведомление, которое Telegram отклонил окончательно
+(ошибка 4xx, кроме 429), или не отправленное за max_attempts попыток,
+помечается failed и больше не отправляется.
+"""
+
+from contextlib import contextmanager
+import logging
+import sqlite3
+import threading
+import time
+
+from telebot import apihelper
+
+import metrics
+from telegram_client import THROTTLED
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS outbox (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    idempotency_key TEXT NOT NULL UNIQUE,
+    chat_id TEXT NOT NULL,
+    text TEXT NOT NULL,
+    created REAL NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    delivered REAL,
+    failed REAL
+);
+CREATE INDEX IF NOT EXISTS outbox_pending ON outbox (id)
+    WHERE delivered IS NULL;
+"""
+
+
+def is_final(error):
+    """Отклонил ли Telegram отправку окончательно: 4xx, кроме 429."""
+    return (isinstance(error, apihelper.ApiTelegramException)
+            and 400 <= error.error_code < 500
+            and error.error_code != THROTTLED)
+
+
+class Outbox:
+    """Очередь уведомлений в файле SQLite."""
+
+    def __init__(self, path, max_attempts=20):
+        """
+        Открывает или создаёт очередь в файле path.
+        После max_attempts неудачных попыток уведомление помечается failed.
+        """
+        self.max_attempts = max_attempts
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(
+            path, check_same_thread=False, isolation_level=None
+        )
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(SCHEMA)
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._drainer = None
+
+    @contextmanager
+    def _transaction(self):
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                yield self._db
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+            self._db.execute("COMMIT")
+
+    def put(self, items):
+        """
+        Фиксирует уведомления одной транзакцией.
+        items — последовательность (ключ, chat_id, текст). Возвращает
+        число новых уведомлений; уже известные ключи пропускаются.
+        """
+        now = time.time()
+        with self._transaction() as db:
+            before = db.total_changes
+            db.executemany(
+                "INSERT OR IGNORE INTO outbox "
+                "(idempotency_key, chat_id, text, created) "
+                "VALUES (?, ?, ?, ?)",
+                [(key, chat_id, text, now) for key, chat_id, text in items],
+            )
+            added = db.total_changes - before
+        metrics.inc("outbox_enqueued", added)
+        if added:
+            self._wakeup.set()
+        return added
+
+    def pending(self, limit, after=0):
+        """
+        Возвращает до limit ожидающих уведомлений с id больше after по
+        порядку: (id, chat_id, текст, число попыток).
+        """
+        with self._lock:
+            return self._db.execute(
+                "SELECT id, chat_id, text, attempts FROM outbox "
+                "WHERE delivered IS NULL AND failed IS NULL AND id > ? "
+                "ORDER BY id LIMIT ?",
+                (after, limit),
+            ).fetchall()
+
+    def backlog(self):
+        """Число ожидающих отправки уведомлений."""
+        with self._lock:
+            return self._db.execute(
+                "SELECT COUNT(*) FROM outbox "
+                "WHERE delivered IS NULL AND failed IS NULL"
+            ).fetchone()[0]
+
+    def dead(self):
+        """Число уведомлений, отправка которых прекращена."""
+        with self._lock:
+            return self._db.execute(
+                "SELECT COUNT(*) FROM outbox WHERE failed IS NOT NULL"
+            ).fetchone()[0]
+
+    def mark_delivered(self, ids):
+        """Отмечает уведомления отправленными."""
+        now = time.time()
+        with self._transaction() as db:
+            db.executemany(
+                "UPDATE outbox SET delivered = ? WHERE id = ?",
+                [(now, row_id) for row_id in ids],
+            )
+
+    def mark_failed(self, row_id, final=False):
+        """
+        Учитывает неудачную попытку отправки.
+        Если final, уведомление больше не отправляется.
+        """
+        with self._lock:
+            self._db.execute(
+                "UPDATE outbox SET attempts = attempts + 1, failed = ? "
+                "WHERE id = ?",
+                (time.time() if final else None, row_id),
+            )
+
+    def drain(self, send, batch_size=100):
+        """
+        Делает до batch_size попыток отправки через send(chat_id, text).
+        Каждое отправленное уведомление сразу отмечается в файле, поэтому
+        после остановки процесса повторно уходит не больше одного.
+        После ошибки отправки в чат его следующие уведомления пропускаются
+        до следующего вызова, чтобы сохранить их порядок. Возвращает число
+        отправленных уведомлений.
+        """
+        delivered = 0
+        blocked = set()
+        attempted = 0
+        after = 0
+        while attempted < batch_size and not self._stop.is_set():
+            rows = self.pending(batch_size, after)
+            if not rows:
+                break
+            after = rows[-1][0]
+            for row_id, chat_id, text, attempts in rows:
+                if attempted >= batch_size or self._stop.is_set():
+                    break
+                if chat_id in blocked:
+                    continue
+                attempted += 1
+                try:
+                    send(chat_id, text)
+                except Exception as error:
+                    self.fail(row_id, chat_id, attempts, error, blocked)
+                    continue
+                self.mark_delivered([row_id])
+                metrics.inc("outbox_delivered")
+                delivered += 1
+        return delivered
+
+    def fail(self, row_id, chat_id, attempts, error, blocked):
+        """
+        Учитывает ошибку отправки уведомления.
+        Окончательно отклонённое или исчерпавшее попытки уведомление
+        помечается failed, иначе чат добавляется в blocked.
+        """
+        final = is_final(error) or attempts + 1 >= self.max_attempts
+        self.mark_failed(row_id, final)
+        if final:
+            metrics.inc("outbox_dead")
+            logging.error(f"Уведомление {row_id} для чата {chat_id} "
+                          f"отброшено: {error}")
+        else:
+            blocked.add(chat_id)
+            metrics.inc("outbox_failed")
+            logging.error(f"Уведомление {row_id} не отправлено: {error}")
+
+    def start_drainer(self, send, batch_size=100, retry_delay=5.0):
+        """Запускает фоновый поток, который опустошает очередь."""
+        stop = self._stop
+
+        def run():
+            while not stop.is_set():
+                self._wakeup.clear()
+                try:
+                    sent = self.drain(send, batch_size)
+                except Exception as error:
+                    logging.error(f"Ошибка очереди уведомлений: {error}")
+                    sent = 0
+                if sent == batch_size:
+                    continue
+                if sent == 0 and self.backlog():
+                    stop.wait(retry_delay)
+                else:
+                    self._wakeup.wait(retry_delay)
+
+        self._drainer = threading.Thread(target=run, name="outbox",
+                                         daemon=True)
+        self._drainer.start()
+        return stop
+
+    def close(self, timeout=None):
+        """
+        Останавливает отправку после текущего уведомления и закрывает
+        файл очереди. Ждёт фоновый поток не дольше timeout секунд.
+        """
+        self._stop.set()
+        self._wakeup.set()
+        if self._drainer is not None:
+            self._drainer.join(timeout)
+            self._drainer = None
+        with self._lock:
+            self._db.close()
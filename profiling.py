@@ -0,0 +1,105 @@
+"""
+Профилирование основного цикла бота.
+
+Профилировщик включается переменной окружения или сигналом и собирает
+cProfile за заданное число итераций цикла, а также снимки tracemalloc,
+сравнивая их между итерациями, чтобы находить утечки памяти. Пока
+профилирование выключено, хуки итерации сводятся к проверке флага.
+"""
+
+import cProfile
+import logging
+import os
+import pstats
+import signal
+import threading
+import time
+import tracemalloc
+
+TOP_ALLOCATIONS = 25
+
+
+class LoopProfiler:
+    """Профилирует заданное число итераций основного цикла."""
+
+    def __init__(self, iterations, output_dir=".", trace_memory=True):
+        """Задаёт число итераций и каталог для результатов."""
+        self.iterations = iterations
+        self.output_dir = output_dir
+        self.trace_memory = trace_memory
+        self.requested = False
+        self.active = False
+        self._profile = None
+        self._snapshot = None
+        self._done = 0
+        self._stamp = None
+
+    def toggle(self, signum=None, frame=None):
+        """Включает или выключает профилирование со следующей итерации."""
+        self.requested = not self.requested
+
+    def install_signal(self, signum=getattr(signal, "SIGUSR1", None)):
+        """Назначает сигнал, переключающий профилирование."""
+        if signum is None:
+            return
+        if threading.current_thread() is not threading.main_thread():
+            return
+        signal.signal(signum, self.toggle)
+
+    def start_iteration(self):
+        """Запускает профилирование итерации, если оно запрошено."""
+        if not self.requested:
+            return
+        if not self.active:
+            self._start()
+        self._profile.enable()
+
+    def finish_iteration(self):
+        """Останавливает профилирование итерации и сохраняет результаты."""
+        if not self.active:
+            return
+        self._profile.disable()
+        self._done += 1
+        if self.trace_memory:
+            self._dump_memory_diff()
+        if self._done >= self.iterations or not self.requested:
+            self._stop()
+
+    def _start(self):
+        self.active = True
+        self._done = 0
+        self._stamp = time.strftime("%Y%m%d-%H%M%S")
+        self._profile = cProfile.Profile()
+        if self.trace_memory:
+            tracemalloc.start()
+            self._snapshot = tracemalloc.take_snapshot()
+        logging.info(
+            f"Профилирование включено на {self.iterations} итераций."
+        )
+
+    def _stop(self):
+        path = self._path("profile", "prof")
+        self._profile.dump_stats(path)
+        with open(self._path("profile", "txt"), "w") as file:
+            stats = pstats.Stats(self._profile, stream=file)
+            stats.sort_stats("cumulative").print_stats(TOP_ALLOCATIONS)
+        if self.trace_memory:
+            tracemalloc.stop()
+            self._snapshot = None
+        self._profile = None
+        self.active = False
+        self.requested = False
+        logging.info(f"Профилирование завершено, результаты в {path}.")
+
+    def _dump_memory_diff(self):
+        snapshot = tracemalloc.take_snapshot()
+        diff = snapshot.compare_to(self._snapshot, "lineno")
+        self._snapshot = snapshot
+        with open(self._path(f"tracemalloc-{self._done}", "txt"), "w") as file:
+            for line in diff[:TOP_ALLOCATIONS]:
+                file.write(f"{line}\n")
+
+    def _path(self, name, extension):
+        return os.path.join(
+            self.output_dir, f"{name}-{self._stamp}.{extension}"
+        )
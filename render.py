@@ -0,0 +1,97 @@
+"""
+Сборка текста уведомлений по каталогам вердиктов.
+
+Каталог локали — шаблон уведомления с полями {homework_name} и {verdict}
+и тексты вердиктов по статусам. При создании Renderer вердикты
+подставляются в шаблон заранее, и уведомление собирается одной склейкой
+частей вокруг названия работы. Готовые тексты кэшируются в ограниченном
+LRU по (название работы, статус, локаль): одно и то же изменение статуса
+часто рассылается во многие чаты и сводки.
+"""
+
+from functools import lru_cache
+import json
+
+import metrics
+
+DEFAULT_LOCALE = "ru"
+
+CATALOGS = {
+    "en": {
+        "template": 'Review status of "{homework_name}" changed. {verdict}',
+        "verdicts": {
+            "approved": "The work is reviewed: the reviewer liked it. Hooray!",
+            "reviewing": "The work is being reviewed.",
+            "rejected": "The work is reviewed: the reviewer has remarks.",
+        },
+    },
+}
+
+
+def load_catalogs(path):
+    """
+    Читает каталоги локалей из файла JSON.
+    Формат: {"локаль": {"template": "...", "verdicts": {"статус": "..."}}}.
+    """
+    if not path:
+        return {}
+    with open(path, encoding="utf-8") as file:
+        catalogs = json.load(file)
+    for locale, catalog in catalogs.items():
+        if "template" not in catalog or "verdicts" not in catalog:
+            raise ValueError(f"В каталоге {locale} нет template или verdicts.")
+    return catalogs
+
+
+def compile_catalog(catalog):
+    """
+    Возвращает части шаблона для каждого статуса.
+    Между частями вставляется название работы.
+    """
+    template = catalog["template"]
+    return {
+        status: tuple(
+            template.replace("{verdict}", verdict).split("{homework_name}")
+        )
+        for status, verdict in catalog["verdicts"].items()
+    }
+
+
+class Renderer:
+    """Собирает уведомления по скомпилированным каталогам с кэшем."""
+
+    def __init__(self, catalogs, default=DEFAULT_LOCALE, cache_size=4096):
+        """
+        Компилирует каталоги catalogs, словарь локаль → каталог.
+        Для неизвестной локали используется default; в кэше держится до
+        cache_size готовых текстов, 0 — без кэша.
+        """
+        self.default = default
+        self.compiled = {
+            locale: compile_catalog(catalog)
+            for locale, catalog in catalogs.items()
+        }
+        if default not in self.compiled:
+            raise ValueError(f"Нет каталога для локали {default}.")
+        if cache_size:
+            self.render = lru_cache(maxsize=cache_size)(self.render)
+            metrics.register_gauge("render_cache_hits", self._hits)
+            metrics.register_gauge("render_cache_misses", self._misses)
+
+    def render(self, homework_name, status, locale=DEFAULT_LOCALE):
+        """
+        Возвращает текст уведомления о новом статусе работы.
+        Если в каталоге локали нет статуса, берётся каталог по умолчанию;
+        для неизвестного статуса выбрасывает ValueError.
+        """
+        parts = self.compiled.get(locale, self.compiled[self.default])
+        parts = parts.get(status) or self.compiled[self.default].get(status)
+        if parts is None:
+            raise ValueError(f"Неизвестный статус домашней работы: {status}")
+        return homework_name.join(parts)
+
+    def _hits(self):
+        return self.render.cache_info().hits
+
+    def _misses(self):
+        return self.render.cache_info().misses
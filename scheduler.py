@@ -0,0 +1,271 @@
+"""
+Планировщик опросов на иерархическом колесе таймеров.
+
+Время делится на тики. Колесо из levels уровней по 2**bits слотов
+хранит таймеры так, что добавление и отмена занимают O(1), а продвижение
+времени перекладывает таймеры с верхних уровней на нижние только при
+переходе границы уровня.
+"""
+
+import math
+import random
+import time
+import zlib
+
+import metrics
+
+CATCH_UP = "catch-up"
+SKIP = "skip"
+# Опоздание пробуждения в секундах, после которого пауза перестаёт быть
+# кратной тику и сокращается до точного срока, чтобы опоздание не копилось.
+DRIFT_TOLERANCE = 0.05
+
+
+def phase(key, period):
+    """Постоянный сдвиг ключа внутри периода, вычисленный по его хэшу."""
+    return zlib.crc32(str(key).encode()) / 2 ** 32 * period
+
+
+def phase_delay(key, period, now):
+    """
+    Секунды от отметки now до ближайшего момента со сдвигом ключа.
+    Отметка берётся по настенным часам, поэтому сдвиг сохраняется между
+    перезапусками и совпадает у разных экземпляров.
+    """
+    return (phase(key, period) - now) % period
+
+
+class TimingWheel:
+    """Иерархическое колесо таймеров с ключами."""
+
+    def __init__(self, bits=8, levels=4, now=0):
+        """Создаёт пустое колесо, текущий тик — now."""
+        self.bits = bits
+        self.levels = levels
+        self.size = 1 << bits
+        self.mask = self.size - 1
+        self.now = now
+        self._slots = [
+            [{} for _ in range(self.size)] for _ in range(levels)
+        ]
+        self._index = {}
+        self._overflow = {}
+        self._near = 0
+
+    def __len__(self):
+        """Число запланированных таймеров."""
+        return len(self._index)
+
+    def __contains__(self, key):
+        """Запланирован ли таймер с ключом key."""
+        return key in self._index
+
+    def schedule(self, key, tick, payload=None):
+        """Планирует таймер key на тик tick, заменяя прежний."""
+        if key in self._index:
+            self.cancel(key)
+        self._place(key, max(tick, self.now + 1), payload)
+
+    def cancel(self, key):
+        """Отменяет таймер key; возвращает True, если он был."""
+        position = self._index.pop(key, None)
+        if position is None:
+            return False
+        level, slot = position
+        if level is None:
+            del self._overflow[key]
+            return True
+        del self._slots[level][slot][key]
+        if level == 0:
+            self._near -= 1
+        return True
+
+    def advance(self, tick):
+        """Продвигает время до tick и возвращает сработавшие таймеры."""
+        expired = []
+        while self.now < tick:
+            if not self._near:
+                boundary = (self.now | self.mask) + 1
+                if boundary > tick:
+                    self.now = tick
+                    break
+                self.now = boundary - 1
+            self.now += 1
+            self._cascade()
+            slot = self._slots[0][self.now & self.mask]
+            if slot:
+                for key, (_, payload) in slot.items():
+                    del self._index[key]
+                    expired.append((key, payload))
+                self._near -= len(slot)
+                slot.clear()
+        return expired
+
+    def next_expiry(self):
+        """Возвращает ближайший тик срабатывания или None."""
+        best = min(
+            (tick for tick, _ in self._overflow.values()), default=None
+        )
+        for level in range(self.levels):
+            slots = self._slots[level]
+            start = self.now >> (self.bits * level)
+            for offset in range(self.size):
+                slot = slots[(start + offset) & self.mask]
+                if slot:
+                    tick = min(tick for tick, _ in slot.values())
+                    if best is None or tick < best:
+                        best = tick
+                    break
+        return best
+
+    def _place(self, key, tick, payload):
+        shift = 0
+        for level in range(self.levels):
+            upper = shift + self.bits
+            if tick >> upper == self.now >> upper:
+                slot = (tick >> shift) & self.mask
+                self._slots[level][slot][key] = (tick, payload)
+                self._index[key] = (level, slot)
+                if level == 0:
+                    self._near += 1
+                return
+            shift = upper
+        self._overflow[key] = (tick, payload)
+        self._index[key] = (None, None)
+
+    def _cascade(self):
+        for level in range(1, self.levels + 1):
+            if self.now & ((1 << (self.bits * level)) - 1):
+                return
+            if level == self.levels:
+                entries = self._overflow
+                self._overflow = {}
+            else:
+                slot = (self.now >> (self.bits * level)) & self.mask
+                entries = self._slots[level][slot]
+                self._slots[level][slot] = {}
+            for key, (tick, payload) in entries.items():
+                self._place(key, tick, payload)
+
+
+class PollScheduler:
+    """
+    Расписание опросов с собственным интервалом для каждого ключа.
+
+    Сроки считаются от монотонных часов с фиксированным шагом: следующий
+    срок — предыдущий срок плюс интервал, поэтому время самой работы не
+    сдвигает расписание. Если работа не успела к следующему сроку,
+    политика CATCH_UP выполняет пропущенные запуски подряд, а SKIP
+    переносит запуск на ближайший срок в будущем.
+    """
+
+    def __init__(self, tick=1.0, jitter=0.0, policy=SKIP,
+                 clock=time.monotonic, rng=random.random):
+        """
+        Создаёт расписание.
+        tick — длительность тика в секундах, jitter — наибольшая случайная
+        добавка к сроку в секундах, policy — CATCH_UP или SKIP.
+        """
+        if policy not in (CATCH_UP, SKIP):
+            raise ValueError(f"Неизвестная политика расписания: {policy}")
+        self.tick = tick
+        self.jitter = jitter
+        self.policy = policy
+        self.clock = clock
+        self.rng = rng
+        self.origin = clock()
+        self.wheel = TimingWheel()
+        self.intervals = {}
+        self.deadlines = {}
+        self._ready = []
+
+    def elapsed(self):
+        """Секунды, прошедшие с создания расписания."""
+        return self.clock() - self.origin
+
+    def current_tick(self):
+        """Номер текущего тика по монотонным часам."""
+        return int(self.elapsed() / self.tick)
+
+    def add(self, key, interval, delay=0.0):
+        """Добавляет ключ, первый запуск — через delay секунд."""
+        self.intervals[key] = interval
+        start = self.current_tick() * self.tick
+        self.deadlines[key] = start + max(delay, 0.0)
+        if delay <= 0:
+            self.wheel.cancel(key)
+            self._ready.append(key)
+        else:
+            self._schedule(key)
+
+    def remove(self, key):
+        """Убирает ключ из расписания."""
+        self.intervals.pop(key, None)
+        self.deadlines.pop(key, None)
+        self.wheel.cancel(key)
+        if key in self._ready:
+            self._ready.remove(key)
+
+    def set_interval(self, key, interval):
+        """Меняет интервал и сразу переносит ближайший запуск."""
+        previous = self.intervals.get(key)
+        if previous is None or previous == interval:
+            return
+        self.intervals[key] = interval
+        if key in self.wheel:
+            self.deadlines[key] += interval - previous
+            self._overrun(key)
+            self._schedule(key)
+
+    def schedule_next(self, key):
+        """Планирует следующий запуск ключа через интервал от его срока."""
+        if key not in self.intervals:
+            return
+        self.deadlines[key] += self.intervals[key]
+        self._overrun(key)
+        self._schedule(key)
+
+    def defer(self, key, delay):
+        """Откладывает запуск ключа на delay секунд, не сдвигая его срок."""
+        if key not in self.intervals:
+            return
+        self.wheel.schedule(
+            key, math.ceil((self.elapsed() + delay) / self.tick)
+        )
+
+    def due(self):
+        """Возвращает ключи, время запуска которых наступило."""
+        ready, self._ready = self._ready, []
+        expired = self.wheel.advance(self.current_tick())
+        return ready + [key for key, _ in expired]
+
+    def delay(self):
+        """Секунды до ближайшего запуска или None, если запусков нет."""
+        if self._ready:
+            return 0
+        tick = self.wheel.next_expiry()
+        if tick is None:
+            return None
+        whole = max(tick - self.current_tick(), 0) * self.tick
+        remaining = max(tick * self.tick - self.elapsed(), 0)
+        if whole - remaining < DRIFT_TOLERANCE:
+            return whole
+        return remaining
+
+    def _overrun(self, key):
+        now = self.elapsed()
+        deadline = self.deadlines[key]
+        if deadline > now:
+            return
+        metrics.inc("schedule_overruns")
+        if self.policy == SKIP:
+            interval = self.intervals[key]
+            missed = math.floor((now - deadline) / interval) + 1
+            self.deadlines[key] = deadline + missed * interval
+            metrics.inc("schedule_skipped", missed)
+
+    def _schedule(self, key):
+        deadline = self.deadlines[key]
+        if self.jitter:
+            deadline += self.jitter * self.rng()
+        self.wheel.schedule(key, math.ceil(deadline / self.tick))
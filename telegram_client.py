@@ -0,0 +1,200 @@
+"""
+Клиенты Telegram с общей HTTP-сессией.
+
+Все боты отправляют запросы через одну сессию requests с пулом
+keep-alive соединений, таймаутами и повтором, если соединение не удалось
+установить. Клиенты кэшируются по токену, а доля повторно использованных
+соединений доступна в метриках.
+
+Несколько ботов объединяются в BotPool: чат закрепляется за ботом
+согласованным хэшированием, а если бота ограничили по частоте или его
+токен отозван, сообщения его чатов временно уходят через следующих
+ботов на кольце.
+"""
+
+from bisect import bisect
+import hashlib
+import math
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from telebot import TeleBot, apihelper, util
+from urllib3.util.retry import Retry
+
+import metrics
+
+REPLICAS = 64  # Точек на кольце для одного бота
+THROTTLED = 429
+REVOKED = 401
+FORBIDDEN = 403
+
+_bots = {}
+_bots_lock = threading.Lock()
+_adapter = None
+
+
+def configure_session(pool_size=10, timeout=10, retries=3):
+    """Назначает telebot общую сессию с пулом соединений."""
+    global _adapter
+    # Повторяются только ошибки установления соединения: запрос ещё не
+    # отправлен. После тайм-аута чтения Telegram мог уже доставить
+    # sendMessage, и повтор прислал бы сообщение дважды.
+    retry = Retry(
+        total=retries,
+        connect=retries,
+        read=0,
+        status=0,
+        other=0,
+        backoff_factor=0.1,
+        raise_on_status=False,
+    )
+    _adapter = HTTPAdapter(
+        pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry
+    )
+    session = requests.Session()
+    session.mount("https://", _adapter)
+    session.mount("http://", _adapter)
+    apihelper.session = session
+    # telebot кэширует сессию в потоке, который уже отправлял запросы.
+    util.per_thread("req_session", lambda: session, reset=True)
+    apihelper.CONNECT_TIMEOUT = timeout
+    apihelper.READ_TIMEOUT = timeout
+    metrics.register_gauge("telegram_connections", connections)
+    metrics.register_gauge("telegram_requests", requests_sent)
+    metrics.register_gauge("telegram_connection_reuse", reuse_rate)
+    return session
+
+
+def _pools():
+    if _adapter is None:
+        return []
+    manager = _adapter.poolmanager
+    return [manager.pools[key] for key in list(manager.pools.keys())]
+
+
+def connections():
+    """Число соединений, открытых с Telegram."""
+    return sum(pool.num_connections for pool in _pools())
+
+
+def requests_sent():
+    """Число запросов, отправленных в Telegram."""
+    return sum(pool.num_requests for pool in _pools())
+
+
+def reuse_rate():
+    """Доля запросов, отправленных по уже открытому соединению."""
+    sent = requests_sent()
+    if not sent:
+        return 0.0
+    return max(sent - connections(), 0) / sent
+
+
+def register_bot(token, bot):
+    """Запоминает созданного бота в кэше по его токену."""
+    with _bots_lock:
+        return _bots.setdefault(token, bot)
+
+
+def get_bot(token):
+    """Возвращает бота для токена, создавая его при первом обращении."""
+    with _bots_lock:
+        bot = _bots.get(token)
+        if bot is None:
+            bot = _bots[token] = TeleBot(token)
+        return bot
+
+
+def bot_label(token):
+    """Идентификатор бота из токена, безопасный для метрик и логов."""
+    return token.partition(":")[0]
+
+
+def _ring_hash(value):
+    digest = hashlib.blake2b(str(value).encode(), digest_size=8)
+    return int.from_bytes(digest.digest(), "big")
+
+
+class BotPool:
+    """
+    Боты, между которыми распределяются чаты.
+
+    Пул отправляет сообщения так же, как TeleBot.send_message, поэтому
+    его можно передавать вместо бота.
+    """
+
+    def __init__(self, tokens, cooldown=60, clock=time.monotonic):
+        """
+        Строит кольцо из ботов для токенов tokens.
+        cooldown — на сколько секунд исключать бота, ограниченного по
+        частоте, если Telegram не сообщил retry_after.
+        """
+        self.tokens = list(dict.fromkeys(tokens))
+        self.cooldown = cooldown
+        self.clock = clock
+        self.unavailable = {}
+        self._ring = sorted(
+            (_ring_hash(f"{token}#{replica}"), token)
+            for token in self.tokens for replica in range(REPLICAS)
+        )
+        self._points = [point for point, _ in self._ring]
+
+    def owner(self, chat_id):
+        """Токен бота, за которым закреплён чат."""
+        return self._ring[bisect(self._points, _ring_hash(chat_id))
+                          % len(self._ring)][1]
+
+    def candidates(self, chat_id):
+        """Доступные токены в порядке обхода кольца от чата."""
+        now = self.clock()
+        start = bisect(self._points, _ring_hash(chat_id))
+        seen = []
+        for index in range(len(self._ring)):
+            token = self._ring[(start + index) % len(self._ring)][1]
+            if token in seen:
+                continue
+            seen.append(token)
+            if self.unavailable.get(token, 0) <= now:
+                yield token
+            if len(seen) == len(self.tokens):
+                return
+
+    def send_message(self, chat_id, text):
+        """
+        Отправляет сообщение через бота чата или следующего доступного.
+        Если сообщение не отправил ни один бот, выбрасывает последнюю
+        ошибку Telegram.
+        """
+        error = None
+        for token in self.candidates(chat_id):
+            label = bot_label(token)
+            try:
+                result = get_bot(token).send_message(chat_id, text)
+            except apihelper.ApiTelegramException as failure:
+                error = failure
+                self._fail(token, failure)
+                continue
+            metrics.inc(f"telegram_sent_{label}")
+            return result
+        if error is None:
+            raise apihelper.ApiException(
+                "Все боты недоступны.", "sendMessage", None
+            )
+        raise error
+
+    def _fail(self, token, failure):
+        label = bot_label(token)
+        metrics.inc(f"telegram_failed_{label}")
+        if failure.error_code == THROTTLED:
+            retry_after = failure.result_json.get("parameters", {}).get(
+                "retry_after", self.cooldown
+            )
+            self.unavailable[token] = self.clock() + retry_after
+            metrics.inc(f"telegram_throttled_{label}")
+        elif failure.error_code == REVOKED:
+            self.unavailable[token] = math.inf
+            metrics.inc(f"telegram_revoked_{label}")
+        elif failure.error_code != FORBIDDEN:
+            raise failure
@@ -0,0 +1,91 @@
+"""
+Получатели уведомлений.
+
+Получатель — это пара из токена Практикума и чата Telegram со своим
+интервалом опроса. Список получателей хранится в файле JSON Lines:
+по одному объекту на строку с ключами name, practicum_token, chat_id
+и необязательными interval и locale (язык уведомлений, по умолчанию ru).
+"""
+
+from collections import namedtuple
+import json
+
+Tenant = namedtuple(
+    "Tenant", ("name", "practicum_token", "chat_id", "interval", "locale"),
+    defaults=("ru",),
+)
+
+# Приоритеты опроса: меньшее значение опрашивается раньше.
+REVIEWING = 0  # Есть работа на проверке
+ACTIVE = 1  # Статус менялся недавно
+IDLE = 2
+
+
+class TenantState:
+    """Изменяемое состояние опроса одного получателя."""
+
+    __slots__ = ("cursor", "last_error", "seen", "reviewing", "changed")
+
+    def __init__(self, cursor, seen):
+        """
+        Начинает опрос с отметки времени cursor.
+        seen — набор уже отправленных статусов из модуля dedup.
+        """
+        self.cursor = cursor
+        self.last_error = None
+        self.seen = seen
+        self.reviewing = set()
+        self.changed = None
+
+    def track(self, homework_id, status, now):
+        """Запоминает смену статуса работы для расчёта приоритета."""
+        if status == "reviewing":
+            self.reviewing.add(homework_id)
+        else:
+            self.reviewing.discard(homework_id)
+        self.changed = now
+
+    def priority(self, now, active_window):
+        """
+        Возвращает приоритет опроса.
+        REVIEWING, если есть работа на проверке; ACTIVE, если статус
+        менялся за последние active_window секунд; иначе IDLE.
+        """
+        if self.reviewing:
+            return REVIEWING
+        if self.changed is not None and now - self.changed < active_window:
+            return ACTIVE
+        return IDLE
+
+
+def iter_tenants(path, interval):
+    """Построчно читает получателей из файла, не загружая его целиком."""
+    with open(path, encoding="utf-8") as file:
+        for number, line in enumerate(file, 1):
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            try:
+                data = json.loads(line)
+                yield Tenant(
+                    name=str(data.get("name") or data["chat_id"]),
+                    practicum_token=data["practicum_token"],
+                    chat_id=str(data["chat_id"]),
+                    interval=float(data.get("interval", interval)),
+                    locale=data.get("locale", "ru"),
+                )
+            except (ValueError, KeyError) as error:
+                raise ValueError(
+                    f"Некорректный получатель в {path}:{number}: {error}"
+                )
+
+
+def load_tenants(path, default):
+    """Возвращает получателей из файла или единственного default."""
+    if not path:
+        return [default]
+    tenants = list(iter_tenants(path, default.interval))
+    names = [tenant.name for tenant in tenants]
+    if len(set(names)) != len(names):
+        raise ValueError(f"Имена получателей в {path} повторяются.")
+    return tenants
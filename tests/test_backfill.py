@@ -0,0 +1,93 @@
+import threading
+import time
+
+import backfill
+import health
+import homework
+import tenants
+from tests.utils import RecordingBot
+
+
+class TestBackfill:
+
+    def test_map_bounded_limits_concurrency(self):
+        lock = threading.Lock()
+        running = []
+        peak = []
+
+        def work(item):
+            with lock:
+                running.append(item)
+                peak.append(len(running))
+            time.sleep(0.01)
+            with lock:
+                running.remove(item)
+            if item == 3:
+                raise ValueError('boom')
+            return item * 2
+
+        results = dict(backfill.map_bounded(range(10), work, concurrency=3))
+        assert max(peak) <= 3
+        assert isinstance(results.pop(3), ValueError)
+        assert results == {item: item * 2 for item in range(10) if item != 3}
+
+    def test_cursor_store_round_trip(self, tmp_path):
+        store = backfill.CursorStore(str(tmp_path / 'cursors.db'))
+        assert store.get('tenant') is None
+        store.set('tenant', 100)
+        store.set('tenant', 200)
+        store.close()
+        assert backfill.CursorStore(
+            str(tmp_path / 'cursors.db')
+        ).get('tenant') == 200
+
+    def test_poller_backfills_fresh_tenants(self, monkeypatch, tmp_path):
+        store = backfill.CursorStore(str(tmp_path / 'cursors.db'))
+        store.set('old', 500)
+        requested = []
+
+        def fake_request(headers, timestamp, tenant):
+            requested.append((headers['Authorization'], timestamp))
+            return {
+                'homeworks': [
+                    {'id': 1, 'homework_name': 'hw1', 'status': 'approved'}
+                ],
+                'current_date': 1000,
+            }
+
+        monkeypatch.setattr(homework, 'request_statuses', fake_request)
+        bot = RecordingBot()
+        poller = homework.Poller(
+            bot,
+            [tenants.Tenant('old', 'a', 'chat-old', 600),
+             tenants.Tenant('new', 'b', 'chat-new', 600)],
+            health.HealthState(),
+            cursors=store,
+        )
+        poller.backfill(lookback=86400, concurrency=2)
+
+        assert [auth for auth, _ in requested] == ['OAuth b'], (
+            'Историю нужно догружать только для получателей '
+            'без сохранённой позиции.'
+        )
+        assert requested[0][1] <= time.time() - 86400
+        assert [chat for chat, _ in bot.sent] == ['chat-new']
+        assert poller.states['new'].cursor == 1000
+        assert store.get('new') == 1000
+        assert poller.states['old'].cursor == 500
+
+    def test_backfill_requires_cursor_store(self, monkeypatch):
+        requested = []
+        monkeypatch.setattr(
+            homework, 'request_statuses',
+            lambda *args: requested.append(args),
+        )
+        poller = homework.Poller(
+            RecordingBot(), [tenants.Tenant('new', 'b', 'chat-new', 600)],
+            health.HealthState(),
+        )
+        poller.backfill(lookback=86400, concurrency=2)
+        assert requested == [], (
+            'Без хранилища позиций догрузка повторялась бы при каждом '
+            'перезапуске.'
+        )
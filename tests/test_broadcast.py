@@ -0,0 +1,97 @@
+import threading
+
+from telebot import apihelper
+
+import broadcast
+import loadtest
+import metrics
+import telegram_client
+import tenants
+from tests.utils import Clock
+
+
+def telegram_error(code, retry_after=None):
+    result = {'ok': False, 'error_code': code, 'description': 'ошибка'}
+    if retry_after is not None:
+        result['parameters'] = {'retry_after': retry_after}
+    return apihelper.ApiTelegramException('sendMessage', None, result)
+
+
+class FlakySender:
+    def __init__(self, errors):
+        self.errors = errors
+        self.sent = []
+        self.lock = threading.Lock()
+
+    def __call__(self, chat_id, text):
+        with self.lock:
+            failures = self.errors.get(chat_id)
+            if failures:
+                raise failures.pop(0) if isinstance(failures, list) else failures
+            self.sent.append(chat_id)
+
+
+def make_tenants(count):
+    return [tenants.Tenant(f't{index}', 'token', f'c{index % count}', 600)
+            for index in range(count + 2)]
+
+
+class TestBroadcast:
+
+    def setup_method(self):
+        metrics.reset()
+
+    def teardown_method(self):
+        metrics.reset()
+
+    def test_outcomes_and_resume(self, tmp_path):
+        checkpoint = str(tmp_path / 'broadcast.log')
+        sender = FlakySender({
+            'c3': telegram_error(403),
+            'c5': [telegram_error(429, retry_after=0)],
+            'c7': telegram_error(502),
+        })
+        stats = broadcast.Broadcast(
+            sender, rate=1000, workers=4, checkpoint=checkpoint, every=3,
+            sleep=lambda seconds: None,
+        ).run(make_tenants(10), 'Плановые работы')
+        assert sorted(sender.sent) == sorted(
+            f'c{index}' for index in range(10) if index not in (3, 7)
+        ), 'Каждый чат получает рассылку один раз.'
+        assert stats['sent'] == 8 and stats['throttled'] == 1
+        assert stats['failed'] == {'403': 1, broadcast.RETRY: 1}
+        assert metrics.value('broadcast_sent') == 8
+
+        resumed = FlakySender({})
+        stats = broadcast.Broadcast(
+            resumed, rate=1000, checkpoint=checkpoint
+        ).run(make_tenants(10), 'Плановые работы')
+        assert resumed.sent == ['c7'], (
+            'При повторе отправляются только чаты с временной ошибкой.'
+        )
+        assert stats['skipped'] == 9
+
+    def test_rate_limiter_spacing_and_pause(self):
+        clock = Clock()
+        limiter = broadcast.RateLimiter(10, clock=clock, sleep=clock.sleep)
+        for _ in range(5):
+            limiter.acquire()
+        assert round(clock.now, 6) == 0.4
+        limiter.pause(2)
+        limiter.acquire()
+        assert round(clock.now, 6) == 2.4, (
+            'После 429 все отправки ждут retry_after.'
+        )
+
+    def test_broadcast_through_telegram(self, monkeypatch):
+        with loadtest.FakeTelegram() as telegram:
+            monkeypatch.setattr(apihelper, 'API_URL', telegram.api_url)
+            telegram_client.configure_session(pool_size=4, timeout=5)
+            bot = telegram_client.get_bot('1:broadcast')
+            stats = broadcast.Broadcast(
+                bot.send_message, rate=500, workers=4
+            ).run(make_tenants(40), 'Напоминание о дедлайне')
+        assert stats['sent'] == 40
+        assert sorted(chat for _, chat, _ in telegram.messages) == sorted(
+            f'c{index}' for index in range(40)
+        )
@@ -0,0 +1,193 @@
+import threading
+import time
+
+import pytest
+
+import cache
+import health
+import homework
+import loadtest
+import metrics
+import tenants
+from tests.utils import RecordingBot
+
+
+def answer(current_date, *names):
+    return {
+        'homeworks': [
+            {'id': index, 'homework_name': name, 'status': 'approved'}
+            for index, name in enumerate(names)
+        ],
+        'current_date': current_date,
+    }
+
+
+@pytest.fixture(params=['memory', 'sqlite', 'redis'])
+def backend(request, tmp_path):
+    if request.param == 'memory':
+        yield cache.MemoryCacheBackend()
+    elif request.param == 'sqlite':
+        yield cache.SQLiteCacheBackend(str(tmp_path / 'cache.db'))
+    else:
+        with loadtest.FakeRedis() as server:
+            client = cache.RespCacheBackend(server.url)
+            yield client
+            client.close()
+
+
+class TestResponseCache:
+
+    def setup_method(self):
+        metrics.reset()
+
+    def teardown_method(self):
+        metrics.reset()
+
+    def test_backend_operations(self, backend):
+        assert backend.get('key') is None
+        assert backend.add('key', 'a', 10)
+        assert not backend.add('key', 'b', 10)
+        assert backend.get('key') == 'a'
+        backend.set('key', 'c', 10)
+        assert backend.get('key') == 'c'
+        backend.delete('key')
+        assert backend.get('key') is None
+        backend.set('short', 'x', 0.05)
+        time.sleep(0.1)
+        assert backend.get('short') is None, 'Срок значения должен истекать.'
+
+    def test_answer_reused_only_within_its_range(self, backend):
+        responses = cache.ResponseCache(backend, ttl=60)
+        calls = []
+
+        def load():
+            calls.append(1)
+            return answer(200, 'hw')
+
+        assert responses.fetch('token', 100, load) == answer(200, 'hw')
+        assert responses.fetch('token', 150, load) == answer(200, 'hw')
+        responses.fetch('token', 200, load)
+        responses.fetch('token', 50, load)
+        responses.fetch('token', 300, load)
+        assert len(calls) == 4, (
+            'Ответ подходит, только если from_date не раньше from_date и '
+            'раньше current_date сохранённого ответа.'
+        )
+        assert responses.hit_rate() == 0.2
+
+    def test_stampede_loads_once(self):
+        backend = cache.MemoryCacheBackend()
+        replicas = [cache.ResponseCache(backend, 60, poll=0.01)
+                    for _ in range(4)]
+        calls = []
+        results = []
+
+        def load():
+            calls.append(1)
+            time.sleep(0.2)
+            return answer(200, 'hw')
+
+        def worker(replica):
+            results.append(replica.fetch('token', 100, load))
+
+        threads = [threading.Thread(target=worker, args=(replica,))
+                   for replica in replicas for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert len(calls) == 1, 'Ответ должен загружаться один раз.'
+        assert results == [answer(200, 'hw')] * 16
+        assert metrics.value('response_cache_waits') >= 3
+
+    def test_waiting_does_not_block_other_keys(self):
+        backend = cache.MemoryCacheBackend()
+        responses = cache.ResponseCache(backend, 60, poll=0.01, max_wait=0.5)
+        backend.add(cache.token_key('busy') + ':lock', 'other', 10)
+        waiter = threading.Thread(
+            target=responses.fetch, args=('busy', 100, lambda: answer(200))
+        )
+        waiter.start()
+        time.sleep(0.05)
+        started = time.monotonic()
+        assert responses.fetch('free', 100, lambda: answer(200)) == answer(200)
+        assert time.monotonic() - started < 0.25, (
+            'Ожидание ответа одного ключа не должно задерживать другие.'
+        )
+        waiter.join()
+        assert metrics.value('response_cache_waits') == 1
+
+    def test_loading_does_not_block_other_keys(self):
+        responses = cache.ResponseCache(cache.MemoryCacheBackend(), 60)
+        loading = threading.Event()
+        release = threading.Event()
+
+        def slow():
+            loading.set()
+            release.wait(5)
+            return answer(200)
+
+        loader = threading.Thread(
+            target=responses.fetch, args=('slow', 100, slow)
+        )
+        loader.start()
+        loading.wait(5)
+        started = time.monotonic()
+        assert responses.fetch('fast', 100, lambda: answer(200)) == answer(200)
+        assert time.monotonic() - started < 0.25, (
+            'Загрузка ответа одного ключа не должна задерживать другие.'
+        )
+        release.set()
+        loader.join()
+        assert responses._loading == {}
+
+    def test_backend_error_after_load_does_not_reload(self, monkeypatch):
+        backend = cache.MemoryCacheBackend()
+        responses = cache.ResponseCache(backend, 60)
+        calls = []
+
+        def load():
+            calls.append(1)
+            return answer(200)
+
+        def broken(*args):
+            raise cache.CacheError('READONLY')
+
+        monkeypatch.setattr(backend, 'set', broken)
+        monkeypatch.setattr(backend, 'delete', broken)
+        assert responses.fetch('token', 100, load) == answer(200)
+        assert calls == [1], 'API не должен запрашиваться повторно.'
+        assert metrics.value('response_cache_errors') == 2
+
+    def test_unavailable_backend_falls_back_to_api(self):
+        backend = cache.RespCacheBackend('redis://127.0.0.1:1', timeout=0.1)
+        responses = cache.ResponseCache(backend, 60)
+        assert responses.fetch('token', 0, lambda: answer(1)) == answer(1)
+        assert metrics.value('response_cache_errors') == 1
+
+    def test_replicas_share_answers(self, monkeypatch):
+        calls = []
+
+        def request_statuses(headers, timestamp, tenant):
+            calls.append(tenant)
+            return answer(int(time.time()) + 60, 'hw')
+
+        monkeypatch.setattr(homework, 'request_statuses', request_statuses)
+        with loadtest.FakeRedis() as server:
+            bots = [RecordingBot(), RecordingBot()]
+            for bot, chat in zip(bots, ('chat-a', 'chat-b')):
+                poller = homework.Poller(
+                    bot, [tenants.Tenant(chat, 'shared-token', chat, 600)],
+                    health.HealthState(),
+                    cache=cache.ResponseCache(
+                        cache.RespCacheBackend(server.url), 60
+                    ),
+                )
+                poller.run_due()
+            assert all('shared-token' not in key for key in server.items), (
+                'Токен не должен попадать в хранилище кэша.'
+            )
+        assert calls == ['chat-a'], (
+            'Второй экземпляр должен взять ответ из кэша.'
+        )
+        assert [len(bot.sent) for bot in bots] == [1, 1]
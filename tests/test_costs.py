@@ -0,0 +1,141 @@
+from http import HTTPStatus
+import time
+
+import pytest
+import requests
+
+import costs
+import health
+import homework
+import metrics
+import tenants
+from tests.utils import Clock
+
+
+class TestCosts:
+
+    def setup_method(self):
+        metrics.reset()
+
+    def teardown_method(self):
+        metrics.reset()
+
+    def test_window_rolls_into_totals(self):
+        clock = Clock(1000.0)
+        ledger = costs.CostLedger(window=60, clock=clock)
+        ledger.add('a', costs.CALLS)
+        ledger.add('a', costs.BYTES, 500)
+        ledger.add('b', costs.CALLS, 3)
+        report = ledger.report(top=1)
+        assert [row['tenant'] for row in report['current']] == ['b']
+        clock.now += 61
+        ledger.add('a', costs.CALLS)
+        report = ledger.report(by=costs.BYTES)
+        assert report['current'][0]['calls'] == 1, (
+            'Счётчики окна должны обнуляться по его окончании.'
+        )
+        assert report['totals'][0] == {
+            'tenant': 'a', 'calls': 2, 'retries': 0, 'bytes': 500,
+            'errors': 0, 'sends': 0, 'limited': False,
+        }
+
+    def test_throttle_and_pause(self):
+        clock = Clock(1000.0)
+        ledger = costs.CostLedger({costs.CALLS: 10}, 100, clock=clock)
+        for _ in range(10):
+            ledger.add('a', costs.CALLS)
+        assert ledger.delay('a') == 0
+        ledger.add('a', costs.CALLS)
+        assert ledger.delay('a') == 10, (
+            'Сверх квоты опросы идут со средней скоростью квоты.'
+        )
+        assert metrics.value('quota_exceeded') == 1
+        ledger.configure({costs.CALLS: 10}, 100, costs.PAUSE)
+        ledger.add('a', costs.CALLS)
+        clock.now += 40
+        assert ledger.delay('a') == 60, 'Пауза длится до конца окна.'
+        clock.now += 60
+        assert ledger.delay('a') == 0
+
+    def test_parse_quotas(self):
+        assert costs.parse_quotas('calls=360, errors=6') == {
+            'calls': 360, 'errors': 6,
+        }
+        assert costs.parse_quotas(None) == {}
+        with pytest.raises(ValueError):
+            costs.parse_quotas('cpu=1')
+
+    def test_poller_defers_tenant_over_quota(self, monkeypatch):
+        ledger = costs.CostLedger({costs.ERRORS: 1}, 3600)
+        monkeypatch.setattr(costs, 'ledger', ledger)
+
+        def request_statuses(headers, timestamp, tenant):
+            ledger.add(tenant, costs.CALLS)
+            if tenant == 'bad':
+                raise homework.EndpointError('401')
+            return {'homeworks': [], 'current_date': 100}
+
+        monkeypatch.setattr(homework, 'request_statuses', request_statuses)
+
+        class Bot:
+            def send_message(self, chat_id, text):
+                pass
+
+        poller = homework.Poller(
+            Bot(),
+            [tenants.Tenant(name, 'token', name, 600)
+             for name in ('bad', 'good')],
+            health.HealthState(),
+        )
+        clock = Clock()
+        poller.scheduler.origin = 0
+        poller.scheduler.clock = clock
+        for _ in range(3):
+            poller.run_due()
+            clock.now += 600
+        status, report = homework.costs_report({'by': ['errors']})
+        assert status == HTTPStatus.OK
+        rows = {row['tenant']: row for row in report['current']}
+        assert rows['bad']['errors'] == 2 and rows['bad']['limited']
+        assert rows['bad']['sends'] == 1, (
+            'Повтор ошибки не должен отправляться повторно.'
+        )
+        assert rows['good']['calls'] == 3
+        assert metrics.value('polls_over_quota') >= 1
+        status, _ = homework.costs_report({'by': ['cpu']})
+        assert status == HTTPStatus.BAD_REQUEST
+
+    def test_sends_are_counted_after_delivery(self, monkeypatch):
+        ledger = costs.CostLedger(window=3600)
+        monkeypatch.setattr(costs, 'ledger', ledger)
+        failing = [True]
+
+        def sends():
+            return {row['tenant']: row['sends']
+                    for row in ledger.report()['current']}.get('t', 0)
+
+        class Bot:
+            def send_message(self, chat_id, text):
+                if failing[0]:
+                    raise requests.ConnectionError('Telegram недоступен')
+
+        poller = homework.Poller(
+            Bot(), [tenants.Tenant('t', 'token', 'chat', 600)],
+            health.HealthState(), window=0,
+        )
+        poller.report_changes(
+            poller.tenants['t'], poller.states['t'],
+            [{'id': number, 'homework_name': f'hw{number}',
+              'status': 'approved'} for number in range(3)],
+        )
+        poller.flush_digest()
+        assert sends() == 0, (
+            'Неудачная отправка не должна учитываться в квоте.'
+        )
+        failing[0] = False
+        later = time.monotonic() + 60
+        monkeypatch.setattr(homework.time, 'monotonic', lambda: later)
+        poller.flush_digest()
+        assert sends() == 1, (
+            'Сводка из нескольких изменений — одно сообщение.'
+        )
@@ -0,0 +1,32 @@
+import pytest
+
+import dedup
+
+
+class TestDedup:
+
+    @pytest.mark.parametrize('mode', [dedup.FINGERPRINT, dedup.TEXT])
+    def test_only_changed_statuses_are_new(self, mode):
+        seen = dedup.make(mode)
+        assert seen.is_new(1, 'reviewing', 'hw1: на проверке')
+        seen.remember(1, 'reviewing', 'hw1: на проверке')
+        seen.remember(2, 'approved', 'hw2: принята')
+        assert not seen.is_new(1, 'reviewing', 'hw1: на проверке')
+        assert seen.is_new(1, 'approved', 'hw1: принята')
+        seen.remember(1, 'approved', 'hw1: принята')
+        assert not seen.is_new(1, 'approved', 'hw1: принята')
+        assert len(seen) == 2
+
+    def test_fingerprints_are_smaller_than_text(self):
+        compact = dedup.make(dedup.FINGERPRINT)
+        text = dedup.make(dedup.TEXT)
+        for work in range(50):
+            message = (f'Изменился статус проверки работы "hw{work}". '
+                       'Работа проверена: ревьюеру всё понравилось. Ура!')
+            compact.remember(work, 'approved', message)
+            text.remember(work, 'approved', message)
+        assert compact.nbytes() * 10 < text.nbytes()
+
+    def test_unknown_mode(self):
+        with pytest.raises(ValueError):
+            dedup.make('bloom')
@@ -0,0 +1,90 @@
+import requests
+
+import backfill
+import digest
+import health
+import homework
+import metrics
+import tenants
+from tests.utils import RecordingBot
+
+
+class TestDigest:
+
+    def test_changes_are_coalesced_per_chat(self):
+        metrics.reset()
+        summary = digest.Digest(window=60)
+        summary.add('1', 'hw1', 'k1', 'hw1: на проверке', now=0)
+        summary.add('1', 'hw2', 'k2', 'hw2: принята', now=10)
+        summary.add('1', 'hw1', 'k3', 'hw1: принята', now=20)
+        summary.add('2', 'hw9', 'k9', 'hw9: отклонена', now=30)
+
+        assert summary.due(59) == []
+        assert summary.next_deadline() == 60
+        assert summary.due(60) == ['1']
+        chat_id, key, text = summary.render('1')
+        assert chat_id == '1' and key.startswith('digest:')
+        assert text == 'hw1: принята\n\nhw2: принята', (
+            'В сводке должен остаться только последний статус работы.'
+        )
+        summary.sent('1')
+        assert summary.due(90) == ['2']
+        assert summary.render('2') == ('2', 'k9', 'hw9: отклонена')
+        summary.sent('2')
+        assert len(summary) == 0
+        assert metrics.value('digest_calls_saved') == 2
+        metrics.reset()
+
+    def test_failed_flush_is_retried(self, monkeypatch):
+        clock = [0.0]
+        monkeypatch.setattr(homework.time, 'monotonic', lambda: clock[0])
+        attempts = []
+
+        class FlakyBot:
+            def send_message(self, chat_id, text):
+                attempts.append((chat_id, text))
+                if len(attempts) == 1:
+                    raise requests.ConnectionError('Telegram недоступен')
+
+        poller = homework.Poller(
+            FlakyBot(), [tenants.Tenant('t', 'a', 'chat', 600)],
+            health.HealthState(), window=60,
+        )
+        poller.report_changes(
+            poller.tenants['t'], poller.states['t'],
+            [{'id': 1, 'homework_name': 'hw1', 'status': 'approved'}],
+        )
+        clock[0] = 60
+        poller.flush_digest()
+        assert len(poller.digest) == 1, (
+            'Неотправленная сводка не должна теряться.'
+        )
+        clock[0] = 60 + digest.RETRY_AFTER
+        poller.flush_digest()
+        assert len(attempts) == 2 and attempts[0] == attempts[1]
+        assert len(poller.digest) == 0
+
+    def test_cursor_waits_for_digest(self, monkeypatch, tmp_path):
+        clock = [0.0]
+        monkeypatch.setattr(homework.time, 'monotonic', lambda: clock[0])
+        bot = RecordingBot()
+        cursors = backfill.CursorStore(str(tmp_path / 'cursors.db'))
+        poller = homework.Poller(
+            bot, [tenants.Tenant('t', 'a', 'chat', 600)],
+            health.HealthState(), window=60, cursors=cursors,
+        )
+        poller.handle('t', {
+            'homeworks': [
+                {'id': 1, 'homework_name': 'hw1', 'status': 'approved'},
+            ],
+            'current_date': 100,
+        })
+        assert cursors.get('t') is None, (
+            'Позиция не должна сохраняться, пока изменения ждут в сводке.'
+        )
+        clock[0] = 60
+        poller.flush_digest()
+        assert bot.sent and cursors.get('t') == 100
+        poller.handle('t', {'homeworks': [], 'current_date': 200})
+        assert cursors.get('t') == 200
+        cursors.close()
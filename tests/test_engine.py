@@ -0,0 +1,114 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+import engine
+import eventloop
+
+
+class TestThreadPoolEngine:
+
+    def test_results_and_errors(self):
+        def work(item):
+            if item == 2:
+                raise ValueError('boom')
+            return item * 10
+
+        with engine.ThreadPoolEngine(workers=4) as pool:
+            results = dict(pool.map(range(5), work))
+        assert isinstance(results.pop(2), ValueError)
+        assert results == {0: 0, 1: 10, 3: 30, 4: 40}
+
+    def test_deadline_and_backpressure(self):
+        release = threading.Event()
+        lock = threading.Lock()
+        running = []
+        peak = []
+
+        def work(item):
+            with lock:
+                running.append(item)
+                peak.append(len(running))
+            if item == 0:
+                release.wait(2)
+            else:
+                time.sleep(0.01)
+            with lock:
+                running.remove(item)
+            return item
+
+        with engine.ThreadPoolEngine(
+            workers=3, deadline=0.2, max_pending=3
+        ) as pool:
+            results = dict(pool.map(range(8), work))
+            release.set()
+
+        assert isinstance(results[0], engine.DeadlineExceeded), (
+            'Задача, не уложившаяся в дедлайн, должна вернуть '
+            '`DeadlineExceeded`.'
+        )
+        assert all(results[item] == item for item in range(1, 8))
+        assert max(peak) <= 3
+
+
+class TestAsyncioEngine:
+
+    def test_coroutines_and_sync_functions(self):
+        async def double(item):
+            await asyncio.sleep(0.01)
+            return item * 2
+
+        def triple(item):
+            if item == 2:
+                raise ValueError('boom')
+            return item * 3
+
+        with engine.AsyncioEngine(workers=2, max_pending=10) as pool:
+            doubled = dict(pool.map(range(20), double))
+            tripled = dict(pool.map(range(4), triple))
+        assert doubled == {item: item * 2 for item in range(20)}
+        assert isinstance(tripled.pop(2), ValueError)
+        assert tripled == {0: 0, 1: 3, 3: 9}
+
+    def test_deadline_cancels_coroutine(self):
+        async def work(item):
+            await asyncio.sleep(5 if item == 0 else 0)
+            return item
+
+        with engine.AsyncioEngine(workers=1, deadline=0.2) as pool:
+            results = dict(pool.map(range(3), work))
+        assert isinstance(results[0], engine.DeadlineExceeded)
+        assert results[1] == 1 and results[2] == 2
+
+    def test_blocking_call_is_reported(self, caplog):
+        def blocking_call():
+            time.sleep(0.4)
+
+        async def work(item):
+            blocking_call()
+            return item
+
+        with engine.AsyncioEngine(
+            workers=1, lag_interval=0.01, slow_callback=0.1
+        ) as pool:
+            dict(pool.map([1], work))
+            report = pool.monitor.report()
+        assert report['stalls'] == 1, (
+            'Синхронный вызов в цикле событий должен быть замечен.'
+        )
+        assert report['max'] >= 300
+        assert 'blocking_call' in caplog.text, (
+            'В лог должен попасть стек блокирующего вызова.'
+        )
+
+    def test_loop_selection(self):
+        with pytest.raises(ValueError):
+            eventloop.new_event_loop('twisted')
+        loop = eventloop.new_event_loop(eventloop.UVLOOP)
+        if eventloop.uvloop is None:
+            assert isinstance(loop, asyncio.AbstractEventLoop), (
+                'Без uvloop должен создаваться цикл asyncio.'
+            )
+        loop.close()
@@ -0,0 +1,83 @@
+import logging
+
+import pytest
+import requests
+
+import errors
+import health
+import homework
+import metrics
+import tenants
+from exceptions import EndpointError, ResponseFormatError
+from tests.utils import RecordingBot
+
+
+def fail(message):
+    raise EndpointError(message)
+
+
+class TestErrors:
+
+    def setup_method(self):
+        metrics.reset()
+
+    def teardown_method(self):
+        metrics.reset()
+
+    def test_api_errors_are_typed(self, monkeypatch):
+        def broken_get(*args, **kwargs):
+            raise requests.ConnectionError('down')
+
+        monkeypatch.setattr(requests, 'get', broken_get)
+        with pytest.raises(EndpointError):
+            homework.get_api_answer(0)
+
+    def test_category_by_type(self):
+        class CustomEndpointError(EndpointError):
+            pass
+
+        assert errors.category(CustomEndpointError()) == errors.ENDPOINT
+        assert errors.category(ResponseFormatError()) == errors.FORMAT
+        assert errors.category(TypeError()) == errors.FORMAT
+        assert errors.category(ZeroDivisionError()) == errors.OTHER
+
+    def test_traceback_only_for_first_occurrence(self, caplog):
+        reporter = errors.ErrorReporter()
+        with caplog.at_level(logging.ERROR):
+            for attempt in range(3):
+                try:
+                    fail(f'attempt {attempt}')
+                except EndpointError as error:
+                    reporter.log(error)
+        traced = [record.exc_info is not None for record in caplog.records]
+        assert traced == [True, False, False], (
+            'Трассировка повторной ошибки не должна попадать в лог.'
+        )
+        assert metrics.value('errors_endpoint') == 3
+        assert metrics.value('errors_traceback_skipped') == 2
+
+    def test_sampled_tracebacks(self, caplog):
+        rng = iter([0.9, 0.1]).__next__
+        reporter = errors.ErrorReporter(sample=0.5, rng=rng)
+        with caplog.at_level(logging.ERROR):
+            for _ in range(3):
+                try:
+                    fail('down')
+                except EndpointError as error:
+                    reporter.log(error)
+        traced = [record.exc_info is not None for record in caplog.records]
+        assert traced == [True, False, True]
+
+    def test_repeated_error_reported_once(self, monkeypatch):
+        monkeypatch.setattr(
+            homework, 'request_statuses',
+            lambda headers, timestamp, tenant: fail('down'),
+        )
+        bot = RecordingBot()
+        poller = homework.Poller(
+            bot, [tenants.Tenant('tenant', 'token', 'chat', 600)],
+            health.HealthState(),
+        )
+        for _ in range(3):
+            poller.poll('tenant')
+        assert bot.sent == [('chat', 'Ошибка в работе программы: down')]
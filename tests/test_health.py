@@ -0,0 +1,82 @@
+import json
+import time
+from urllib.request import urlopen
+from urllib.error import HTTPError
+
+import health
+import homework
+import metrics
+
+
+class TestHealthServer:
+
+    def get(self, address, path):
+        try:
+            with urlopen(f'http://{address[0]}:{address[1]}{path}') as resp:
+                return resp.status, json.loads(resp.read())
+        except HTTPError as error:
+            return error.code, json.loads(error.read())
+
+    def test_endpoints(self):
+        metrics.reset()
+        state = health.HealthState()
+        server = health.HealthServer(state, live_after=60, ready_after=60)
+        address = server.start('127.0.0.1', 0)
+        try:
+            status, body = self.get(address, '/readyz')
+            assert status == 503, (
+                'До первого успешного ответа API бот не должен '
+                'считаться готовым.'
+            )
+            state.mark_success('12345')
+            metrics.inc('api_calls')
+            status, body = self.get(address, '/readyz')
+            assert status == 200
+            assert body['tenants'] == 1
+            assert body['stale_tenants'] == 0
+            assert 'tenant_staleness' not in body, (
+                'Проверки состояния не должны отдавать давность по каждому '
+                'получателю.'
+            )
+            assert set(self.get(address, '/tenants?top=5')[1]) == {'12345'}
+            assert self.get(address, '/healthz')[0] == 200
+            assert self.get(address, '/metrics')[1] == {'api_calls': 1}
+            assert self.get(address, '/unknown')[0] == 404
+        finally:
+            server.stop()
+            metrics.reset()
+
+    def test_wedged_loop_is_not_alive(self):
+        state = health.HealthState()
+        state.heartbeat -= 120
+        server = health.HealthServer(state, live_after=60, ready_after=60)
+        assert server.healthz()[0] == 503
+
+    def test_report_summarizes_stale_tenants(self):
+        state = health.HealthState(stale_after=60)
+        state.mark_success('a', now=time.monotonic() - 300)
+        for tenant in ('b', 'c'):
+            state.mark_success(tenant)
+        report = state.report()
+        assert report['tenants'] == 3
+        assert report['stale_tenants'] == 1
+        assert report['max_staleness'] >= 300
+        assert list(state.staleness(top=1)) == ['a']
+        state.mark_success('a')
+        assert state.report()['stale_tenants'] == 0, (
+            'Успешный ответ должен возвращать получателя в актуальные.'
+        )
+        assert list(state.staleness()) == ['b', 'c', 'a']
+
+    def test_bad_top_is_rejected(self):
+        server = health.HealthServer(
+            health.HealthState(), live_after=60, ready_after=60
+        )
+        server.register('/costs', homework.costs_report)
+        address = server.start('127.0.0.1', 0)
+        try:
+            for path in ('/tenants?top=x', '/tenants?top=-1',
+                         '/costs?top=x'):
+                assert self.get(address, path)[0] == 400
+        finally:
+            server.stop()
@@ -0,0 +1,82 @@
+import itertools
+import threading
+import time
+
+import pytest
+
+import hedge
+import metrics
+
+
+def primed(budget, samples=20, latency=0.01):
+    hedger = hedge.Hedger(budget=budget, min_samples=samples)
+    for _ in range(samples):
+        hedger.record(latency)
+    return hedger
+
+
+def first_call_slow(delay):
+    counter = itertools.count()
+    release = threading.Event()
+
+    def call(value):
+        if next(counter) == 0:
+            release.wait(delay)
+            return ('slow', value)
+        return ('fast', value)
+
+    return call, release
+
+
+class TestHedger:
+
+    def setup_method(self):
+        metrics.reset()
+
+    def teardown_method(self):
+        metrics.reset()
+
+    def test_no_hedging_without_history(self):
+        hedger = hedge.Hedger(budget=1.0)
+        assert hedger.threshold() is None
+        assert hedger.call(lambda value: value * 2, 21) == 42
+        assert hedger.threshold() is None
+        hedger.close()
+
+    def test_threshold_is_quantile(self):
+        hedger = hedge.Hedger(quantile=0.9, min_samples=10)
+        for latency in range(1, 11):
+            hedger.record(latency / 10)
+        assert hedger.threshold() == 0.9
+        hedger.close()
+
+    def test_slow_request_is_hedged(self):
+        hedger = primed(budget=1.0)
+        call, release = first_call_slow(5)
+        started = time.monotonic()
+        assert hedger.call(call, 1) == ('fast', 1)
+        assert time.monotonic() - started < 1, (
+            'Ответ подстраховочного запроса должен вернуться сразу.'
+        )
+        assert metrics.value('hedges_sent') == 1
+        assert metrics.value('hedges_won') == 1
+        release.set()
+        hedger.close()
+
+    def test_budget_caps_hedges(self):
+        hedger = primed(budget=0.0)
+        call, release = first_call_slow(0.1)
+        assert hedger.call(call, 1) == ('slow', 1)
+        assert metrics.value('hedges_sent') == 0
+        assert metrics.value('hedges_over_budget') == 1
+        hedger.close()
+
+    def test_errors_propagate(self):
+        hedger = primed(budget=1.0)
+
+        def broken(value):
+            raise ValueError(value)
+
+        with pytest.raises(ValueError):
+            hedger.call(broken, 1)
+        hedger.close()
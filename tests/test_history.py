@@ -0,0 +1,160 @@
+import sqlite3
+import time
+
+import pytest
+
+import health
+import history
+import homework
+import metrics
+import tenants
+
+
+def work(number, status, updated, lesson='lesson1'):
+    return {
+        'id': number,
+        'homework_name': f'hw{number}',
+        'lesson_name': lesson,
+        'status': status,
+        'date_updated': updated,
+    }
+
+
+class TestHistory:
+
+    def test_median_review_per_lesson(self, tmp_path):
+        store = history.StatusHistory(str(tmp_path / 'history.db'))
+        for number, hours in enumerate((1, 2, 9), start=1):
+            store.append('t', work(number, 'reviewing', '2024-01-01T00:00:00Z'))
+            store.append(
+                't', work(number, 'approved', f'2024-01-01T0{hours}:00:00Z')
+            )
+        store.append('t', work(4, 'reviewing', '2024-01-01T00:00:00Z', 'x'))
+        store.append('t', work(4, 'rejected', '2024-01-01T04:00:00Z', 'x'))
+        store.flush()
+        assert store.median_review() == [('lesson1', 2 * 3600, 3)], (
+            'Медиана считается по одобренным работам каждого урока.'
+        )
+        assert store.median_review(status=history.REJECTED) == [
+            ('x', 4 * 3600, 1)
+        ]
+        assert store.median_review(by='tenant') == [('t', 2 * 3600, 3)]
+        store.close()
+
+    def test_median_of_even_count_is_average(self, tmp_path):
+        store = history.StatusHistory(str(tmp_path / 'history.db'))
+        for number, hours in enumerate((1, 2, 4, 8), start=1):
+            store.append('t', work(number, 'reviewing', '2024-01-01T00:00:00Z'))
+            store.append(
+                't', work(number, 'approved', f'2024-01-01T0{hours}:00:00Z')
+            )
+        store.flush()
+        assert store.median_review(by='tenant') == [('t', 3 * 3600, 4)]
+        store.close()
+
+    def test_top_tenants_by_rejections(self, tmp_path):
+        path = str(tmp_path / 'history.db')
+        store = history.StatusHistory(path).start()
+        for tenant, count in (('a', 1), ('b', 3), ('c', 2)):
+            for number in range(count):
+                store.append(
+                    tenant, work(number, 'rejected', '2024-01-01T00:00:00Z')
+                )
+        store.close()
+        reopened = history.StatusHistory(path)
+        assert reopened.top_tenants(limit=2) == [('b', 3), ('c', 2)], (
+            'События должны быть записаны фоновым потоком до закрытия.'
+        )
+        reopened.close()
+
+    def test_failed_batch_does_not_stop_writer(self, tmp_path, monkeypatch):
+        metrics.reset()
+        path = str(tmp_path / 'history.db')
+        store = history.StatusHistory(path, flush_interval=0.01)
+        insert = store._insert
+
+        def broken(tenant, homework, now):
+            if tenant == 'bad':
+                raise sqlite3.OperationalError('disk I/O error')
+            insert(tenant, homework, now)
+
+        monkeypatch.setattr(store, '_insert', broken)
+        store.start()
+        store.append('bad', work(1, 'rejected', '2024-01-01T00:00:00Z'))
+        self.wait_for(lambda: metrics.value('history_failed'))
+        store.append('good', work(2, 'rejected', '2024-01-01T00:00:00Z'))
+        assert self.wait_for(lambda: metrics.value('history_events')), (
+            'После ошибки записи фоновый поток должен продолжать работу.'
+        )
+        store.close()
+        reopened = history.StatusHistory(path)
+        assert reopened.top_tenants() == [('good', 1)]
+        reopened.close()
+        metrics.reset()
+
+    def test_failed_batch_forgets_new_tenants(self, tmp_path, monkeypatch):
+        store = history.StatusHistory(str(tmp_path / 'history.db'))
+        insert = store._insert
+
+        def broken(tenant, homework, now):
+            insert(tenant, homework, now)
+            if tenant == 'alice':
+                raise sqlite3.OperationalError('disk I/O error')
+
+        monkeypatch.setattr(store, '_insert', broken)
+        with pytest.raises(sqlite3.OperationalError):
+            store._write([
+                ('alice', work(1, 'rejected', '2024-01-01T00:00:00Z'), 0),
+            ])
+        monkeypatch.setattr(store, '_insert', insert)
+        store._write([
+            ('bob', work(2, 'rejected', '2024-01-01T00:00:00Z'), 0),
+            ('alice', work(3, 'rejected', '2024-01-01T00:00:00Z'), 0),
+        ])
+        assert sorted(store.top_tenants()) == [('alice', 1), ('bob', 1)], (
+            'События не должны попадать к получателю из отменённой пачки.'
+        )
+        store.close()
+
+    def wait_for(self, condition, timeout=5):
+        deadline = time.monotonic() + timeout
+        while not condition() and time.monotonic() < deadline:
+            time.sleep(0.01)
+        return condition()
+
+    def test_full_queue_drops_events(self, tmp_path):
+        store = history.StatusHistory(
+            str(tmp_path / 'history.db'), max_pending=1
+        )
+        assert store.append('t', work(1, 'reviewing', None))
+        assert not store.append('t', work(2, 'reviewing', None)), (
+            'Опрос не должен ждать записи журнала.'
+        )
+        store.close()
+
+    def test_poller_appends_new_statuses(self, tmp_path, monkeypatch):
+        response = {
+            'homeworks': [work(1, 'approved', '2024-01-01T01:00:00Z')],
+            'current_date': 100,
+        }
+        monkeypatch.setattr(
+            homework, 'request_statuses',
+            lambda headers, timestamp, tenant: response
+        )
+        store = history.StatusHistory(str(tmp_path / 'history.db'))
+
+        class Bot:
+            def send_message(self, chat_id, text):
+                pass
+
+        poller = homework.Poller(
+            Bot(), [tenants.Tenant('t', 'token', 'chat', 600)],
+            health.HealthState(), history=store,
+        )
+        poller.poll('t')
+        poller.poll('t')
+        store.flush()
+        assert store.top_tenants(history.APPROVED) == [('t', 1)], (
+            'Повторный статус не должен попадать в журнал.'
+        )
+        store.close()
@@ -0,0 +1,192 @@
+import sqlite3
+import time
+
+import backfill
+import health
+import homework
+import lease
+import tenants
+from tests.utils import Clock, RecordingBot
+
+
+def make_tenants(count):
+    return [
+        tenants.Tenant(f'tenant{index}', f'token{index}', f'chat{index}', 600)
+        for index in range(count)
+    ]
+
+
+class TestLease:
+
+    def test_memory_backend_fails_over_after_ttl(self):
+        backend = lease.MemoryLeaseBackend()
+        assert backend.acquire(0, 'a', 10, now=0) == 1
+        assert backend.acquire(0, 'b', 10, now=5) is None
+        assert backend.acquire(0, 'a', 10, now=8) == 1
+        assert backend.acquire(0, 'b', 10, now=17) is None
+        assert backend.acquire(0, 'b', 10, now=19) == 2
+        assert backend.token(0) == 2
+
+    def test_sqlite_backend_shared_between_instances(self, tmp_path):
+        path = str(tmp_path / 'leases.db')
+        first = lease.SQLiteLeaseBackend(path)
+        second = lease.SQLiteLeaseBackend(path)
+        assert first.acquire(3, 'a', 10, now=0) == 1
+        assert second.acquire(3, 'b', 10, now=5) is None
+        first.release(3, 'a')
+        assert second.acquire(3, 'b', 10, now=6) == 2
+        assert first.token(3) == 2
+
+    def test_shards_fail_over_after_ttl(self):
+        backend = lease.MemoryLeaseBackend()
+        clock = Clock(1000.0)
+        first = lease.ShardLeases(backend, 'a', 8, 30, clock)
+        second = lease.ShardLeases(backend, 'b', 8, 30, clock)
+        assert len(first.renew()) == 8
+        assert second.renew() == set()
+        clock.now += 31
+        assert len(second.renew()) == 8
+        assert first.renew() == set()
+        assert not first.owns('chat')
+        assert second.owns('chat')
+
+    def test_paused_leader_is_fenced(self):
+        backend = lease.MemoryLeaseBackend()
+        clock = Clock(1000.0)
+        old = lease.ShardLeases(backend, 'old', 1, 30, clock)
+        new = lease.ShardLeases(backend, 'new', 1, 30, clock)
+        old.renew()
+        assert old.fenced('chat')
+        clock.now += 31
+        new.renew()
+        clock.now -= 10
+        assert old.owns('chat'), (
+            'Без сверки с хранилищем старый владелец считает шард своим.'
+        )
+        assert not old.fenced('chat')
+        assert new.fenced('chat')
+
+    def test_pollers_do_not_double_notify(self, monkeypatch):
+        response = {
+            'homeworks': [
+                {'id': 1, 'homework_name': 'hw', 'status': 'approved'}
+            ],
+            'current_date': 100,
+        }
+        monkeypatch.setattr(
+            homework, 'request_statuses', lambda headers, timestamp, tenant: response
+        )
+        backend = lease.MemoryLeaseBackend()
+        bots = [RecordingBot(), RecordingBot()]
+        pollers = [
+            homework.Poller(
+                bot, make_tenants(20), health.HealthState(),
+                leases=lease.ShardLeases(backend, owner, 4, 30),
+            )
+            for bot, owner in zip(bots, ('a', 'b'))
+        ]
+        for poller in pollers:
+            poller.run_due()
+        sent = bots[0].sent + bots[1].sent
+        assert len(sent) == 20, 'Каждый чат должен получить одно уведомление.'
+        assert len({chat for chat, _ in sent}) == 20
+        assert bots[1].sent == [], 'Все шарды должен взять первый экземпляр.'
+
+    def test_failover_does_not_resend(self, monkeypatch, tmp_path):
+        base = 1_000_000
+        events = [(base + 10, {'id': 1, 'homework_name': 'hw',
+                               'status': 'approved'})]
+        api_now = [base + 20]
+
+        def fake_request(headers, timestamp, tenant):
+            return {
+                'homeworks': [
+                    work for updated, work in events if updated >= timestamp
+                ],
+                'current_date': api_now[0],
+            }
+
+        monkeypatch.setattr(homework, 'request_statuses', fake_request)
+        monkeypatch.setattr(homework.time, 'time', lambda: base)
+        store = backfill.CursorStore(str(tmp_path / 'cursors.db'))
+        backend = lease.MemoryLeaseBackend()
+        clock = Clock(1000.0)
+        first, second = RecordingBot(), RecordingBot()
+        replica_a = homework.Poller(
+            first, make_tenants(4), health.HealthState(), cursors=store,
+            leases=lease.ShardLeases(backend, 'a', 4, 30, clock),
+        )
+        replica_b = homework.Poller(
+            second, make_tenants(4), health.HealthState(), cursors=store,
+            leases=lease.ShardLeases(backend, 'b', 4, 30, clock),
+        )
+        replica_a.run_due()
+        assert len(first.sent) == 4
+
+        clock.now += 31
+        replica_b.renew_leases()
+        replica_b.run_due()
+        assert second.sent == [], (
+            'Новый владелец шарда не должен повторять уведомления, '
+            'которые уже отправил прежний.'
+        )
+
+        events.append((base + 30, {'id': 1, 'homework_name': 'hw',
+                                   'status': 'rejected'}))
+        api_now[0] = base + 40
+        for name in replica_b.tenants:
+            replica_b.poll(name)
+        assert len(second.sent) == 4
+
+    def test_lost_lease_keeps_digest_unsaved(self, tmp_path):
+        store = backfill.CursorStore(str(tmp_path / 'cursors.db'))
+        backend = lease.MemoryLeaseBackend()
+        clock = Clock(1000.0)
+        bot = RecordingBot()
+        poller = homework.Poller(
+            bot, make_tenants(1), health.HealthState(), window=0,
+            cursors=store,
+            leases=lease.ShardLeases(backend, 'a', 1, 30, clock),
+        )
+        poller.handle('tenant0', {
+            'homeworks': [
+                {'id': 1, 'homework_name': 'hw', 'status': 'approved'},
+            ],
+            'current_date': 100,
+        })
+        clock.now += 31
+        lease.ShardLeases(backend, 'b', 1, 30, clock).renew()
+        poller.flush_digest()
+        assert bot.sent == []
+        assert len(poller.digest) == 0
+        assert store.get('tenant0') is None, (
+            'Позиция отброшенной сводки не должна сохраняться: изменения '
+            'доставит новый владелец шарда.'
+        )
+
+    def test_lease_store_errors_do_not_stop_poller(self, monkeypatch):
+        monkeypatch.setattr(
+            homework, 'request_statuses',
+            lambda headers, timestamp, tenant: {
+                'homeworks': [], 'current_date': 100,
+            },
+        )
+        backend = lease.MemoryLeaseBackend()
+        clock = Clock(1000.0)
+        poller = homework.Poller(
+            RecordingBot(), make_tenants(1), health.HealthState(),
+            leases=lease.ShardLeases(backend, 'a', 1, 30, clock),
+        )
+
+        def locked(*args):
+            raise sqlite3.OperationalError('database is locked')
+
+        monkeypatch.setattr(backend, 'acquire', locked)
+        monkeypatch.setattr(backend, 'token', locked)
+        clock.now += 10
+        later = time.monotonic() + 20
+        poller.scheduler.clock = lambda: later
+        poller.run_due()
+        assert poller.states['tenant0'].cursor != 100, (
+            'Ответ без проверки аренды не должен сдвигать позицию.'
+        )
@@ -0,0 +1,57 @@
+from telebot import apihelper
+
+import health
+import homework
+import loadtest
+import telegram_client
+import tenants
+
+
+class TestLoadTest:
+
+    def test_percentile_nearest_rank(self):
+        values = list(range(1, 101))
+        assert loadtest.percentile(values, 0.5) == 50
+        assert loadtest.percentile(values, 0.99) == 99
+        assert loadtest.percentile([7], 0.95) == 7
+        assert loadtest.percentile([], 0.5) is None
+
+    def test_match_notifications(self):
+        verdicts = homework.HOMEWORK_VERDICTS
+        changes = {('a.zip', 'approved'): 10.0, ('b.zip', 'reviewing'): 11.0}
+        text = (f'Изменился статус проверки работы "a.zip". '
+                f'{verdicts["approved"]}\n\n'
+                f'Изменился статус проверки работы "b.zip". '
+                f'{verdicts["reviewing"]}')
+        latencies, other = loadtest.match_notifications(
+            [(12.0, 'chat', text), (13.0, 'chat', 'Ошибка')],
+            changes, verdicts,
+        )
+        assert latencies == [1.0, 2.0]
+        assert other == 1
+
+    def test_run_end_to_end(self, monkeypatch):
+        monkeypatch.setattr(apihelper, 'session', None)
+
+        def make_poller(endpoint, api_url, tokens, interval):
+            monkeypatch.setattr(homework, 'ENDPOINT', endpoint)
+            monkeypatch.setattr(apihelper, 'API_URL', api_url)
+            telegram_client.configure_session(pool_size=2, timeout=5)
+            return homework.Poller(
+                telegram_client.get_bot('0:test'),
+                [tenants.Tenant(token, token, token, interval)
+                 for token in tokens],
+                health.HealthState(),
+            )
+
+        report = loadtest.run(
+            make_poller, homework.HOMEWORK_VERDICTS, tenants=3,
+            change_rate=20, duration=1.5, interval=1, seed=1,
+        )
+        assert report['status_changes'] > 0
+        assert report['notifications'] > 0, (
+            'Изменения статусов должны доходить до имитации Telegram.'
+        )
+        assert report['upstream_calls'] >= 3
+        assert report['latency_p50'] <= report['latency_p99']
+        assert 'latency_p95' in loadtest.format_report(report, report)
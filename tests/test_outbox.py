@@ -0,0 +1,106 @@
+from telebot import apihelper
+
+import outbox
+
+
+class TestOutbox:
+
+    def test_idempotent_put_and_drain(self, tmp_path):
+        queue = outbox.Outbox(str(tmp_path / 'outbox.db'))
+        items = [
+            ('hw1:approved', '1', 'Принято'),
+            ('hw2:reviewing', '1', 'Ревью'),
+        ]
+        assert queue.put(items) == 2
+        assert queue.put(items[:1]) == 0, (
+            'Повторная постановка уведомления с тем же ключом '
+            'не должна создавать дубликат.'
+        )
+        sent = []
+        assert queue.drain(lambda chat_id, text: sent.append(text)) == 2
+        assert sent == ['Принято', 'Ревью']
+        assert queue.backlog() == 0
+        queue.close()
+
+    def test_failed_send_is_retried_after_restart(self, tmp_path):
+        path = str(tmp_path / 'outbox.db')
+        queue = outbox.Outbox(path)
+        queue.put([('a', '1', 'first'), ('b', '1', 'second')])
+
+        def broken(chat_id, text):
+            if text == 'second':
+                raise ConnectionError('Telegram недоступен')
+
+        assert queue.drain(broken) == 1
+        queue.close()
+
+        queue = outbox.Outbox(path)
+        sent = []
+        assert queue.drain(lambda chat_id, text: sent.append(text)) == 1
+        assert sent == ['second']
+        queue.close()
+
+    def test_failing_chat_does_not_block_others(self, tmp_path):
+        queue = outbox.Outbox(str(tmp_path / 'outbox.db'), max_attempts=2)
+        queue.put([
+            ('a1', 'blocked', 'first'),
+            ('b1', 'down', 'first'),
+            ('b2', 'down', 'second'),
+            ('c1', 'ok', 'first'),
+        ])
+        sent = []
+
+        def send(chat_id, text):
+            if chat_id == 'blocked':
+                raise apihelper.ApiTelegramException(
+                    'sendMessage', None,
+                    {'error_code': 403, 'description': 'Forbidden'},
+                )
+            if chat_id == 'down':
+                raise ConnectionError('Telegram недоступен')
+            sent.append((chat_id, text))
+
+        assert queue.drain(send) == 1
+        assert sent == [('ok', 'first')], (
+            'Ошибка одного чата не должна останавливать отправку в другие.'
+        )
+        assert queue.dead() == 1, (
+            'Уведомление, отклонённое с кодом 403, не должно повторяться.'
+        )
+        assert queue.backlog() == 2
+        assert queue.drain(send) == 0
+        assert queue.dead() == 2, (
+            'После max_attempts попыток уведомление должно отбрасываться.'
+        )
+        assert queue.backlog() == 1
+        queue.close()
+
+    def test_each_delivery_is_committed(self, tmp_path):
+        path = str(tmp_path / 'outbox.db')
+        queue = outbox.Outbox(path)
+        queue.put([(str(number), '1', str(number)) for number in range(3)])
+        seen = []
+
+        def send(chat_id, text):
+            if text == '2':
+                observer = outbox.Outbox(path)
+                seen.append(observer.backlog())
+                observer.close()
+
+        assert queue.drain(send) == 3
+        assert seen == [1], (
+            'Отправленные уведомления должны отмечаться сразу, иначе '
+            'после падения процесса они уйдут повторно.'
+        )
+        queue.close()
+
+    def test_close_stops_drainer(self, tmp_path):
+        queue = outbox.Outbox(str(tmp_path / 'outbox.db'))
+        sent = []
+        queue.start_drainer(lambda chat_id, text: sent.append(text))
+        queue.put([('a', '1', 'first')])
+        drainer = queue._drainer
+        queue.close(timeout=5)
+        assert not drainer.is_alive(), (
+            'close() должен дождаться остановки фонового потока.'
+        )
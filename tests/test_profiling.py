@@ -0,0 +1,27 @@
+import profiling
+
+
+class TestLoopProfiler:
+
+    def test_disabled_profiler_writes_nothing(self, tmp_path):
+        profiler = profiling.LoopProfiler(2, tmp_path)
+        profiler.start_iteration()
+        profiler.finish_iteration()
+        assert not profiler.active
+        assert not list(tmp_path.iterdir())
+
+    def test_profiles_requested_iterations(self, tmp_path):
+        profiler = profiling.LoopProfiler(2, tmp_path)
+        profiler.toggle()
+        for _ in range(3):
+            profiler.start_iteration()
+            sum(range(1000))
+            profiler.finish_iteration()
+
+        names = sorted(path.name for path in tmp_path.iterdir())
+        assert not profiler.active and not profiler.requested, (
+            'Профилирование должно выключаться после заданного '
+            'числа итераций.'
+        )
+        assert any(name.endswith('.prof') for name in names)
+        assert sum(name.startswith('tracemalloc-') for name in names) == 2
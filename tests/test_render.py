@@ -0,0 +1,77 @@
+import json
+
+import pytest
+
+import health
+import homework
+import render
+import tenants
+from tests.utils import RecordingBot
+
+
+class TestRender:
+
+    def test_parse_status_text_is_unchanged(self):
+        for status, verdict in homework.HOMEWORK_VERDICTS.items():
+            result = homework.parse_status(
+                {'homework_name': 'hw {x}', 'status': status}
+            )
+            assert result == (
+                f'Изменился статус проверки работы "hw {{x}}". {verdict}'
+            )
+        with pytest.raises(ValueError):
+            homework.parse_status({'homework_name': 'hw', 'status': 'x'})
+
+    def test_cache_and_locale_fallback(self):
+        renderer = render.Renderer(
+            {
+                'ru': {'template': '{homework_name}: {verdict}',
+                       'verdicts': {'approved': 'да', 'rejected': 'нет'}},
+                'de': {'template': '{verdict} ({homework_name})',
+                       'verdicts': {'approved': 'ja'}},
+            },
+            cache_size=2,
+        )
+        assert renderer.render('hw', 'approved', 'de') == 'ja (hw)'
+        assert renderer.render('hw', 'rejected', 'de') == 'hw: нет', (
+            'Статус без перевода берётся из каталога по умолчанию.'
+        )
+        assert renderer.render('hw', 'approved', 'fr') == 'hw: да'
+        renderer.render('hw', 'approved', 'fr')
+        assert renderer.render.cache_info().hits == 1
+        assert renderer.render.cache_info().currsize == 2
+
+    def test_catalog_file_and_tenant_locale(self, tmp_path, monkeypatch):
+        catalog = tmp_path / 'catalog.json'
+        catalog.write_text(json.dumps({
+            'uk': {'template': 'Робота "{homework_name}". {verdict}',
+                   'verdicts': {'approved': 'Зараховано.'}},
+        }), encoding='utf-8')
+        monkeypatch.setattr(homework, 'renderer', render.Renderer({
+            **render.load_catalogs(str(catalog)),
+            'ru': {'template': homework.MESSAGE_TEMPLATE,
+                   'verdicts': homework.HOMEWORK_VERDICTS},
+        }))
+        tenant_file = tmp_path / 'tenants.jsonl'
+        tenant_file.write_text(
+            '{"practicum_token": "a", "chat_id": 1, "locale": "uk"}\n'
+            '{"practicum_token": "b", "chat_id": 2}\n',
+            encoding='utf-8',
+        )
+        tenant_list = list(tenants.iter_tenants(str(tenant_file), 600))
+        response = {
+            'homeworks': [{'id': 1, 'homework_name': 'hw',
+                           'status': 'approved'}],
+            'current_date': 100,
+        }
+        monkeypatch.setattr(
+            homework, 'request_statuses',
+            lambda headers, timestamp, tenant: response
+        )
+        bot = RecordingBot()
+        poller = homework.Poller(bot, tenant_list, health.HealthState())
+        poller.run_due()
+        assert sorted(bot.sent) == [
+            ('1', 'Робота "hw". Зараховано.'),
+            ('2', homework.parse_status(response['homeworks'][0])),
+        ]
@@ -0,0 +1,144 @@
+import random
+
+import pytest
+
+import health
+import homework
+import scheduler
+import tenants
+from tests.utils import Clock, RecordingBot
+
+
+class TestTimingWheel:
+
+    def test_timers_fire_on_their_tick(self):
+        rng = random.Random(0)
+        wheel = scheduler.TimingWheel(bits=3, levels=2)
+        deadlines = {key: rng.randint(1, 2000) for key in range(500)}
+        for key, tick in deadlines.items():
+            wheel.schedule(key, tick)
+
+        for tick in range(1, 2001):
+            for key, _ in wheel.advance(tick):
+                assert deadlines.pop(key) == tick, (
+                    'Таймер должен срабатывать ровно на своём тике.'
+                )
+        assert not deadlines and not len(wheel)
+
+    def test_cancel_and_next_expiry(self):
+        wheel = scheduler.TimingWheel(bits=2, levels=2)
+        wheel.schedule('a', 5)
+        wheel.schedule('b', 40)
+        wheel.schedule('c', 3)
+        assert wheel.next_expiry() == 3
+        assert wheel.cancel('c') and not wheel.cancel('c')
+        assert wheel.next_expiry() == 5
+        wheel.schedule('a', 50)
+        assert wheel.next_expiry() == 40
+        assert [key for key, _ in wheel.advance(100)] == ['b', 'a']
+        assert wheel.next_expiry() is None
+
+
+class TestPollScheduler:
+
+    def test_intervals_per_key(self):
+        clock = Clock()
+        poll = scheduler.PollScheduler(clock=clock)
+        poll.add('fast', 10)
+        poll.add('slow', 30)
+        assert sorted(poll.due()) == ['fast', 'slow']
+        for key in ('fast', 'slow'):
+            poll.schedule_next(key)
+        assert poll.delay() == 10
+
+        clock.now = 10.5
+        assert poll.due() == ['fast']
+        poll.schedule_next('fast')
+        poll.set_interval('slow', 5)
+        assert poll.delay() == 4.5, (
+            'Опоздание пробуждения больше допуска должно сокращать паузу.'
+        )
+        clock.now = 15
+        assert poll.due() == ['slow']
+
+    def test_fixed_rate_does_not_drift(self):
+        clock = Clock()
+        poll = scheduler.PollScheduler(clock=clock)
+        poll.add('tenant', 600)
+        for period in range(5):
+            assert poll.due() == ['tenant']
+            clock.now += 7.3  # Время опроса не должно сдвигать расписание
+            poll.schedule_next('tenant')
+            clock.now += poll.delay()
+            deadline = (period + 1) * 600
+            assert deadline <= clock.now < deadline + poll.tick, (
+                'Опоздание пробуждения не должно накапливаться.'
+            )
+
+    def test_overrun_policies(self):
+        for policy, expected in ((scheduler.SKIP, 3 * 600),
+                                 (scheduler.CATCH_UP, 600)):
+            clock = Clock()
+            poll = scheduler.PollScheduler(policy=policy, clock=clock)
+            poll.add('tenant', 600)
+            poll.due()
+            clock.now = 1500
+            poll.schedule_next('tenant')
+            assert poll.deadlines['tenant'] == expected, (
+                f'Проверьте политику расписания `{policy}`.'
+            )
+
+    def test_defer_keeps_deadline_grid(self):
+        clock = Clock()
+        poll = scheduler.PollScheduler(clock=clock)
+        poll.add('tenant', 600)
+        poll.due()
+        poll.defer('tenant', 1)
+        assert poll.delay() == 1
+        clock.now = 1
+        assert poll.due() == ['tenant']
+        poll.schedule_next('tenant')
+        assert poll.deadlines['tenant'] == 600, (
+            'Отложенный опрос не должен сдвигать расписание.'
+        )
+
+    def test_phase_is_stable_and_spread(self):
+        keys = [f'tenant{index}' for index in range(1000)]
+        phases = [scheduler.phase(key, 600) for key in keys]
+        assert phases == [scheduler.phase(key, 600) for key in keys]
+        assert all(0 <= value < 600 for value in phases)
+        buckets = [0] * 10
+        for value in phases:
+            buckets[int(value // 60)] += 1
+        assert max(buckets) < 2 * min(buckets), (
+            'Сдвиги должны равномерно покрывать период.'
+        )
+        for now in (0, 1234.5, 1e9):
+            delay = scheduler.phase_delay('tenant', 600, now)
+            assert 0 <= delay < 600
+            assert (now + delay) % 600 == pytest.approx(
+                scheduler.phase('tenant', 600)
+            )
+
+    def test_poller_sleep_fits_health_thresholds(self, monkeypatch):
+        monkeypatch.setattr(
+            homework, 'request_statuses',
+            lambda headers, timestamp, tenant: {
+                'homeworks': [], 'current_date': timestamp,
+            },
+        )
+        state = health.HealthState()
+        state.heartbeat -= 1000
+        poller = homework.Poller(
+            RecordingBot(),
+            [tenants.Tenant('slow', 'token', 'chat',
+                            10 * homework.RETRY_PERIOD)],
+            state,
+        )
+        poller.poll('slow')
+        assert state.report()['since_heartbeat'] < 1, (
+            'Каждый опрос должен отмечаться в /healthz.'
+        )
+        assert poller.run_due() <= homework.RETRY_PERIOD, (
+            'Пауза цикла не должна превышать порог /healthz.'
+        )
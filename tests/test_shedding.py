@@ -0,0 +1,79 @@
+import time
+
+import health
+import homework
+import metrics
+import tenants
+from tests.utils import RecordingBot
+
+
+def make_poller(names):
+    return homework.Poller(
+        RecordingBot(),
+        [tenants.Tenant(name, f'token-{name}', name, 600) for name in names],
+        health.HealthState(),
+    )
+
+
+class TestPriority:
+
+    def test_priority_classes(self):
+        state = tenants.TenantState(0, None)
+        assert state.priority(100, 60) == tenants.IDLE
+        state.track(1, 'reviewing', now=50)
+        assert state.priority(100, 60) == tenants.REVIEWING
+        state.track(1, 'approved', now=50)
+        assert state.priority(100, 60) == tenants.ACTIVE
+        assert state.priority(200, 60) == tenants.IDLE
+
+
+class TestLoadShedding:
+
+    def setup_method(self):
+        metrics.reset()
+
+    def teardown_method(self):
+        metrics.reset()
+
+    def test_reviewing_tenants_polled_first(self, monkeypatch):
+        poller = make_poller(['idle', 'active', 'reviewing'])
+        now = time.monotonic()
+        poller.states['reviewing'].track(1, 'reviewing', now)
+        poller.states['active'].track(2, 'approved', now)
+        polled = []
+        monkeypatch.setattr(
+            poller, 'poll', lambda name: polled.append(name)
+        )
+        poller.run_due()
+        assert polled == ['reviewing', 'active', 'idle']
+
+    def test_overload_defers_active_and_drops_idle(self, monkeypatch):
+        poller = make_poller(['idle', 'active', 'reviewing'])
+        now = time.monotonic()
+        poller.states['reviewing'].track(1, 'reviewing', now)
+        poller.states['active'].track(2, 'approved', now)
+        polled = []
+
+        def slow_poll(name):
+            polled.append(name)
+            time.sleep(0.05)
+
+        monkeypatch.setattr(homework, 'POLL_BUDGET', 0.01)
+        monkeypatch.setattr(poller, 'poll', slow_poll)
+        delay = poller.run_due()
+        assert polled == ['reviewing'], (
+            'При перегрузке опрашиваются только приоритетные получатели.'
+        )
+        assert metrics.value('polls_deferred') == 1
+        assert metrics.value('polls_dropped') == 1
+        assert delay <= 2 * poller.scheduler.tick
+        assert poller.scheduler.deadlines['idle'] == 600, (
+            'Пропущенный опрос переносится на следующий срок.'
+        )
+
+        wakeup = poller.wakeup
+        poller.scheduler.clock = lambda: wakeup
+        poller.run_due()
+        assert polled == ['reviewing', 'active'], (
+            'Отложенный опрос выполняется при следующем пробуждении.'
+        )
@@ -0,0 +1,45 @@
+import health
+import homework
+import tenants
+from tests.utils import RecordingBot
+
+
+def make_poller(count, interval=600):
+    return homework.Poller(
+        RecordingBot(),
+        [tenants.Tenant(f't{index}', 'token', f'chat{index}', interval)
+         for index in range(count)],
+        health.HealthState(),
+    )
+
+
+class TestSpread:
+
+    def test_first_polls_immediate_by_default(self):
+        poller = make_poller(5)
+        assert sorted(poller.scheduler.due()) == sorted(poller.tenants)
+
+    def test_spread_assigns_phase_offsets(self, monkeypatch):
+        monkeypatch.setattr(homework, 'POLL_SPREAD', True)
+        poller = make_poller(200)
+        first = [poller.scheduler.deadlines[name] for name in poller.tenants]
+        assert all(0 <= deadline < 600 for deadline in first)
+        assert len({int(deadline // 60) for deadline in first}) == 10, (
+            'Первые опросы должны распределяться по всему периоду.'
+        )
+
+    def test_warmup_then_phase(self, monkeypatch):
+        monkeypatch.setattr(homework, 'POLL_SPREAD', True)
+        monkeypatch.setattr(homework, 'POLL_WARMUP', 30)
+        poller = make_poller(50)
+        deadlines = poller.scheduler.deadlines
+        assert all(deadlines[name] < 30 for name in poller.tenants), (
+            'При прогреве первые опросы укладываются в окно прогрева.'
+        )
+        poller.reschedule(list(poller.tenants), set())
+        assert not poller.warming
+        for name in poller.tenants:
+            delay = deadlines[name] - poller.scheduler.elapsed()
+            assert 300 - 1 <= delay <= 900, (
+                'После прогрева опрос возвращается к своему сдвигу.'
+            )
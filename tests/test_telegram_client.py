@@ -0,0 +1,154 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from telebot import apihelper
+
+import metrics
+import telegram_client
+from tests.utils import Clock
+
+
+class FakeTelegram(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        payload = json.dumps({'ok': True, 'result': {
+            'message_id': 1, 'date': 0, 'chat': {'id': 1, 'type': 'private'}
+        }}).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    do_GET = do_POST
+
+    def log_message(self, format, *args):
+        pass
+
+
+class TestTelegramClient:
+
+    def test_sent_requests_are_not_retried(self):
+        session = telegram_client.configure_session(retries=3)
+        retry = session.get_adapter('https://api.telegram.org').max_retries
+        assert retry.connect == 3
+        assert retry.read == 0, (
+            'После тайм-аута ответа sendMessage мог быть уже доставлен, '
+            'повтор прислал бы сообщение дважды.'
+        )
+
+    def test_bots_share_keep_alive_connections(self, monkeypatch):
+        server = ThreadingHTTPServer(('127.0.0.1', 0), FakeTelegram)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        host, port = server.server_address
+        monkeypatch.setattr(
+            apihelper, 'API_URL', f'http://{host}:{port}/bot{{0}}/{{1}}'
+        )
+        monkeypatch.setattr(apihelper, 'session', None)
+        try:
+            telegram_client.configure_session(pool_size=2, timeout=5)
+            bot = telegram_client.get_bot('1:first')
+            assert telegram_client.get_bot('1:first') is bot, (
+                'Клиент должен кэшироваться по токену.'
+            )
+            for _ in range(5):
+                bot.send_message(1, 'Привет')
+                telegram_client.get_bot('2:second').send_message(1, 'Привет')
+
+            assert telegram_client.requests_sent() == 10
+            assert telegram_client.connections() == 1
+            assert telegram_client.reuse_rate() == 0.9
+        finally:
+            server.shutdown()
+            server.server_close()
+
+
+class FlakyBot:
+    def __init__(self):
+        self.sent = []
+        self.error = None
+
+    def send_message(self, chat_id, text):
+        if self.error is not None:
+            raise apihelper.ApiTelegramException(
+                'sendMessage', None, self.error
+            )
+        self.sent.append((chat_id, text))
+
+
+def make_pool(prefix, count, clock=None):
+    tokens = [f'{prefix}{index}:token' for index in range(count)]
+    bots = {}
+    for token in tokens:
+        bots[token] = FlakyBot()
+        telegram_client._bots[token] = bots[token]
+    return telegram_client.BotPool(tokens, clock=clock or Clock()), bots
+
+
+class TestBotPool:
+
+    def setup_method(self):
+        metrics.reset()
+
+    def teardown_method(self):
+        metrics.reset()
+
+    def test_chats_spread_and_stay_pinned(self):
+        pool, bots = make_pool('10', 4)
+        chats = range(4000)
+        owners = {chat: pool.owner(chat) for chat in chats}
+        counts = [list(owners.values()).count(token) for token in bots]
+        assert min(counts) > 4000 / 4 / 2, (
+            'Чаты должны распределяться между ботами.'
+        )
+        smaller = telegram_client.BotPool(list(bots)[:3])
+        moved = [chat for chat in chats
+                 if smaller.owner(chat) != owners[chat]]
+        assert all(owners[chat] == list(bots)[3] for chat in moved), (
+            'При удалении бота переезжают только его чаты.'
+        )
+
+    def test_throttled_bot_is_skipped_until_retry_after(self):
+        clock = Clock()
+        pool, bots = make_pool('20', 3, clock)
+        token = pool.owner('chat')
+        owner = bots[token]
+        owner.error = {'error_code': 429, 'description': 'Too Many Requests',
+                       'parameters': {'retry_after': 5}}
+        pool.send_message('chat', 'первое')
+        assert not owner.sent
+        assert sum(len(bot.sent) for bot in bots.values()) == 1
+        owner.error = None
+        clock.now = 3
+        pool.send_message('chat', 'второе')
+        assert not owner.sent, 'Бот ограничен до истечения retry_after.'
+        clock.now = 6
+        pool.send_message('chat', 'третье')
+        assert owner.sent == [('chat', 'третье')]
+        label = telegram_client.bot_label(token)
+        assert metrics.value(f'telegram_throttled_{label}') == 1
+        assert metrics.value(f'telegram_sent_{label}') == 1
+
+    def test_revoked_bots_and_exhausted_pool(self):
+        clock = Clock()
+        pool, bots = make_pool('30', 2, clock)
+        for bot in bots.values():
+            bot.error = {'error_code': 401, 'description': 'Unauthorized'}
+        with pytest.raises(apihelper.ApiTelegramException):
+            pool.send_message('chat', 'текст')
+        clock.now = 1e6
+        with pytest.raises(apihelper.ApiException):
+            pool.send_message('chat', 'текст')
+
+    def test_chat_errors_are_not_retried(self):
+        pool, bots = make_pool('40', 2)
+        bots[pool.owner('chat')].error = {
+            'error_code': 400, 'description': 'Bad Request: chat not found'
+        }
+        with pytest.raises(apihelper.ApiTelegramException):
+            pool.send_message('chat', 'текст')
+        assert not any(bot.sent for bot in bots.values())
@@ -0,0 +1,45 @@
+import traffic_log
+
+
+class TestTrafficLog:
+
+    def test_records_round_trip(self, tmp_path):
+        path = tmp_path / 'traffic.log'
+        recorder = traffic_log.TrafficRecorder(path)
+        recorder.record('api', {'from_date': 0}, {'body': {}}, 10.0, 0.5)
+        recorder.record('telegram', {'text': 'Привет'}, {'ok': True}, 11, 0)
+        recorder.close()
+
+        records = list(traffic_log.read_records(path))
+        assert [record['kind'] for record in records] == ['api', 'telegram'], (
+            'Убедитесь, что записи читаются в порядке записи.'
+        )
+        assert records[1]['request']['text'] == 'Привет'
+
+    def test_truncated_tail_is_ignored(self, tmp_path):
+        path = tmp_path / 'traffic.log'
+        recorder = traffic_log.TrafficRecorder(path)
+        recorder.record('api', {}, {'body': {}}, 0, 0)
+        recorder.close()
+        with open(path, 'ab') as file:
+            file.write(traffic_log.LENGTH.pack(100) + b'xx')
+
+        assert len(list(traffic_log.read_records(path))) == 1
+
+    def test_replay_feeds_successful_answers(self):
+        records = [
+            {'kind': 'api', 'started': 0, 'response': {'body': {'a': 1}}},
+            {'kind': 'telegram', 'started': 1, 'response': {'ok': True}},
+            {'kind': 'api', 'started': 2, 'response': {'error': 'boom'}},
+            {'kind': 'api', 'started': 4, 'response': {'body': {'a': 2}}},
+        ]
+        handled = []
+        pauses = []
+
+        stats = traffic_log.replay(
+            records, handled.append, speed=2, sleep=pauses.append
+        )
+
+        assert handled == [{'a': 1}, {'a': 2}]
+        assert stats == {'responses': 2, 'skipped': 1, 'errors': 0}
+        assert len(pauses) == 1 and 1.5 < pauses[0] <= 2
@@ -0,0 +1,57 @@
+from http import HTTPStatus
+
+import requests
+
+import homework
+import loadtest
+import metrics
+import transfer
+
+
+class TestTransfer:
+
+    def setup_method(self):
+        metrics.reset()
+        transfer.stats.reset()
+
+    def teardown_method(self):
+        metrics.reset()
+        transfer.stats.reset()
+
+    def test_compressed_answer_is_counted(self, monkeypatch):
+        practicum = loadtest.FakePracticum(['token'], change_rate=0)
+        with practicum:
+            for index in range(50):
+                practicum.change()
+            monkeypatch.setattr(homework, 'ENDPOINT', practicum.url)
+            answer = homework.request_statuses(
+                {'Authorization': 'OAuth token'}, 0, 'tenant'
+            )
+        assert len(answer['homeworks']) == 25
+        report = transfer.stats.report()
+        row = report['tenants']['tenant']
+        assert row['requests'] == 1 and row['sent'] > 0
+        assert row['received'] < row['decoded'], (
+            'Ответ API должен приходить сжатым.'
+        )
+        assert report['endpoints']['homework_statuses'] == row
+        assert metrics.value('api_bytes_decoded') == row['decoded']
+
+    def test_responses_without_raw_stream(self):
+        class Mock:
+            content = b'{"homeworks": []}'
+
+        transfer.stats.add('tenant', 'homework_statuses', Mock())
+        row = transfer.stats.report()['tenants']['tenant']
+        assert row == {'requests': 1, 'sent': 0, 'received': 17,
+                       'decoded': 17}
+
+    def test_report_route_limits_tenants(self):
+        response = requests.Response()
+        response._content = b'x' * 10
+        for name, count in (('a', 1), ('b', 3), ('c', 2)):
+            for _ in range(count):
+                transfer.stats.add(name, 'homework_statuses', response)
+        status, report = homework.transfer_report({'top': ['2']})
+        assert status == HTTPStatus.OK
+        assert list(report['tenants']) == ['b', 'c']
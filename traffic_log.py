@@ -0,0 +1,114 @@
+"""
+Запись и воспроизведение трафика бота.
+
+Журнал хранит пары запрос/ответ с таймингами в компактном бинарном виде:
+каждая запись — это 4 байта длины и сжатый zlib JSON. Файл только
+дописывается, а при чтении отображается в память, поэтому даже большие
+журналы воспроизводятся без загрузки целиком в RAM.
+"""
+
+import json
+import logging
+import mmap
+import os
+import struct
+import threading
+import time
+import zlib
+
+MAGIC = b"HWTL1\n"
+LENGTH = struct.Struct("<I")
+
+
+class TrafficRecorder:
+    """Дописывает записи трафика в журнал."""
+
+    def __init__(self, path, compression_level=6):
+        """Открывает журнал на дозапись и пишет заголовок в новый файл."""
+        self.path = path
+        self.compression_level = compression_level
+        self._lock = threading.Lock()
+        self._file = open(path, "ab")
+        if self._file.tell() == 0:
+            self._file.write(MAGIC)
+            self._file.flush()
+
+    def record(self, kind, request, response, started, duration):
+        """Сохраняет одну пару запрос/ответ."""
+        payload = json.dumps(
+            {
+                "kind": kind,
+                "started": started,
+                "duration": duration,
+                "request": request,
+                "response": response,
+            },
+            ensure_ascii=False,
+            separators=(",", ":"),
+        ).encode()
+        payload = zlib.compress(payload, self.compression_level)
+        with self._lock:
+            self._file.write(LENGTH.pack(len(payload)) + payload)
+            self._file.flush()
+
+    def close(self):
+        """Закрывает журнал."""
+        with self._lock:
+            self._file.close()
+
+
+def read_records(path):
+    """Последовательно читает записи журнала через mmap."""
+    with open(path, "rb") as file:
+        if os.fstat(file.fileno()).st_size <= len(MAGIC):
+            return
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as view:
+            if view[:len(MAGIC)] != MAGIC:
+                raise ValueError(f"Файл {path} не является журналом трафика.")
+            offset = len(MAGIC)
+            size = len(view)
+            while offset + LENGTH.size <= size:
+                (length,) = LENGTH.unpack_from(view, offset)
+                start = offset + LENGTH.size
+                if start + length > size:
+                    logging.warning(
+                        f"Журнал {path} обрывается на смещении {offset}."
+                    )
+                    return
+                yield json.loads(zlib.decompress(view[start:start + length]))
+                offset = start + length
+
+
+def replay(records, handle, speed=1.0, sleep=time.sleep):
+    """
+    Воспроизводит ответы API из журнала.
+
+    Каждый успешный ответ передаётся в handle. При speed > 0 паузы между
+    запросами повторяют исходные, ускоренные в speed раз; при speed == 0
+    журнал проигрывается максимально быстро.
+    """
+    stats = {"responses": 0, "skipped": 0, "errors": 0}
+    first_started = None
+    replay_started = time.monotonic()
+    for record in records:
+        if record["kind"] != "api":
+            continue
+        body = record["response"].get("body")
+        if body is None:
+            stats["skipped"] += 1
+            continue
+        if first_started is None:
+            first_started = record["started"]
+        if speed > 0:
+            due = (record["started"] - first_started) / speed
+            delay = due - (time.monotonic() - replay_started)
+            if delay > 0:
+                sleep(delay)
+        try:
+            handle(body)
+        except Exception as error:
+            stats["errors"] += 1
+            logging.error(f"Ошибка при воспроизведении ответа: {error}")
+        else:
+            stats["responses"] += 1
+    return stats
@@ -0,0 +1,115 @@
+"""
+Сжатие ответов API и учёт переданных байтов.
+
+Запросы к API объявляют поддержку gzip и deflate, а также brotli, если
+установлен пакет brotli или brotlicffi; распаковку выполняет urllib3.
+Для каждого получателя и эндпоинта считаются байты запросов, байты
+ответов на проводе и после распаковки.
+"""
+
+import threading
+
+import metrics
+
+try:
+    import brotli  # noqa: F401
+    BROTLI = True
+except ImportError:
+    try:
+        import brotlicffi  # noqa: F401
+        BROTLI = True
+    except ImportError:
+        BROTLI = False
+
+ACCEPT_ENCODING = "gzip, deflate, br" if BROTLI else "gzip, deflate"
+FIELDS = ("requests", "sent", "received", "decoded")
+
+
+def _headers_size(headers):
+    return sum(len(name) + len(value) + 4 for name, value in headers.items())
+
+
+def request_size(response):
+    """Примерный размер запроса на проводе в байтах."""
+    request = getattr(response, "request", None)
+    if request is None:
+        return 0
+    body = request.body or b""
+    return (len(f"{request.method} {request.path_url} HTTP/1.1\r\n")
+            + _headers_size(request.headers) + 2 + len(body))
+
+
+def response_sizes(response):
+    """
+    Размеры ответа в байтах: на проводе и после распаковки.
+    У ответов без сырого потока оба размера равны длине тела.
+    """
+    content = getattr(response, "content", None)
+    decoded = len(content) if isinstance(content, bytes) else 0
+    raw = getattr(response, "raw", None)
+    if raw is None or not hasattr(raw, "tell"):
+        return decoded, decoded
+    headers = _headers_size(getattr(raw, "headers", {})) + 2
+    return raw.tell() + headers, decoded
+
+
+class TransferStats:
+    """Счётчики переданных байтов по получателям и эндпоинтам."""
+
+    def __init__(self):
+        """Создаёт пустые счётчики."""
+        self._lock = threading.Lock()
+        self.tenants = {}
+        self.endpoints = {}
+
+    def add(self, tenant, endpoint, response):
+        """
+        Учитывает запрос получателя tenant к эндпоинту endpoint.
+        Возвращает число байтов запроса и ответа на проводе.
+        """
+        sent = request_size(response)
+        received, decoded = response_sizes(response)
+        with self._lock:
+            for table, key in ((self.tenants, tenant),
+                               (self.endpoints, endpoint)):
+                row = table.get(key)
+                if row is None:
+                    row = table[key] = [0, 0, 0, 0]
+                row[0] += 1
+                row[1] += sent
+                row[2] += received
+                row[3] += decoded
+        metrics.inc("api_bytes_sent", sent)
+        metrics.inc("api_bytes_received", received)
+        metrics.inc("api_bytes_decoded", decoded)
+        return sent + received
+
+    def report(self, top=None):
+        """
+        Возвращает счётчики в виде словаря для JSON.
+        top ограничивает список получателей самыми затратными по трафику.
+        """
+        with self._lock:
+            tenants = sorted(self.tenants.items(),
+                             key=lambda item: item[1][2], reverse=True)
+            endpoints = dict(self.endpoints)
+        if top is not None:
+            tenants = tenants[:top]
+        received = sum(row[2] for row in endpoints.values())
+        decoded = sum(row[3] for row in endpoints.values())
+        return {
+            "accept_encoding": ACCEPT_ENCODING,
+            "compression_ratio": decoded / received if received else None,
+            "endpoints": {key: dict(zip(FIELDS, row))
+                          for key, row in endpoints.items()},
+            "tenants": {key: dict(zip(FIELDS, row)) for key, row in tenants},
+        }
+
+    def reset(self):
+        """Обнуляет счётчики."""
+        with self._lock:
+            self.tenants.clear()
+            self.endpoints.clear()
+
+
+stats = TransferStats()